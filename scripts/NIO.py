@@ -1,8 +1,16 @@
 import os
 import json
 import csv
+import math
 import requests
 import time
+import threading
+from collections import Counter
+from util.address_segmenter import segment_address
+from util.reverse_geocoder import reverse_geocode, squared_km
+from util.http_client import get_session
+from util.fetch_engine import RequestSpec, fetch_iter
+from util.gazetteer import CACHE_DIR, read_cache, write_cache
 
 # Constants
 RESULT_FIELDS = ["省", "Province", "市区辅助", "City", "区", "店名", "类型", "地址", "电话", "备注"]
@@ -20,6 +28,37 @@ ALL_STORES_API_URL = "https://chargermap-fe-gateway.nio.com/pe/bff/gateway/power
 DETAIL_API_URL = "https://chargermap-fe-gateway.nio.com/pe/bff/gateway/powermap/h5/charge-map/v2/outlets/detail"
 OUTPUT_FILE = "nio_stores.csv"
 
+# Outlet details are fetched concurrently and cached between runs
+DETAIL_CONCURRENCY = 4
+DETAIL_RATE = 2.0  # initial requests per second, then adjusted by the AIMD controller
+DETAIL_CACHE_PATH = os.path.join(CACHE_DIR, "nio_details.pickle")
+DETAIL_CACHE_SIGNATURE = "nio_details"
+# Format version of the detail cache, independent of the gazetteer's CACHE_VERSION
+DETAIL_CACHE_VERSION = 1
+DETAIL_FINGERPRINT_KEYS = ("name", "location", "point_type", "point_sub_type")
+
+# Tiled discovery: instead of one huge 'around' request, China is split into map tiles that are
+# queried concurrently; a tile whose result looks saturated is split into four and queried again.
+# Off until checked against the live API: 'distance' is assumed to be a radius in metres and
+# TILE_SATURATION is a guess at the server's per-response cap (see TileSaturation).
+# When on, one 'around' request for the whole map is still made to check the tiled total.
+TILED_DISCOVERY = False
+CHINA_BOUNDS = (73.0, 18.0, 135.5, 53.6)  # (min_lon, min_lat, max_lon, max_lat)
+TILE_GRID = (8, 5)  # initial columns x rows
+TILE_SATURATION = 200  # a tile returning at least this many outlets may be truncated (assumed cap)
+MIN_TILE_SPAN = 0.05  # degrees; smaller tiles are not split any further
+TILE_CONCURRENCY = 4
+TILE_RATE = 2.0
+TILE_MAX_RETRIES = 3
+AROUND_PAYLOAD = {
+    "filter_request": {
+        "nio_store": None,
+        "service_center": None,
+        "recharge|ps": None,
+        "recharge|cs": None
+    }
+}
+
 headers = {
     "sec-ch-ua-platform":"Windows",
     "User-Agent":"Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/137.0.0.0 Safari/537.36",
@@ -35,6 +74,28 @@ headers = {
 }
 
 
+def extract_store_list(data, verbose=True) -> list:
+    """Finds the list of outlets in a successful 'around' response."""
+    api_data_content = data.get("data")
+    if isinstance(api_data_content, dict):
+        # Common patterns: 'list', 'items', 'results', 'stations', 'resources'
+        possible_list_keys = ['list', 'items', 'results', 'stations', 'resources', 'data']
+        for key in possible_list_keys:
+            if isinstance(api_data_content.get(key), list):
+                if verbose:
+                    print(f"Found store list under 'data.{key}'")
+                return api_data_content[key]
+        if verbose:
+            print(f"Could not find a list of stores within 'data' dictionary. Keys in 'data': {api_data_content.keys()}")
+    elif isinstance(api_data_content, list):
+        if verbose:
+            print("Found store list directly under 'data'")
+        return api_data_content
+    elif verbose:
+        print(f"'data' field is not a dictionary or list. Content of 'data': {api_data_content}")
+    return []
+
+
 def get_all_stores_from_api() -> list:
     # Parameters for the GET request part of the URL (timestamp, etc.)
     url_params = {
@@ -100,31 +161,12 @@ def get_all_stores_from_api() -> list:
         url_params["longitude"] = "109.85249924099358"
         url_params["distance"] = "311979000000000"
 
-        response = requests.post(ALL_STORES_API_URL, headers=current_headers, params=url_params, json=post_payload, timeout=30)
+        response = get_session().post(ALL_STORES_API_URL, headers=current_headers, params=url_params, json=post_payload, timeout=30)
         response.raise_for_status()  # Raises an HTTPError for bad responses (4XX or 5XX)
         data = response.json()
 
-        # Let's try to find the list of stores
-        store_list = []
         if data.get("result_code") == "success":
-            api_data_content = data.get("data")
-            if isinstance(api_data_content, dict):
-                # Common patterns: 'list', 'items', 'results', 'stations', 'resources'
-                possible_list_keys = ['list', 'items', 'results', 'stations', 'resources', 'data']
-                for key in possible_list_keys:
-                    if isinstance(api_data_content.get(key), list):
-                        store_list = api_data_content[key]
-                        print(f"Found store list under 'data.{key}'")
-                        break
-                if not store_list:
-                    print(
-                        f"Could not find a list of stores within 'data' dictionary. Keys in 'data': {api_data_content.keys()}")
-            elif isinstance(api_data_content, list):
-                store_list = api_data_content
-                print("Found store list directly under 'data'")
-            else:
-                print(f"'data' field is not a dictionary or list. Content of 'data': {api_data_content}")
-
+            store_list = extract_store_list(data)
             if not store_list:
                 print(
                     f"API request for all stores successful but store list could not be extracted. Full response data: {data}")
@@ -141,27 +183,145 @@ def get_all_stores_from_api() -> list:
         return []
 
 
-def get_store_details(store_id, point_type, point_sub_type):
-    """Fetches additional details for a store, including the phone number and address."""
-    payload = {
-        "outlets_id": store_id,
-        "type": point_type,
-        "subType": point_sub_type
-    }
-    headers = {
-        'sec-ch-ua-platform': '"Windows"',
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/137.0.0.0 Safari/537.36',
-        'Accept': 'application/json, text/plain, */*',
-        'sec-ch-ua': '"Google Chrome";v="137", "Chromium";v="137", "Not/A)Brand";v="24"',
-        'Content-Type': 'application/json',
-        'DNT': '1',
-        'sec-ch-ua-mobile': '?0',
-        'Sec-Fetch-Site': 'same-site',
-        'Sec-Fetch-Mode': 'cors',
-        'Sec-Fetch-Dest': 'empty',
-        'host': 'chargermap-fe-gateway.nio.com'
-    }
-    params = {
+def initial_tiles():
+    min_lon, min_lat, max_lon, max_lat = CHINA_BOUNDS
+    columns, rows = TILE_GRID
+    lon_step, lat_step = (max_lon - min_lon) / columns, (max_lat - min_lat) / rows
+    return [(min_lon + i * lon_step, min_lat + j * lat_step,
+             min_lon + (i + 1) * lon_step, min_lat + (j + 1) * lat_step)
+            for i in range(columns) for j in range(rows)]
+
+
+def split_tile(tile):
+    min_lon, min_lat, max_lon, max_lat = tile
+    mid_lon, mid_lat = (min_lon + max_lon) / 2, (min_lat + max_lat) / 2
+    return [(min_lon, min_lat, mid_lon, mid_lat), (mid_lon, min_lat, max_lon, mid_lat),
+            (min_lon, mid_lat, mid_lon, max_lat), (mid_lon, mid_lat, max_lon, max_lat)]
+
+
+def tile_request(tile, attempt=1):
+    """An 'around' request whose circle covers the whole tile."""
+    min_lon, min_lat, max_lon, max_lat = tile
+    lon, lat = (min_lon + max_lon) / 2, (min_lat + max_lat) / 2
+    # Radius from the centre to the corner nearer the equator (the widest one), with a margin
+    corner_lat = min(min_lat, max_lat, key=abs)
+    distance = math.ceil(math.sqrt(squared_km(lon, lat, min_lon, corner_lat)) * 1000 * 1.05)
+    # Zoom level roughly matching the tile width, never below the level used for the whole map
+    map_level = max(8, min(16, round(math.log2(360 / (max_lon - min_lon)))))
+    params = api_params()
+    params.update({"map_level": str(map_level), "latitude": f"{lat:.6f}", "longitude": f"{lon:.6f}",
+                   "distance": str(distance)})
+    return RequestSpec(ALL_STORES_API_URL, "POST", params=params, json=AROUND_PAYLOAD,
+                       headers=headers, timeout=30, tag=(tile, attempt))
+
+
+def tile_result(result):
+    """Outlets returned for a tile, or None if the request failed."""
+    if not result.ok or result.data.get("result_code") != "success":
+        return None
+    return extract_store_list(result.data, verbose=False)
+
+
+class TileSaturation:
+    """
+    Decides which tiles may be truncated and need splitting.
+
+    TILE_SATURATION is only a guess at the server's cap. If the real cap is lower, several tiles
+    return exactly the same largest count; that count then becomes the threshold, and the earlier
+    tiles that returned it are split as well. Called from the fetch engine's threads.
+    """
+
+    def __init__(self, threshold=TILE_SATURATION):
+        self.threshold = threshold
+        self.counts = Counter()
+        self.tiles_by_count = {}  # count -> tiles returning it that were not split
+        self.split = 0
+        self.lock = threading.Lock()
+
+    def tiles_to_split(self, tile, count):
+        """Tiles to split after a tile returned count outlets (tiles at MIN_TILE_SPAN are never split)."""
+        with self.lock:
+            self.counts[count] += 1
+            candidates = [tile]
+            if 0 < count < self.threshold and count == max(self.counts) and self.counts[count] >= 2:
+                print(f"Warning: {self.counts[count]} tiles returned exactly {count} outlets; "
+                      f"treating {count} as the server's cap instead of {self.threshold}.")
+                self.threshold = count
+                candidates += self.tiles_by_count.pop(count, [])
+            if count < self.threshold:
+                self.tiles_by_count.setdefault(count, []).append(tile)
+                return []
+            to_split = [t for t in candidates if t[2] - t[0] > MIN_TILE_SPAN]
+            self.split += len(to_split)
+            return to_split
+
+
+def next_tile_requests(result, saturation):
+    """Retries a failed tile, and splits saturated tiles into four."""
+    tile, attempt = result.spec.tag
+    store_list = tile_result(result)
+    if store_list is None:
+        return [tile_request(tile, attempt + 1)] if attempt < TILE_MAX_RETRIES else []
+    return [tile_request(child) for saturated in saturation.tiles_to_split(tile, len(store_list))
+            for child in split_tile(saturated)]
+
+
+def get_all_stores_tiled() -> list:
+    """
+    Discovers outlets tile by tile across China, deduplicated by outlet id.
+
+    Tiles are queried concurrently on the shared session; failed tiles are retried on their own,
+    and tiles that look saturated (see TileSaturation) are split into quadrants. Afterwards one
+    'around' request for the whole map is made; outlets it returns that the tiles missed are added
+    with a warning, since that means the tiling assumptions do not hold.
+    """
+    stores = {}
+    tiles = failed = 0
+    saturation = TileSaturation()
+    for result in fetch_iter((tile_request(tile) for tile in initial_tiles()),
+                             expand=lambda r: next_tile_requests(r, saturation),
+                             max_concurrency=TILE_CONCURRENCY, host_concurrency=TILE_CONCURRENCY,
+                             rate=TILE_RATE, adaptive=True):
+        tile, attempt = result.spec.tag
+        store_list = tile_result(result)
+        if store_list is None:
+            if attempt >= TILE_MAX_RETRIES:
+                failed += 1
+                print(f"Tile {tile} failed after {attempt} attempts: {result.error or result.data}")
+            continue
+        tiles += 1
+        for store in store_list:
+            stores.setdefault(store.get('id'), store)
+    print(f"Tiled discovery: {tiles} tiles queried ({saturation.split} saturated and split, {failed} failed), "
+          f"{len(stores)} unique outlets.")
+
+    one_shot = {store.get('id'): store for store in get_all_stores_from_api()}
+    missed = one_shot.keys() - stores.keys()
+    if len(stores) < len(one_shot) or missed:
+        print(f"Warning: tiled discovery found {len(stores)} outlets but a single 'around' request "
+              f"returned {len(one_shot)}, {len(missed)} of them missed by the tiles; adding those.")
+        for store_id in missed:
+            stores[store_id] = one_shot[store_id]
+    return list(stores.values())
+
+
+DETAIL_HEADERS = {
+    'sec-ch-ua-platform': '"Windows"',
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/137.0.0.0 Safari/537.36',
+    'Accept': 'application/json, text/plain, */*',
+    'sec-ch-ua': '"Google Chrome";v="137", "Chromium";v="137", "Not/A)Brand";v="24"',
+    'Content-Type': 'application/json',
+    'DNT': '1',
+    'sec-ch-ua-mobile': '?0',
+    'Sec-Fetch-Site': 'same-site',
+    'Sec-Fetch-Mode': 'cors',
+    'Sec-Fetch-Dest': 'empty',
+    'host': 'chargermap-fe-gateway.nio.com'
+}
+
+
+def api_params():
+    return {
         "app_ver": "5.2.0",
         "client": "pc",
         "container": "brower",  # As per previous images
@@ -172,23 +332,77 @@ def get_store_details(store_id, point_type, point_sub_type):
         "brand": "nio",
         "timestamp": int((round(time.time() * 1000)))
     }
-    try:
-        response = requests.post(DETAIL_API_URL, params=params, json=payload, headers=headers, timeout=50)
-        response.raise_for_status()  # Raise an exception for HTTP errors (4xx or 5xx)
-        detail_data = response.json()
 
-        phone_number = None
-        address = None
-        if detail_data.get('data') and isinstance(detail_data['data'], dict):
-            phone_number = detail_data['data'].get('phone')
-            address = detail_data['data'].get('address')  # Extract address
 
-        return phone_number, address  # Return both phone and address
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching details for store {store_id}: {e}")
-    except json.JSONDecodeError:
-        print(f"Error decoding JSON response for store {store_id}: {response.text}")
-    return None, None  # Return None for both if error
+def detail_payload(store_id, point_type, point_sub_type):
+    return {
+        "outlets_id": store_id,
+        "type": point_type,
+        "subType": point_sub_type
+    }
+
+
+def parse_store_details(detail_data):
+    """Extracts (phone, address) from a detail response; both are None if missing."""
+    phone_number = None
+    address = None
+    if detail_data.get('data') and isinstance(detail_data['data'], dict):
+        phone_number = detail_data['data'].get('phone')
+        address = detail_data['data'].get('address')  # Extract address
+    return phone_number, address
+
+
+def store_fingerprint(store):
+    """List-level fields of an outlet; cached details are refetched when any of them changes."""
+    return tuple(store.get(key) for key in DETAIL_FINGERPRINT_KEYS)
+
+
+def fetch_store_details(stores):
+    """
+    Fetches details for many outlets concurrently, reusing cached details.
+
+    Details are cached in cache/nio_details.pickle keyed by outlets_id, together with the
+    outlet's list-level fingerprint, so re-runs only request outlets that are new or changed.
+
+    Returns:
+        {outlets_id: (phone, address)}; outlets whose request failed or whose reply was not a
+        success are missing, and are not cached
+    """
+    cache = read_cache(DETAIL_CACHE_SIGNATURE, DETAIL_CACHE_PATH, DETAIL_CACHE_VERSION) or {}
+    details = {}
+    specs = []
+    for store in stores:
+        store_id = store.get('id')
+        cached = cache.get(store_id)
+        if cached and cached["fingerprint"] == store_fingerprint(store):
+            details[store_id] = cached["details"]
+            continue
+        specs.append(RequestSpec(DETAIL_API_URL, "POST", params=api_params(),
+                                 json=detail_payload(store_id, store.get('point_type'), store.get('point_sub_type')),
+                                 headers=DETAIL_HEADERS, timeout=50, tag=store))
+    print(f"Details: {len(details)} outlets from cache, {len(specs)} to fetch.")
+
+    fetched = 0
+    for result in fetch_iter(specs, max_concurrency=DETAIL_CONCURRENCY, host_concurrency=DETAIL_CONCURRENCY,
+                             rate=DETAIL_RATE, adaptive=True):
+        store = result.spec.tag
+        store_id = store.get('id')
+        if not result.ok:
+            print(f"Error fetching details for store {store_id}: {result.error}")
+            continue
+        # A 200 reply without a successful result is not cached, so the next run asks again
+        if result.data.get("result_code") != "success" or not isinstance(result.data.get("data"), dict):
+            print(f"No details for store {store_id}: {result.data.get('result_code')} {result.data.get('message', '')}")
+            continue
+        details[store_id] = parse_store_details(result.data)
+        cache[store_id] = {"fingerprint": store_fingerprint(store), "details": details[store_id]}
+        fetched += 1
+        if fetched % 100 == 0:
+            print(f"Fetched details for {fetched}/{len(specs)} outlets.")
+
+    if specs:
+        write_cache(DETAIL_CACHE_SIGNATURE, cache, DETAIL_CACHE_PATH, DETAIL_CACHE_VERSION)
+    return details
 
 
 def main():
@@ -196,7 +410,7 @@ def main():
     all_store_data = []
 
     # Get stores from API instead of local JSON file
-    stores = get_all_stores_from_api()
+    stores = get_all_stores_tiled() if TILED_DISCOVERY else get_all_stores_from_api()
 
     if not stores:
         print("No stores retrieved from API or API call failed. Exiting.")
@@ -204,102 +418,64 @@ def main():
 
     print(f"Found {len(stores)} total entries from the API.")
 
+    # We are interested in 'nio_store' types; if point_type is not present, process all for now
+    target_stores = [store for store in stores
+                     if store.get('point_type') == 'nio_store' or not store.get('point_type')]
+    store_details = fetch_store_details(target_stores)
+
     processed_stores = 0
-    for store in stores:
-        # We are interested in 'nio_store' types as per your screenshot
-        # The structure of 'store' item from API might be different from JSON file
-        # Adjust keys based on actual API response for each store item
-        # Example: point_type might be store.get('type') or store.get('pointType')
-        # For now, assuming similar keys as before, but this likely needs adjustment
-        point_type_from_api = store.get('point_type') # Key might be different, e.g., 'type'
-        if point_type_from_api == 'nio_store' or not point_type_from_api: # If point_type is not present, process all for now
-            store_id = store.get('id')
-            point_type = store.get('point_type')
-            point_sub_type = store.get('point_sub_type')
-            name = store.get('name')
-            # Ensure point_type and point_sub_type are correctly extracted from API response
-            # These might be named differently or nested within the API's store object
-            point_type_detail = store.get('point_type', 'N/A') # Or 'type', 'category' etc.
-            point_sub_type_detail = store.get('point_sub_type', 'N/A') # Or 'subCategory', 'specificType' etc.
-            location_str = store.get('location')  # e.g., "109.055,34.222"
-
-            # Placeholder for address components - to be implemented with geocoding
-            province_name = ""
-            city_name = ""
-            district_name = ""  # District extraction can be complex, keeping it simple for now
-            full_address_from_detail = ""
-
-            print(f"Processing store: {name} (ID: {store_id}) - Type: {point_type}, SubType: {point_sub_type}")
-
-            phone_number, address_from_detail = get_store_details(store_id, point_type, point_sub_type)
-
-            if not phone_number:
-                phone_number = "N/A"
-
-            if address_from_detail:
-                full_address_from_detail = address_from_detail
-                # Basic parsing for province and city from address_from_detail
-                # This is a simplified approach and might need refinement
-                if '省' in address_from_detail:
-                    province_name = address_from_detail.split('省')[0] + '省'
-                    remaining_address = address_from_detail.split('省')[1]
-                    if '市' in remaining_address:
-                        city_name = remaining_address.split('市')[0] + '市'
-                elif '市' in address_from_detail:  # For municipalities or addresses without '省'
-                    # Check for common municipalities first to avoid splitting them incorrectly
-                    municipalities = ["北京市", "上海市", "天津市", "重庆市"]
-                    found_municipality = False
-                    for m in municipalities:
-                        if address_from_detail.startswith(m):
-                            city_name = m
-                            province_name = m  # For municipalities, province and city are often the same
-                            found_municipality = True
-                            break
-                    if not found_municipality:
-                        # General case if '市' is present but not a known municipality start
-                        # This might incorrectly pick up city if province is missing but city is present
-                        # e.g. "江苏省苏州市" vs "苏州市工业园区"
-                        # A more robust solution would use a proper address parsing library or regex
-                        parts = address_from_detail.split('市')
-                        if len(parts) > 1:
-                            # Attempt to capture characters before the first '市' as city
-                            # This is a heuristic and might not always be province if province is missing
-                            potential_city_or_province = parts[0] + '市'
-                            # Heuristic: if it ends with '市' and is short, likely a city.
-                            # If it's a known province name (e.g. from provinces.json), it's a province.
-                            # For simplicity, we'll assign to city_name. Province might remain empty or be set if it's a municipality.
-                            city_name = potential_city_or_province
-                            # If province_name is still empty, and city_name looks like a province (e.g. ends with 市 but is a province name)
-                            # This part needs a list of provinces to check against, or a more sophisticated parser.
-                            # For now, we'll leave province_name as is if not a municipality.
-
-            # Use address from detail if available, otherwise fallback to lat/lon
-            current_address_to_display = full_address_from_detail
-            if not current_address_to_display and location_str:
-                try:
-                    lon, lat = location_str.split(',')
+    for store in target_stores:
+        store_id = store.get('id')
+        point_type = store.get('point_type')
+        point_sub_type = store.get('point_sub_type')
+        name = store.get('name')
+        location_str = store.get('location')  # e.g., "109.055,34.222"
+
+        province_name = ""
+        city_name = ""
+        district_name = ""
+        full_address_from_detail = ""
+
+        print(f"Processing store: {name} (ID: {store_id}) - Type: {point_type}, SubType: {point_sub_type}")
+
+        phone_number, address_from_detail = store_details.get(store_id, (None, None))
+
+        if not phone_number:
+            phone_number = "N/A"
+
+        if address_from_detail:
+            full_address_from_detail = address_from_detail
+            province_name, city_name, district_name = segment_address(address_from_detail)
+
+        # Use address from detail if available, otherwise fallback to lat/lon
+        current_address_to_display = full_address_from_detail
+        if location_str and (not current_address_to_display or not province_name):
+            try:
+                lon, lat = location_str.split(',')
+                if not current_address_to_display:
                     current_address_to_display = f"Lat: {lat}, Lon: {lon}"
-                except ValueError:
-                    print(f"Warning: Could not parse location_str for store {name}: {location_str}")
-
-            store_type_display = point_sub_type
-
-            row = {
-                "省": province_name,
-                "Province": province_name,  # Placeholder, ideally use location_translator
-                "市区辅助": city_name,
-                "City": city_name,  # Placeholder, ideally use location_translator
-                "区": district_name,
-                "店名": name,
-                "类型": store_type_display,
-                "地址": current_address_to_display,
-                "电话": phone_number,
-                "备注": ""
-            }
-            all_store_data.append(row)
-            processed_stores += 1
-
-            time.sleep(1)  # Adjust as needed
+                # 地址缺失或无法切分时，由坐标离线推断省市
+                if not province_name:
+                    province_name, city_name = reverse_geocode(float(lon), float(lat))
+            except ValueError:
+                print(f"Warning: Could not parse location_str for store {name}: {location_str}")
+
+        store_type_display = point_sub_type
+
+        row = {
+            "省": province_name,
+            "Province": province_name,  # Placeholder, ideally use location_translator
+            "市区辅助": city_name,
+            "City": city_name,  # Placeholder, ideally use location_translator
+            "区": district_name,
+            "店名": name,
+            "类型": store_type_display,
+            "地址": current_address_to_display,
+            "电话": phone_number,
+            "备注": ""
+        }
+        all_store_data.append(row)
+        processed_stores += 1
 
     print(f"Processed {processed_stores} stores of type 'nio_store'.")
 
@@ -317,6 +493,8 @@ def main():
     else:
         print("No store data to write to CSV.")
 
+    get_session().print_stats()
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,10 +1,16 @@
 import os
-import random
 import csv
-from time import sleep
 import requests
 import json
 import util.location_translator as ltr
+from util.http_client import get_session
+from util.rate_controller import pace
+from util.http_cache import TTL_WEEK, cached_get, print_cache_stats
+
+# 城市列表很少变化，缓存一周
+LOCATION_CACHE_TTL = TTL_WEEK
+
+
 #加载地区
 def get_audi_cities():
     url = "https://www.audi.cn/bin/dealerprocity/location.json"
@@ -18,7 +24,8 @@ def get_audi_cities():
     }
 
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = cached_get(url, LOCATION_CACHE_TTL, headers=headers, timeout=10,
+                              validate=lambda r: isinstance(r.json(), dict) and bool(r.json().get('data')))
         response.raise_for_status()
         data = response.json()
 
@@ -51,7 +58,6 @@ for city in citys:
     print(city)
 
 
-INTERVAL = 1  # 网络请求间隔（秒）
 API_URL = "https://www.audi.cn/bin/dealerprocity/query.json"
 RESULT_FIELDS = ["品牌","省", "Province","市区辅助", "City/Area","区","店名","类型", "地址", "电话"]
 
@@ -83,9 +89,6 @@ def parse_dealer(dealer):
     }
 
 
-def sleep_with_random(base: int = 1):
-    sleep(base + random.uniform(0, 0.5))
-
 def print_dealer_info(dealer_info):
 
     print(f"【经销商名称】{dealer_info['店名']}")
@@ -97,7 +100,8 @@ def get_city_dealers(city_name: str):
 
     payload = {"adCity": city_name}
     try:
-        response = requests.post(
+        pace(API_URL)
+        response = get_session().post(
             API_URL,
             json=payload,
             headers=DEFAULT_HEADERS,
@@ -132,5 +136,6 @@ for city in citys:
             total_count += 1
             print_dealer_info(parsed)
     print(f" {city} 已找到{len(dealers)}家经销商")
-    sleep_with_random()
-print(f"数据抓取完成，共获取{total_count}家经销商信息。结果已保存至：{OUTPUT_PATH}")
\ No newline at end of file
+print(f"数据抓取完成，共获取{total_count}家经销商信息。结果已保存至：{OUTPUT_PATH}")
+get_session().print_stats()
+print_cache_stats()
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""
+address_segmenter 吞吐量基准测试
+
+语料取自爬虫输出的CSV文件中的“地址”列：
+
+    python scripts/benchmark/bench_address_segmenter.py output/*.csv
+
+未指定CSV文件时使用 output/ 目录下的全部CSV；若目录为空，则使用内置的少量样例地址。
+计时前先校验 REGRESSION_CASES 中易错地址的切分结果。
+"""
+
+import csv
+import glob
+import os
+import sys
+from time import perf_counter
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, SCRIPT_DIR)
+
+from util.address_segmenter import AddressSegmenter  # noqa: E402
+
+ADDRESS_COLUMN = "地址"
+MIN_ADDRESSES = 100_000
+
+SAMPLE_ADDRESSES = [
+    "云南省丽江市古城区金虹路",
+    "江苏省南京市鼓楼区中山路1号",
+    "上海市黄浦区中山东一路",
+    "内蒙古自治区乌兰察布市集宁区",
+    "石牌镇梅溪路2号金象温泉城37幢2单元102室",
+    "大理州大理市下关镇",
+    "广东省中山市石岐区",
+    "新疆维吾尔自治区伊犁哈萨克自治州伊宁市",
+    "湖北省恩施土家族苗族自治州恩施市",
+    "北京朝阳区建国路88号",
+]
+
+# 曾经切分错误的地址及其正确结果 (省, 市, 区)
+REGRESSION_CASES = [
+    # 作为省的 “吉林” 不能同时作为市
+    ("吉林长春市朝阳区人民大街1号", ("吉林省", "长春市", "朝阳区")),
+    ("吉林省吉林市船营区", ("吉林省", "吉林市", "船营区")),
+    # 简称紧跟 路/街/道/大道 时是路名
+    ("中山路123号", ("", "", "")),
+    ("中山大道西", ("", "", "")),
+    ("南京路上海市黄浦区", ("上海市", "上海市", "黄浦区")),
+    ("江苏省南京市鼓楼区中山路1号", ("江苏省", "南京市", "鼓楼区")),
+    ("青岛市山东路", ("山东省", "青岛市", "")),
+    # 直辖市的省和市相同
+    ("北京朝阳区建国路88号", ("北京市", "北京市", "朝阳区")),
+    # 重复的省市名不是区县
+    ("北京市北京市朝阳区建国路1号", ("北京市", "北京市", "朝阳区")),
+    ("上海市上海市浦东新区张江路", ("上海市", "上海市", "浦东新区")),
+    ("浙江省杭州市杭州市西湖区", ("浙江省", "杭州市", "西湖区")),
+]
+
+
+def load_corpus(paths: list[str]) -> list[str]:
+    addresses = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.DictReader(f)
+            if ADDRESS_COLUMN not in (reader.fieldnames or []):
+                continue
+            addresses.extend(row[ADDRESS_COLUMN] for row in reader if row[ADDRESS_COLUMN])
+    return addresses
+
+
+def check_regressions(segmenter: AddressSegmenter) -> None:
+    for address, expected in REGRESSION_CASES:
+        actual = segmenter.segment_names(address)
+        assert actual == expected, f"{address}: 期望 {expected}，实际 {actual}"
+    print(f"{len(REGRESSION_CASES)} 条易错地址切分正确")
+
+
+def main():
+    paths = sys.argv[1:] or sorted(glob.glob(os.path.join(PROJECT_ROOT, "output", "*.csv")))
+    corpus = load_corpus(paths)
+    if not corpus:
+        print("未找到含“地址”列的CSV，使用内置样例地址")
+        corpus = SAMPLE_ADDRESSES
+    distinct = len(set(corpus))
+    # 语料较小时重复若干遍，使计时稳定
+    repeat = max(1, MIN_ADDRESSES // len(corpus))
+
+    start = perf_counter()
+    segmenter = AddressSegmenter()
+    build_time = perf_counter() - start
+    check_regressions(segmenter)
+
+    start = perf_counter()
+    for _ in range(repeat):
+        for address in corpus:
+            segmenter.segment(address)
+    elapsed = perf_counter() - start
+
+    results = [segmenter.segment(address) for address in corpus]
+    with_province = sum(1 for p, _, _ in results if p)
+    with_city = sum(1 for _, c, _ in results if c)
+    with_district = sum(1 for _, _, d in results if d)
+    total = len(corpus) * repeat
+
+    print(f"语料: {len(corpus)} 条地址（{distinct} 条不同），重复 {repeat} 遍")
+    print(f"自动机构建: {build_time * 1000:.1f} 毫秒，状态数 {len(segmenter.automaton.goto)}")
+    print(f"切分: {elapsed:.3f} 秒，{total / elapsed:,.0f} 条/秒")
+    print(f"识别率: 省 {with_province / len(corpus):.1%}，"
+          f"市 {with_city / len(corpus):.1%}，区县 {with_district / len(corpus):.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+邓禄普经销商列表页解析基准测试
+
+对比原先的解析路径（apparent_encoding 检测编码 + BeautifulSoup 建树 +
+每个经销商一次正则与 ast.literal_eval）与 dunlop.extract_dealers
+（按主机沿用响应头中的编码 + 一次预编译正则扫描 + 轻量字面量解析），
+先校验二者在构造的页面上、以及 LITERAL_CASES 中各种字面量写法上结果完全一致，再分别计时：
+
+    python scripts/benchmark/bench_dunlop_extractor.py [页数]
+"""
+
+import ast
+import os
+import random
+import re
+import sys
+from time import perf_counter
+
+import requests
+from bs4 import BeautifulSoup
+from requests.structures import CaseInsensitiveDict
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPT_DIR)
+
+import dunlop  # noqa: E402
+
+DEFAULT_PAGES = 200
+PAGE_URL = "https://www.dunlop.com.cn/index_salearea.html"
+
+# 页面中与经销商无关的部分：导航、省份下拉框、页脚等
+PAGE_HEAD = ('<!DOCTYPE html><html><head><meta charset="utf-8"><title>销售网点_邓禄普轮胎</title>'
+             '<script>function inItBaiduMap(id, address, tel, type, name, lng, lat) {}</script></head><body>'
+             + '<div class="nav"><ul>' + ''.join(f'<li><a href="/p{i}.html">栏目{i}</a></li>' for i in range(40))
+             + '</ul></div><ul id="province">' + ''.join(f'<li data-val="{i}">省份{i}</li>' for i in range(34))
+             + '</ul><div class="location_list"><ul>')
+PAGE_TAIL = ('</ul></div><div class="footer">' + '<p>版权所有 邓禄普轮胎 客服热线 400-000-0000</p>' * 30
+             + '</div></body></html>')
+
+ADDRESSES = ["石牌镇梅溪路2号金象温泉城37幢2单元102室", "解放路(近人民广场)18号", "工业园区A&amp;B栋",
+             "环城东路 \\'老车站\\' 对面", "高新区科技路100号"]
+TYPES = ["D驾族", "轮胎专卖店", "快修店"]
+
+# 转义、前导零等容易与 ast.literal_eval 不一致的参数写法
+LITERAL_CASES = [
+    r'''1, 'a\'b', "c\"d"''', r"'a\\b'", r"'a\nb\tc\r'", r"'\x41\u4e2d'", r"'\0\101'",
+    r"'\N{BULLET}'", r"'\q'", r"'\a\b\f\v'", "'x\\\ny'",
+    "007", "-007", "0", "00", "+5", "007.5", "01e5", ".5", "0x1F",
+]
+
+
+def legacy_parse_baidu_map_string(s) -> dict:
+    """优化前的实现：每个经销商一次后向断言正则和 ast.literal_eval"""
+    pattern = r'(?<=inItBaiduMap\()(.*)(?=\);?)'
+    match = re.search(pattern, s)
+    if not match:
+        raise ValueError("输入字符串不符合 inItBaiduMap(...) 格式")
+    args = ast.literal_eval(f'({match.group(1)})')
+    if len(args) < 5:
+        raise ValueError(f"参数数量不足，至少需要5个，实际得到{len(args)}个")
+    return {"地址": args[1], "电话": args[2], "类型": args[3], "店名": args[4]}
+
+
+def legacy_extract(response: requests.Response) -> list[dict]:
+    """优化前的路径：检测编码、建 DOM 树、逐个解析 onclick"""
+    response.encoding = response.apparent_encoding
+    soup = BeautifulSoup(response.text, 'html.parser')
+    return [legacy_parse_baidu_map_string(e.get('onclick'))
+            for e in soup.select('div.location_list > ul > li')]
+
+
+def fast_extract(response: requests.Response) -> list[dict]:
+    return dunlop.extract_dealers(dunlop.page_text(response))
+
+
+def build_page(rng: random.Random, index: int) -> requests.Response:
+    items = []
+    for j in range(rng.randint(5, 80)):
+        args = (f"{index * 100 + j}, '{rng.choice(ADDRESSES)}', '1{rng.randrange(10 ** 10):010d}', "
+                f"'{rng.choice(TYPES)}', '经销商{index}-{j}轮胎店', {rng.uniform(100, 120):.10f}, "
+                f"{rng.uniform(20, 40):.10f}")
+        items.append(f'<li onclick="inItBaiduMap({args});"><h3>经销商{index}-{j}</h3>'
+                     f'<p>{rng.choice(ADDRESSES)}</p></li>')
+    response = requests.Response()
+    response.status_code = 200
+    response.url = f"{PAGE_URL}?prov={index % 34}&city={index}"
+    response.headers = CaseInsensitiveDict({"Content-Type": "text/html; charset=utf-8"})
+    response._content = (PAGE_HEAD + "".join(items) + PAGE_TAIL).encode("utf-8")
+    return response
+
+
+def timeit(func, pages: list[requests.Response]) -> float:
+    start = perf_counter()
+    for page in pages:
+        func(page)
+    return perf_counter() - start
+
+
+def check_literal_cases() -> None:
+    for args_str in LITERAL_CASES:
+        try:
+            expected = ast.literal_eval(f"({args_str},)")
+        except (SyntaxError, ValueError):
+            expected = ValueError
+        try:
+            actual = dunlop.parse_literal_args(args_str)
+        except ValueError:
+            actual = ValueError
+        assert actual == expected, f"{args_str}: 期望 {expected}，实际 {actual}"
+    print(f"{len(LITERAL_CASES)} 种字面量写法与 ast.literal_eval 结果一致")
+
+
+def main():
+    page_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PAGES
+    check_literal_cases()
+    rng = random.Random(0)
+    pages = [build_page(rng, i) for i in range(page_count)]
+    dealer_count = 0
+    for page in pages:
+        expected = legacy_extract(page)
+        assert fast_extract(page) == expected, page.url
+        dealer_count += len(expected)
+    size = sum(len(page.content) for page in pages) / page_count
+    print(f"{page_count} 个页面（平均 {size / 1024:.1f} KB），{dealer_count} 个经销商，两种实现结果一致")
+
+    legacy = timeit(legacy_extract, pages)
+    fast = timeit(fast_extract, pages)
+    print(f"{'实现':<24}{'耗时(秒)':>10}{'页/秒':>10}")
+    print(f"{'apparent_encoding+soup':<24}{legacy:>10.3f}{page_count / legacy:>10,.0f}")
+    print(f"{'extract_dealers':<24}{fast:>10.3f}{page_count / fast:>10,.0f}")
+    print(f"加速 {legacy / fast:.1f} 倍")
+
+
+if __name__ == "__main__":
+    main()
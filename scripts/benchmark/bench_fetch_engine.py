@@ -0,0 +1,81 @@
+"""
+fetch_engine 基准测试
+
+在本地启动一个带固定延迟的 HTTP/1.1 服务，比较顺序请求与抓取引擎并发请求的耗时，
+并检查引擎是否遵守每个主机的速率上限：
+
+    python scripts/benchmark/bench_fetch_engine.py [请求数] [延迟毫秒] [每秒请求数]
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPT_DIR)
+
+from util.fetch_engine import RequestSpec, fetch_iter  # noqa: E402
+from util.http_client import create_session  # noqa: E402
+
+DEFAULT_REQUESTS = 200
+DEFAULT_LATENCY_MS = 50
+DEFAULT_RATE = 50.0
+
+
+def make_handler(latency: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            time.sleep(latency)
+            body = json.dumps({"code": 10000, "path": self.path}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_REQUESTS
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_LATENCY_MS
+    rate = float(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_RATE
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(latency_ms / 1000))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    specs = [RequestSpec(f"{base_url}/shops?page={i}", tag=i) for i in range(count)]
+
+    session = create_session()
+    start = perf_counter()
+    for spec in specs:
+        session.get(spec.url).json()
+    sequential_time = perf_counter() - start
+
+    session = create_session(pool_maxsize=16)
+    start = perf_counter()
+    results = list(fetch_iter(specs, ordered=True, session=session, max_concurrency=16,
+                              host_concurrency=16, rate=rate))
+    engine_time = perf_counter() - start
+    server.shutdown()
+
+    failures = sum(1 for r in results if not r.ok)
+    in_order = [r.spec.tag for r in results] == list(range(count))
+    print(f"顺序请求: {count} 次，{sequential_time:.2f} 秒，{count / sequential_time:,.1f} 次/秒")
+    print(f"抓取引擎: {count} 次，{engine_time:.2f} 秒，{count / engine_time:,.1f} 次/秒"
+          f"（上限 {rate:g} 次/秒），失败 {failures} 次，按提交顺序: {in_order}")
+    session.print_stats()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+行政区划数据加载开销基准测试
+
+每个爬虫进程都要付出一次导入和加载的代价。本脚本在全新的解释器子进程中分别计时：
+
+- 仅导入 util.location_translator（惰性加载，不读数据文件）
+- 首次翻译：无缓存，需要解析JSON并建立索引
+- 首次翻译：读取 cache/gazetteer.pickle
+
+运行方法：
+
+    python scripts/benchmark/bench_gazetteer_load.py
+"""
+
+import os
+import subprocess
+import sys
+from statistics import median
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPT_DIR)
+
+from util.gazetteer import CACHE_PATH  # noqa: E402
+
+RUNS = 7
+
+IMPORT_ONLY = """
+from time import perf_counter
+start = perf_counter()
+import util.location_translator
+print(perf_counter() - start)
+"""
+
+FIRST_CALL = """
+from time import perf_counter
+start = perf_counter()
+from util.location_translator import get_en_city
+get_en_city("上海")
+print(perf_counter() - start)
+"""
+
+
+def run_snippet(code: str) -> float:
+    output = subprocess.run([sys.executable, "-c", code], cwd=SCRIPT_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def remove_cache():
+    if os.path.exists(CACHE_PATH):
+        os.remove(CACHE_PATH)
+
+
+def measure(label: str, code: str, cold: bool):
+    timings = []
+    for _ in range(RUNS):
+        if cold:
+            remove_cache()
+        timings.append(run_snippet(code))
+    print(f"{label}: 中位数 {median(timings) * 1000:.2f} 毫秒（{RUNS} 次）")
+
+
+def main():
+    measure("仅导入模块", IMPORT_ONLY, cold=False)
+    measure("首次翻译（无缓存，解析JSON并建索引）", FIRST_CALL, cold=True)
+    measure("首次翻译（读取二进制缓存）", FIRST_CALL, cold=False)
+
+
+if __name__ == "__main__":
+    main()
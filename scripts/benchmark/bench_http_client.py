@@ -0,0 +1,69 @@
+"""
+http_client 连接复用基准测试
+
+在本地启动一个支持 keep-alive 的 HTTP/1.1 服务，比较直接调用 requests.get（每次新建连接）
+与使用 http_client 共享会话（复用连接池）的耗时：
+
+    python scripts/benchmark/bench_http_client.py [请求数]
+
+本地回环没有 TLS 握手和网络延迟，实际访问品牌接口时差距更大。
+"""
+
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+
+import requests
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPT_DIR)
+
+from util.http_client import create_session  # noqa: E402
+
+DEFAULT_REQUESTS = 500
+BODY = b'{"code": 10000, "data": []}'
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 响应头和响应体分两次写出，关闭 Nagle 算法以免 keep-alive 连接上出现延迟确认的等待
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_REQUESTS
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    start = perf_counter()
+    for _ in range(count):
+        requests.get(url, timeout=5).json()
+    bare_time = perf_counter() - start
+
+    session = create_session()
+    start = perf_counter()
+    for _ in range(count):
+        session.get(url).json()
+    pooled_time = perf_counter() - start
+    server.shutdown()
+
+    print(f"requests.get: {count} 次请求，{bare_time:.3f} 秒，{count / bare_time:,.0f} 次/秒")
+    print(f"共享会话:     {count} 次请求，{pooled_time:.3f} 秒，{count / pooled_time:,.0f} 次/秒")
+    session.print_stats()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+location_translator 模糊匹配基准测试
+
+对比原先逐键线性扫描（`query in key`）与子串索引两种实现，
+先校验二者结果完全一致，再分别计时。
+
+运行方法：
+
+    python scripts/benchmark/bench_location_translator.py
+"""
+
+import os
+import random
+import sys
+from time import perf_counter
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPT_DIR)
+
+from util.location_translator import LocationTranslator  # noqa: E402
+
+ROUNDS = 200_000
+
+
+def linear_lookup(names: dict, query: str) -> str:
+    """优化前的实现：精确匹配失败后逐键扫描"""
+    if query in names:
+        return names[query]
+    for key, value in names.items():
+        if query in key:
+            return value
+    return query
+
+
+def build_queries(names: dict, count: int) -> list[str]:
+    """构造查询：全称、去掉后缀的简称、中间子串，以及查不到的字符串"""
+    rng = random.Random(0)
+    keys = list(names)
+    queries = []
+    for _ in range(count):
+        key = rng.choice(keys)
+        kind = rng.randrange(4)
+        if kind == 0:
+            queries.append(key)
+        elif kind == 1:
+            queries.append(key[:-1] or key)
+        elif kind == 2:
+            start = rng.randrange(len(key))
+            queries.append(key[start:start + 2])
+        else:
+            queries.append(key[:1] + "某某")
+    return queries
+
+
+def timeit(func, names: dict, queries: list[str]) -> float:
+    start = perf_counter()
+    for q in queries:
+        func(names, q)
+    return perf_counter() - start
+
+
+def main():
+    translator = LocationTranslator()
+    cases = [
+        ("城市", translator.cities_dict, translator.get_en_city),
+        ("省份", translator.provinces_dict, translator.get_en_province),
+    ]
+    for label, names, indexed in cases:
+        queries = build_queries(names, ROUNDS)
+
+        mismatches = [q for q in set(queries) if linear_lookup(names, q) != indexed(q)]
+        if mismatches:
+            raise AssertionError(f"{label}：索引结果与线性扫描不一致: {mismatches[:10]}")
+
+        linear_time = timeit(linear_lookup, names, queries)
+        indexed_time = timeit(lambda _, q: indexed(q), names, queries)
+        print(f"{label}（{len(names)} 个键，{len(queries)} 次查询）")
+        print(f"  线性扫描: {linear_time:.3f} 秒 ({len(queries) / linear_time:,.0f} 次/秒)")
+        print(f"  子串索引: {indexed_time:.3f} 秒 ({len(queries) / indexed_time:,.0f} 次/秒)")
+        print(f"  加速比: {linear_time / indexed_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+用本地模拟服务压测爬虫的吞吐量
+
+依次按不同门店数启动 mock_brand_server，在子进程中运行各爬虫
+（SPIDER_BASE_URL 指向模拟服务，SPIDER_PACING=0 关闭请求前的等待），
+统计耗时、请求数和写出的门店数。爬虫照常写入 output/ 下的 CSV，会覆盖之前的结果：
+
+    python scripts/benchmark/bench_mock_spiders.py [门店数,...] [爬虫,...] [延迟毫秒]
+    python scripts/benchmark/bench_mock_spiders.py 1000,10000,100000 tuhu,hankooktire 20
+"""
+
+import csv
+import os
+import subprocess
+import sys
+from time import perf_counter
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, SCRIPT_DIR)
+
+from benchmark.mock_brand_server import ServerOptions, start_server  # noqa: E402
+from util.http_client import BASE_URL_ENV  # noqa: E402
+from util.rate_controller import PACING_ENV  # noqa: E402
+
+DEFAULT_SIZES = [1000, 10000]
+DEFAULT_SPIDERS = ["tuhu", "hankooktire", "byd", "kumho"]
+DEFAULT_LATENCY_MS = 0.0
+SPIDER_TIMEOUT = 3600
+
+OUTPUT_FILES = {
+    "tuhu": "tuhu_app.csv",
+    "hankooktire": "hankooktire.csv",
+    "byd": "byd.csv",
+    "kumho": "kumho_stores.csv",
+}
+
+
+def count_rows(path: str) -> int:
+    if not os.path.exists(path):
+        return 0
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        return max(sum(1 for _ in csv.reader(f)) - 1, 0)
+
+
+def run_spider(name: str, base_url: str) -> tuple[float, int]:
+    output_path = os.path.join(PROJECT_ROOT, "output", OUTPUT_FILES[name])
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    env = dict(os.environ, **{BASE_URL_ENV: base_url, PACING_ENV: "0"})
+    start = perf_counter()
+    subprocess.run([sys.executable, os.path.join(SCRIPT_DIR, f"{name}.py")], env=env,
+                   cwd=PROJECT_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                   timeout=SPIDER_TIMEOUT)
+    return perf_counter() - start, count_rows(output_path)
+
+
+def main():
+    sizes = [int(s) for s in sys.argv[1].split(",")] if len(sys.argv) > 1 else DEFAULT_SIZES
+    spiders = sys.argv[2].split(",") if len(sys.argv) > 2 else DEFAULT_SPIDERS
+    latency_ms = float(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_LATENCY_MS
+
+    print(f"{'爬虫':<12}{'门店数':>10}{'写出':>10}{'请求数':>10}{'耗时(秒)':>10}{'门店/秒':>10}")
+    for size in sizes:
+        server, state, base_url = start_server(size, ServerOptions(latency=latency_ms / 1000))
+        for name in spiders:
+            requests_before = state.stats["requests"]
+            elapsed, rows = run_spider(name, base_url)
+            requests = state.stats["requests"] - requests_before
+            print(f"{name:<12}{size:>10}{rows:>10}{requests:>10}{elapsed:>10.2f}{rows / elapsed:>10,.0f}")
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+rate_controller 基准测试
+
+在本地启动一个每秒只能处理固定数量请求、超出即返回 429 的 HTTP 服务，
+比较固定间隔等待与 AIMD 自适应速率的吞吐量和被限流次数：
+
+    python scripts/benchmark/bench_rate_controller.py [请求数] [服务端每秒容量] [固定间隔秒]
+"""
+
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPT_DIR)
+
+from util.http_client import create_session  # noqa: E402
+from util.rate_controller import get_controller  # noqa: E402
+
+DEFAULT_REQUESTS = 200
+DEFAULT_CAPACITY = 10.0
+DEFAULT_FIXED_INTERVAL = 0.25
+
+
+def make_handler(capacity: float):
+    state = {"tokens": 1.0, "updated": time.monotonic()}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            with lock:
+                now = time.monotonic()
+                state["tokens"] = min(1.0, state["tokens"] + (now - state["updated"]) * capacity)
+                state["updated"] = now
+                allowed = state["tokens"] >= 1
+                if allowed:
+                    state["tokens"] -= 1
+            body = b'{"code": 10000}' if allowed else b'{"code": 429}'
+            self.send_response(200 if allowed else 429)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def run(session, url, count, wait) -> tuple[float, int]:
+    throttled = 0
+    start = perf_counter()
+    done = 0
+    while done < count:
+        wait()
+        if session.get(url).status_code == 429:
+            throttled += 1
+        else:
+            done += 1
+    return perf_counter() - start, throttled
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_REQUESTS
+    capacity = float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_CAPACITY
+    fixed_interval = float(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_FIXED_INTERVAL
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(capacity))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    session = create_session()
+
+    # 速率控制器按主机名区分，两轮分别用 localhost 和 127.0.0.1，互不影响
+    fixed_time, fixed_throttled = run(session, f"http://localhost:{port}/", count,
+                                      lambda: time.sleep(fixed_interval))
+    time.sleep(1)  # 等服务端的令牌恢复
+    controller = get_controller(f"127.0.0.1:{port}", rate=1.0, max_rate=capacity * 4)
+    aimd_time, aimd_throttled = run(session, f"http://127.0.0.1:{port}/", count, controller.wait)
+    server.shutdown()
+
+    print(f"服务端容量 {capacity:g} 次/秒，成功请求 {count} 次")
+    print(f"固定间隔 {fixed_interval:g} 秒: {fixed_time:.2f} 秒，{count / fixed_time:.1f} 次/秒，"
+          f"被限流 {fixed_throttled} 次")
+    print(f"AIMD:            {aimd_time:.2f} 秒，{count / aimd_time:.1f} 次/秒，"
+          f"被限流 {aimd_throttled} 次，最终速率 {controller.rate:.2f} 次/秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+reverse_geocoder 基准测试
+
+比较预计算栅格与逐点精确最近邻查询的吞吐量，并统计两者结果不一致的比例：
+
+    python scripts/benchmark/bench_reverse_geocoder.py [点数]
+"""
+
+import os
+import random
+import sys
+from time import perf_counter
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPT_DIR)
+
+from util.reverse_geocoder import ReverseGeocoder  # noqa: E402
+
+DEFAULT_POINTS = 1_000_000
+EXACT_POINTS = 20_000
+# 随机点的取值范围，覆盖中国大陆及周边
+LON_RANGE = (73.0, 135.0)
+LAT_RANGE = (18.0, 53.0)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_POINTS
+    rng = random.Random(0)
+    points = [(rng.uniform(*LON_RANGE), rng.uniform(*LAT_RANGE)) for _ in range(count)]
+
+    start = perf_counter()
+    geocoder = ReverseGeocoder()
+    load_time = perf_counter() - start
+
+    start = perf_counter()
+    located = geocoder.locate_many(points)
+    raster_time = perf_counter() - start
+
+    sample = points[:EXACT_POINTS]
+    start = perf_counter()
+    exact = [geocoder.nearest(lon, lat) for lon, lat in sample]
+    exact_time = perf_counter() - start
+
+    mismatches = sum(1 for found, i in zip(located, exact)
+                     if found != (None if i is None else geocoder.results[i]))
+    matched = sum(1 for found in located if found is not None)
+
+    print(f"参考点: {len(geocoder.references)} 个，加载（含栅格）: {load_time * 1000:.1f} 毫秒")
+    print(f"栅格查询: {count} 个点，{raster_time:.3f} 秒，{count / raster_time:,.0f} 点/秒")
+    print(f"精确查询: {len(sample)} 个点，{exact_time:.3f} 秒，{len(sample) / exact_time:,.0f} 点/秒")
+    print(f"栅格与精确结果不一致: {mismatches / len(sample):.2%}，有结果的点: {matched / count:.1%}")
+
+
+if __name__ == "__main__":
+    main()
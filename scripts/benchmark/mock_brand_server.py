@@ -0,0 +1,477 @@
+"""
+模拟品牌接口的本地 HTTP 服务，用于压测爬虫的吞吐量
+
+按真实接口的路径和响应格式提供合成的门店数据，门店数可以从几千调到上百万
+（门店按需计算，不占内存），并可调节响应延迟、出错率和限流：
+
+- 途虎 selectCityList / getMainShopList：地区列表到区县一级；按城市（可选区县）和服务类型分页，
+  返回 totalPage，最多 100 页
+- 韩泰 find-store.getStoreList.do：全国分页，返回 pg.endPage
+- 锦湖 list.do：GET 返回带 CSRF token 的页面和省份下拉框，POST 须带会话 Cookie 与 token
+- 比亚迪 store/province、city、list：被限流时返回 success: false
+
+爬虫通过环境变量 SPIDER_BASE_URL 把接口地址指向本服务，SPIDER_PACING=0 关闭请求前的等待：
+
+    python scripts/benchmark/mock_brand_server.py --stores 100000 --latency 20 --port 8765
+    SPIDER_BASE_URL=http://127.0.0.1:8765 SPIDER_PACING=0 python scripts/tuhu.py
+
+参数见 python scripts/benchmark/mock_brand_server.py --help。
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+from bisect import bisect_right
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPT_DIR)
+
+from util.divisions import LEVEL_PROVINCE, PLACEHOLDER_CITY_NAMES, load_division_index  # noqa: E402
+
+DEFAULT_STORES = 10000
+DEFAULT_PORT = 8765
+
+TUHU_CITY_PATH = "/cl/cl-base-region-query/region/selectCityList"
+TUHU_SHOP_PATH = "/cl/cl-shop-api/shopList/getMainShopList"
+HANKOOK_PATH = "/wsvc/api/find-store.getStoreList.do"
+KUMHO_PATH = "/cn/global/tire/agnc/list.do"
+BYD_PATH = "/domestic-official-api/store/"
+
+TUHU_SERVICE_TYPES = ["BY", "TR", "MR", "GZ"]
+# 保养、轮胎列表包含城市的全部门店，美容、改装列表只包含部分门店，与真实接口一样各类型间大量重复；
+# 轮胎列表的门店顺序与保养列表相反，各类型的排序和分页不同
+TUHU_FULL_TYPES = {"BY", "TR"}
+TUHU_REVERSED_TYPES = {"TR"}
+TUHU_MAX_PAGES = 100  # 途虎超过 100 页后不再返回数据
+HANKOOK_PAGE_SIZE = 10
+KUMHO_PAGE_SIZE = 5  # 锦湖默认每页门店数，请求可用 pageSize 参数调整
+KUMHO_MAX_PAGE_SIZE = 100
+KUMHO_CSRF_HEADER = "X-CSRF-TOKEN"
+BYD_DEALER_TYPES = ["0", "1"]
+BYD_SALE_NETWORKS = ["2", "3"]
+
+# 每个城市的合成区县，途虎可按区县筛选
+DISTRICTS = ["城东区", "城西区", "城南区", "城北区", "高新区", "经开区", "新城区", "老城区"]
+STREETS = ["人民路", "解放路", "中山路", "建设路", "和平路", "长江路", "黄河路", "胜利路"]
+# 城市规模的齐普夫指数，越大门店越集中在少数大城市
+ZIPF_EXPONENT = 0.9
+
+
+class StoreCatalog:
+    """
+    合成门店目录
+
+    门店按齐普夫分布分到各城市；城市内第 j 家门店的服务类型、区县、经销类型等
+    都由 j 算出，因此任意一页都可以直接计算，不需要预先生成全部门店。
+    """
+
+    def __init__(self, stores: int, seed: int = 0):
+        index = load_division_index()
+        self.provinces = []  # [(省, [城市, ...])]
+        self.cities = []  # [(省, 城市)]
+        for province in index.divisions.values():
+            if province.level != LEVEL_PROVINCE:
+                continue
+            seen = set()
+            cities = []
+            for city in index.children(province.code):
+                if city.name in PLACEHOLDER_CITY_NAMES or city.name in seen:
+                    continue
+                seen.add(city.name)
+                cities.append(city)
+            if cities:
+                self.provinces.append((province, cities))
+                self.cities.extend((province, city) for city in cities)
+
+        ranks = list(range(len(self.cities)))
+        random.Random(seed).shuffle(ranks)
+        weights = [1 / (rank + 1) ** ZIPF_EXPONENT for rank in ranks]
+        total_weight = sum(weights)
+        self.counts = [int(stores * w / total_weight) for w in weights]
+        for i in sorted(range(len(ranks)), key=lambda i: ranks[i])[:stores - sum(self.counts)]:
+            self.counts[i] += 1
+        # offsets[i] 为第 i 个城市第一家门店的全国序号
+        self.offsets = [0]
+        for count in self.counts:
+            self.offsets.append(self.offsets[-1] + count)
+        self.total = self.offsets[-1]
+        self.city_index = {(p.name, c.name): i for i, (p, c) in enumerate(self.cities)}
+        self.city_by_code = {c.code: i for i, (_, c) in enumerate(self.cities)}
+
+    def locate(self, number: int) -> tuple[int, int]:
+        """全国序号 -> (城市序号, 城市内序号)"""
+        city = bisect_right(self.offsets, number) - 1
+        return city, number - self.offsets[city]
+
+    def store(self, city: int, j: int) -> dict:
+        """城市内第 j 家门店的通用字段"""
+        province, city_division = self.cities[city]
+        number = self.offsets[city] + j
+        district = DISTRICTS[(j // len(TUHU_SERVICE_TYPES)) % len(DISTRICTS)]
+        lon, lat = getattr(city_division, "location", None) or (116.4, 39.9)
+        return {
+            "id": number + 1,
+            "province": province.name,
+            "city": city_division.name,
+            "district": district,
+            "name": f"{city_division.name}{district}第{j + 1}号店",
+            "address": f"{province.name}{city_division.name}{district}{STREETS[j % len(STREETS)]}{j % 999 + 1}号",
+            "phone": f"0{10000000 + number * 7919 % 90000000}",
+            "lon": round(lon + (j % 101 - 50) * 0.002, 6),
+            "lat": round(lat + (j % 97 - 48) * 0.002, 6),
+        }
+
+    # 城市内第 j 家门店的区县为 (j // 4) % 8；美容、改装列表分别只含 j % 4 为 2、3 的门店。
+    # 因此某类型（及区县）列表中的第 k 家门店的城市内序号可以直接算出
+    def tuhu_count(self, city: int, service_type: str, district_index: int | None = None) -> int:
+        n = self.counts[city]
+        types, cycle = len(TUHU_SERVICE_TYPES), len(TUHU_SERVICE_TYPES) * len(DISTRICTS)
+        if service_type in TUHU_FULL_TYPES:
+            if district_index is None:
+                return n
+            return n // cycle * types + min(max(n % cycle - types * district_index, 0), types)
+        first = TUHU_SERVICE_TYPES.index(service_type)
+        if district_index is None:
+            return max(0, math.ceil((n - first) / types))
+        return max(0, math.ceil((n - first - types * district_index) / cycle))
+
+    def tuhu_store(self, city: int, service_type: str, district_index: int | None, k: int) -> dict:
+        types, cycle = len(TUHU_SERVICE_TYPES), len(TUHU_SERVICE_TYPES) * len(DISTRICTS)
+        if service_type in TUHU_REVERSED_TYPES:
+            k = self.tuhu_count(city, service_type, district_index) - 1 - k
+        if service_type in TUHU_FULL_TYPES:
+            if district_index is None:
+                return self.store(city, k)
+            return self.store(city, k // types * cycle + types * district_index + k % types)
+        first = TUHU_SERVICE_TYPES.index(service_type)
+        if district_index is None:
+            return self.store(city, first + types * k)
+        return self.store(city, first + types * district_index + cycle * k)
+
+    def province_stores(self, province_index: int) -> list[int]:
+        """省内各城市的序号"""
+        province, cities = self.provinces[province_index]
+        return [self.city_index[(province.name, c.name)] for c in cities]
+
+
+class ServerOptions:
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, throttle_rate: float = 0.0,
+                 capacity: float = 0.0, csrf_ttl: float = 0.0):
+        """
+        参数:
+            latency: 平均响应延迟（秒），实际在 0.5 ~ 1.5 倍之间随机
+            error_rate: 返回 HTTP 503 的概率
+            throttle_rate: 返回品牌限流信号的概率
+            capacity: 全部接口每秒最多正常处理的请求数，超出的请求返回限流信号；0 表示不限
+            csrf_ttl: 锦湖 CSRF token 的有效期（秒），过期后 POST 返回 403；0 表示不过期
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.capacity = capacity
+        self.csrf_ttl = csrf_ttl
+
+
+class ServerState:
+    """请求计数、容量令牌桶和锦湖的会话 token，在处理线程间共用"""
+
+    def __init__(self, options: ServerOptions):
+        self.options = options
+        self.lock = threading.Lock()
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.stats = {"requests": 0, "errors": 0, "throttled": 0}
+        self.csrf_tokens: dict[str, tuple[str, float]] = {}  # 会话 ID -> (token, 签发时间)
+
+    def admit(self) -> str | None:
+        """决定本次请求的结果：None 表示正常处理，"error" 或 "throttle" 表示模拟的异常"""
+        options = self.options
+        with self.lock:
+            self.stats["requests"] += 1
+            over_capacity = False
+            if options.capacity:
+                now = time.monotonic()
+                self.tokens = min(1.0, self.tokens + (now - self.updated) * options.capacity)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                else:
+                    over_capacity = True
+            if random.random() < options.error_rate:
+                self.stats["errors"] += 1
+                return "error"
+            if over_capacity or random.random() < options.throttle_rate:
+                self.stats["throttled"] += 1
+                return "throttle"
+        return None
+
+    def issue_csrf(self) -> tuple[str, str]:
+        session_id, token = secrets.token_hex(16), secrets.token_hex(16)
+        with self.lock:
+            self.csrf_tokens[session_id] = (token, time.monotonic())
+        return session_id, token
+
+    def check_csrf(self, session_id: str | None, token: str | None) -> bool:
+        with self.lock:
+            issued = self.csrf_tokens.get(session_id)
+        if issued is None or issued[0] != token:
+            return False
+        return not self.options.csrf_ttl or time.monotonic() - issued[1] < self.options.csrf_ttl
+
+
+def make_handler(catalog: StoreCatalog, state: ServerState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def send_body(self, body: bytes, status: int = 200, content_type: str = "application/json",
+                      headers: dict | None = None):
+            self.send_response(status)
+            self.send_header("Content-Type", f"{content_type};charset=UTF-8")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_json(self, data, status: int = 200):
+            self.send_body(json.dumps(data, ensure_ascii=False).encode("utf-8"), status)
+
+        def read_body(self) -> bytes:
+            # 不读完请求体会破坏 keep-alive 连接上的下一个请求
+            return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        def handle_request(self, method: str):
+            path = urlsplit(self.path).path
+            body = self.read_body() if method == "POST" else b""
+            route = ROUTES.get((method, path))
+            if route is None and method == "POST" and path.startswith(BYD_PATH):
+                route = byd
+            if route is None:
+                self.send_json({"message": "not found"}, 404)
+                return
+
+            if state.options.latency:
+                time.sleep(state.options.latency * random.uniform(0.5, 1.5))
+            outcome = state.admit()
+            if outcome == "error":
+                self.send_body(b"", 503)
+                return
+            route(self, body, throttled=outcome == "throttle")
+
+        def do_GET(self):
+            self.handle_request("GET")
+
+        def do_POST(self):
+            self.handle_request("POST")
+
+        def log_message(self, format, *args):
+            pass
+
+    def tuhu_cities(handler, body, throttled):
+        if throttled:
+            handler.send_json({"code": 40001, "message": "访问过于频繁"})
+            return
+        regions = {}
+        for province, city in catalog.cities:
+            letter = (city.name_en[:1] or "#").upper()
+            for i, district in enumerate(DISTRICTS):
+                regions.setdefault(letter, []).append({
+                    "province": province.name, "provinceId": int(province.code),
+                    "city": city.name, "cityId": int(city.code[:6]),
+                    "district": district, "districtId": int(city.code[:6]) * 100 + i + 1,
+                })
+        handler.send_json({"code": 10000, "data": {"regions": dict(sorted(regions.items()))}})
+
+    def tuhu_shops(handler, body, throttled):
+        if throttled:
+            handler.send_json({"code": 40001, "message": "访问过于频繁"})
+            return
+        payload = json.loads(body)
+        city = catalog.city_index.get((payload.get("province"), payload.get("city")))
+        service_type = payload.get("serviceType")
+        district = payload.get("district") or None
+        if city is None or service_type not in TUHU_SERVICE_TYPES or \
+                (district is not None and district not in DISTRICTS):
+            handler.send_json({"code": 10000, "data": {"shopList": [], "totalPage": 0}})
+            return
+        district_index = DISTRICTS.index(district) if district else None
+        page_size = int(payload.get("pageSize") or 20)
+        page = int(payload.get("pageIndex") or 1)
+        total = catalog.tuhu_count(city, service_type, district_index)
+        shops = []
+        if page <= TUHU_MAX_PAGES:
+            for k in range((page - 1) * page_size, min(page * page_size, total)):
+                store = catalog.tuhu_store(city, service_type, district_index, k)
+                shops.append({
+                    "shopBaseInfo": {
+                        "shopId": store["id"], "carparName": store["name"],
+                        "province": store["province"], "city": store["city"],
+                        "district": store["district"], "address": store["address"],
+                        "telephone": store["phone"],
+                        "longitude": store["lon"], "latitude": store["lat"],
+                    },
+                    "statistics": {"type": service_type},
+                })
+        handler.send_json({"code": 10000, "data": {
+            "shopList": shops, "totalPage": math.ceil(total / page_size), "totalCount": total}})
+
+    def hankook(handler, body, throttled):
+        if throttled:
+            handler.send_json({"resultCode": "9999", "message": "Too Many Requests"}, 429)
+            return
+        page = int(json.loads(body).get("page") or 1)
+        end_page = max(1, math.ceil(catalog.total / HANKOOK_PAGE_SIZE))
+        items = []
+        for number in range((page - 1) * HANKOOK_PAGE_SIZE, min(page * HANKOOK_PAGE_SIZE, catalog.total)):
+            city, j = catalog.locate(number)
+            store = catalog.store(city, j)
+            items.append({
+                "DEAL_NM": store["name"], "ADDR": store["address"],
+                "DEAL_TYPE1": "轮胎零售", "DEAL_TYPE2": "韩泰轮胎专卖店" if j % 3 == 0 else "",
+                "TEL_1_NO": store["phone"], "LAT": store["lat"], "LNG": store["lon"],
+            })
+        handler.send_json({"resultCode": "0000", "data": {
+            "ResultCount": catalog.total, "ResultList": items, "pg": {"endPage": str(end_page)}}})
+
+    def kumho_page(handler, body, throttled):
+        if throttled:
+            handler.send_body(b"Too Many Requests", 429, "text/plain")
+            return
+        session_id, token = state.issue_csrf()
+        options = "".join(f'<option value="{province.code}">{province.name}</option>'
+                          for province, _ in catalog.provinces)
+        html = (f'<html><head><meta name="_csrf" content="{token}"/>'
+                f'<meta name="_csrf_header" content="{KUMHO_CSRF_HEADER}"/></head>'
+                f'<body><select name="states"><option value="">省份</option>{options}</select>'
+                f'</body></html>')
+        handler.send_body(html.encode("utf-8"), content_type="text/html",
+                          headers={"Set-Cookie": f"JSESSIONID={session_id}; Path=/"})
+
+    def kumho_list(handler, body, throttled):
+        cookie = SimpleCookie(handler.headers.get("Cookie", ""))
+        session_id = cookie["JSESSIONID"].value if "JSESSIONID" in cookie else None
+        if not state.check_csrf(session_id, handler.headers.get(KUMHO_CSRF_HEADER)):
+            handler.send_body(b"Invalid CSRF Token", 403, "text/plain")
+            return
+        if throttled:
+            handler.send_body(b"Too Many Requests", 429, "text/plain")
+            return
+        form = {k: v[0] for k, v in parse_qs(body.decode("utf-8")).items()}
+        province = next((i for i, (p, _) in enumerate(catalog.provinces)
+                         if p.code == form.get("states")), None)
+        if province is None:
+            handler.send_json({"agncList": [], "totalCount": 0})
+            return
+        page_size = min(int(form.get("pageSize") or KUMHO_PAGE_SIZE), KUMHO_MAX_PAGE_SIZE)
+        offset = int(form.get("pageNum") or 0)
+        cities = catalog.province_stores(province)
+        total = sum(catalog.counts[c] for c in cities)
+        items = []
+        for number in range(offset, min(offset + page_size, total)):
+            # 省内序号 -> (城市, 城市内序号)
+            for city in cities:
+                if number < catalog.counts[city]:
+                    break
+                number -= catalog.counts[city]
+            store = catalog.store(city, number)
+            items.append({
+                "AGNC_NM": store["name"], "ADDR": store["address"], "CITY": store["city"],
+                "SIGUNGU_NM": store["district"], "TEL_NO": store["phone"],
+                "AGNC_GB_NM": "专卖店" if number % 4 == 0 else "经销店",
+                "LAT": store["lat"], "LNG": store["lon"],
+            })
+        handler.send_json({"agncList": items, "totalCount": total})
+
+    def byd(handler, body, throttled):
+        if throttled:
+            handler.send_json({"success": False, "data": None, "message": "系统繁忙"})
+            return
+        payload = json.loads(body or b"{}")
+        endpoint = urlsplit(handler.path).path[len(BYD_PATH):]
+        if endpoint == "province":
+            data = [{"n_province_id": p.code, "provinceName": p.name} for p, _ in catalog.provinces]
+        elif endpoint == "city":
+            province = next((cities for p, cities in catalog.provinces if p.code == payload.get("provinceId")), [])
+            data = [{"n_city_id": c.code, "cityName": c.name} for c in province]
+        elif endpoint == "list":
+            # 城市内门店按 j % 2 分为售前 / 售后，按 (j // 2) % 2 分为王朝 / 海洋网络
+            city = catalog.city_by_code.get(payload.get("cityId"))
+            dealer_type = BYD_DEALER_TYPES.index(payload["dealerType"]) if payload.get("dealerType") in BYD_DEALER_TYPES else None
+            network = BYD_SALE_NETWORKS.index(handler.headers.get("salenetwork", "2"))
+            stores = []
+            if city is not None and dealer_type is not None:
+                for j in range(dealer_type + 2 * network, catalog.counts[city], 4):
+                    stores.append(catalog.store(city, j))
+            page, per_page = int(payload.get("pageNum") or 0), int(payload.get("numPerPage") or 100)
+            data = [{"provinceName": s["province"], "cityName": s["city"], "dealerName": s["name"],
+                     "dealerAddress": s["address"], "dealerTel": s["phone"]}
+                    for s in stores[page * per_page:(page + 1) * per_page]]
+        else:
+            handler.send_json({"success": False, "data": None, "message": "not found"}, 404)
+            return
+        handler.send_json({"success": True, "data": data})
+
+    ROUTES = {
+        ("GET", TUHU_CITY_PATH): tuhu_cities,
+        ("POST", TUHU_SHOP_PATH): tuhu_shops,
+        ("POST", HANKOOK_PATH): hankook,
+        ("GET", KUMHO_PATH): kumho_page,
+        ("POST", KUMHO_PATH): kumho_list,
+    }
+    return Handler
+
+
+def start_server(stores: int = DEFAULT_STORES, options: ServerOptions | None = None,
+                 port: int = 0, seed: int = 0) -> tuple[ThreadingHTTPServer, ServerState, str]:
+    """
+    在后台线程中启动模拟服务
+
+    返回值:
+        (服务, 请求统计等状态, 供 SPIDER_BASE_URL 使用的地址)
+    """
+    catalog = StoreCatalog(stores, seed)
+    state = ServerState(options or ServerOptions())
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(catalog, state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟品牌接口的本地 HTTP 服务")
+    parser.add_argument("--stores", type=int, default=DEFAULT_STORES, help="每个品牌的门店数")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=float, default=0, help="平均响应延迟（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0, help="返回 HTTP 503 的概率")
+    parser.add_argument("--throttle-rate", type=float, default=0, help="返回品牌限流信号的概率")
+    parser.add_argument("--capacity", type=float, default=0, help="每秒最多正常处理的请求数，0 表示不限")
+    parser.add_argument("--csrf-ttl", type=float, default=0, help="锦湖 CSRF token 有效期（秒），0 表示不过期")
+    parser.add_argument("--seed", type=int, default=0, help="城市规模排名的随机种子")
+    args = parser.parse_args()
+
+    options = ServerOptions(args.latency / 1000, args.error_rate, args.throttle_rate,
+                            args.capacity, args.csrf_ttl)
+    server, state, base_url = start_server(args.stores, options, args.port, args.seed)
+    print(f"模拟服务已启动: {base_url}，每个品牌 {args.stores} 家门店")
+    print(f"    SPIDER_BASE_URL={base_url} SPIDER_PACING=0 python scripts/tuhu.py")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"请求 {state.stats['requests']} 次，503 {state.stats['errors']} 次，"
+                  f"限流 {state.stats['throttled']} 次")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
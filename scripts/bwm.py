@@ -6,8 +6,10 @@ import csv
 import time
 from time import sleep
 from urllib.parse import urljoin
-from requests.adapters import HTTPAdapter
 from util.location_translator import get_en_province, get_en_city
+from util.http_client import create_session
+from util.fetch_engine import RequestSpec, fetch_iter
+from util.http_cache import TTL_WEEK, cached_get, print_cache_stats
 
 # 路径配置
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -23,6 +25,11 @@ BASE_URL = "https://service-center-customer-api.lingyue-digital.com"
 PROVINCE_API = "/customer-dealer/dealer/area-province-city?level=0&parentId=1"
 CITY_API = "/customer-dealer/dealer/area-province-city?level=1&parentId=1"
 OUTLET_API_TEMPLATE = "/customer-dealer/dealer/outlets?brand=1&cityCode={city_code}&coordinateType=baidu&page={page}&pageSize=100"
+# 省市列表很少变化，缓存一周
+AREA_CACHE_TTL = TTL_WEEK
+# 并发获取门店时，同时进行的请求数与每秒请求数上限
+OUTLET_CONCURRENCY = 4
+OUTLET_RATE = 2.0
 
 # 请求头配置
 HEADERS = {
@@ -49,25 +56,21 @@ class DataValidator:
             raise ValueError(f"无效的城市数据结构: {city}")
 
 
-def create_session():
-    """创建带连接池的会话"""
-    session = requests.Session()
-    adapter = HTTPAdapter(
-        pool_connections=50,
-        pool_maxsize=100,
-        max_retries=3
-    )
-    session.mount('http://', adapter)
-    session.mount('https://', adapter)
-    return session
+def fetch_data(session, url, max_retries=3, ttl=None):
+    """
+    增强的请求函数
 
-
-def fetch_data(session, url, max_retries=3):
-    """增强的请求函数"""
+    参数:
+        ttl: 不为 None 时使用持久化缓存，单位秒
+    """
     for attempt in range(max_retries):
         try:
-            sleep(random.uniform(0.5, 1.5))
-            response = session.get(url, headers=HEADERS, timeout=(3, 15))
+            if ttl is not None:
+                response = cached_get(url, ttl, session=session, headers=HEADERS, timeout=(3, 15),
+                                      validate=lambda r: r.json().get('data'))
+            else:
+                sleep(random.uniform(0.5, 1.5))
+                response = session.get(url, headers=HEADERS, timeout=(3, 15))
             response.raise_for_status()
             return response.json().get('data', [])
         except (requests.exceptions.RequestException, json.JSONDecodeError) as e:
@@ -81,7 +84,7 @@ def get_provinces_and_cities(session):
     """获取所有省份和城市数据"""
     # 获取所有省份
     province_url = urljoin(BASE_URL, PROVINCE_API)
-    provinces = fetch_data(session, province_url)
+    provinces = fetch_data(session, province_url, ttl=AREA_CACHE_TTL)
     if not provinces:
         raise ValueError("无法获取省份数据")
     
@@ -90,54 +93,85 @@ def get_provinces_and_cities(session):
     
     # 获取所有城市
     city_url = urljoin(BASE_URL, CITY_API)
-    cities = fetch_data(session, city_url)
+    cities = fetch_data(session, city_url, ttl=AREA_CACHE_TTL)
     if not cities:
         raise ValueError("无法获取城市数据")
     
     return province_map, cities
 
 
-def get_outlets(session, city):
-    """获取指定城市的所有门店"""
+def outlet_url(city, page):
+    return urljoin(BASE_URL, OUTLET_API_TEMPLATE.format(city_code=city['code'], page=page))
+
+
+def parse_outlet_page(city, page, data, outlets):
+    """
+    解析一页门店数据并追加到 outlets
+
+    返回值:
+        还有下一页时返回 True
+    """
+    if not data:
+        return False
+
+    # 检查返回的数据结构
+    if isinstance(data, list):
+        # 如果是列表，直接添加到outlets
+        outlets.extend(data)
+        print(f"城市 {city['name']} 第 {page} 页，获取 {len(data)} 条")
+        return False  # 假设列表形式的返回只有一页
+    elif isinstance(data, dict):
+        # 如果是字典，按原来的逻辑处理
+        current_page = data.get('current', 1)
+        total_pages = data.get('pages', 1)
+        records = data.get('records', [])
+        outlets.extend(records)
+
+        print(f"城市 {city['name']} 第 {current_page}/{total_pages} 页，获取 {len(records)} 条")
+
+        return page < total_pages
+    else:
+        print(f"城市 {city['name']} 返回了未知的数据结构: {type(data)}")
+        return False
+
+
+def get_outlets(session, city, first_page_data=None):
+    """
+    获取指定城市的所有门店
+
+    参数:
+        first_page_data: 已并发获取的第一页数据，为 None 时在这里请求
+    """
     DataValidator.validate_city(city)
-    
+
     outlets = []
     page = 1
-    while True:
-        url = urljoin(BASE_URL, OUTLET_API_TEMPLATE.format(
-            city_code=city['code'],
-            page=page
-        ))
-        data = fetch_data(session, url)
-        if not data:
-            break
-
-        # 检查返回的数据结构
-        if isinstance(data, list):
-            # 如果是列表，直接添加到outlets
-            outlets.extend(data)
-            print(f"城市 {city['name']} 第 {page} 页，获取 {len(data)} 条")
-            break  # 假设列表形式的返回只有一页
-        elif isinstance(data, dict):
-            # 如果是字典，按原来的逻辑处理
-            current_page = data.get('current', 1)
-            total_pages = data.get('pages', 1)
-            records = data.get('records', [])
-            outlets.extend(records)
-
-            print(f"城市 {city['name']} 第 {current_page}/{total_pages} 页，获取 {len(records)} 条")
-
-            if page >= total_pages:
-                break
-        else:
-            print(f"城市 {city['name']} 返回了未知的数据结构: {type(data)}")
-            break
-            
+    data = first_page_data if first_page_data is not None else fetch_data(session, outlet_url(city, page))
+    while parse_outlet_page(city, page, data, outlets):
         page += 1
-    
+        data = fetch_data(session, outlet_url(city, page))
+
     return outlets
 
 
+def iter_city_outlets(session, cities):
+    """
+    并发获取各城市第一页门店（绝大多数城市只有一页），按城市顺序产出 (城市, 门店列表)
+
+    失败的请求交给 fetch_data 按原来的方式重试
+    """
+    def specs():
+        for city in cities:
+            DataValidator.validate_city(city)
+            yield RequestSpec(outlet_url(city, 1), headers=HEADERS, timeout=(3, 15), tag=city)
+
+    for result in fetch_iter(specs(), ordered=True, session=session,
+                             host_concurrency=OUTLET_CONCURRENCY, rate=OUTLET_RATE):
+        city = result.spec.tag
+        first_page_data = result.data.get('data', []) if result.ok and isinstance(result.data, dict) else None
+        yield city, get_outlets(session, city, first_page_data)
+
+
 def process_row(province, city, outlet):
     """处理单条数据"""
     return {
@@ -162,25 +196,26 @@ def main():
         writer = csv.DictWriter(f, fieldnames=CSV_HEADER)
         writer.writeheader()
 
-        with create_session() as session:
+        with create_session(pool_maxsize=100) as session:
             try:
                 # 获取所有省份和城市数据
                 province_map, cities = get_provinces_and_cities(session)
                 print(f"成功获取 {len(province_map)} 个省份和 {len(cities)} 个城市")
 
-                # 遍历城市
+                # 根据城市的parentId找到对应的省份，跳过省份不存在的城市
+                valid_cities = []
                 for city in cities:
-                    # 根据城市的parentId找到对应的省份
                     province_id = city.get('parentId')
                     if province_id not in province_map:
                         print(f"警告：城市 {city['name']}(ID:{city['id']}) 的省份ID {province_id} 不存在")
                         continue
-                    
-                    province = province_map[province_id]
+                    valid_cities.append(city)
+
+                # 并发获取各城市的门店，按城市顺序处理
+                for city, outlets in iter_city_outlets(session, valid_cities):
+                    province = province_map[city['parentId']]
                     print(f"\n处理城市: {city['name']}(ID:{city['id']})，所属省份: {province['name']}(ID:{province['id']})")
                     
-                    # 获取该城市的所有门店
-                    outlets = get_outlets(session, city)
                     if not outlets:
                         print(f"城市 {city['name']} 无门店数据")
                         continue
@@ -196,6 +231,9 @@ def main():
                 print(f"致命错误: {str(e)}")
                 raise
 
+            session.print_stats()
+            print_cache_stats()
+
     print(f"\n数据采集完成，存储路径: {OUTPUT_PATH}")
 
 
@@ -1,14 +1,17 @@
 import os
-import random
-import requests
 import json
 import csv
-from time import sleep
 from util.location_translator import get_en_province, get_en_city
+from util.http_client import api_url, create_session
+from util.http_cache import TTL_WEEK, cached_post, print_cache_stats
+from util.fetch_engine import RequestSpec, fetch_iter
+from util.rate_controller import get_controller, throttle
+from util.cassette import setup_cassette
 
-INTERVAL = 1  # 网络请求间隔（秒）
-
-API = "https://site-api.byd.com/domestic-official-api/store/"
+API = api_url("https://site-api.byd.com/domestic-official-api/store/")
+API_PROVINCE = API + "province"
+API_CITY = API + "city"
+API_DEALER = API + "list"
 
 RESULT_FIELDS = ["省", "Province", "市", "City", "区", "店名", "类型", "类型2", "地址", "电话", "备注"]
 
@@ -16,6 +19,19 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)#进入子目录
 OUTPUT_PATH = os.path.join(PROJECT_ROOT, "output/byd.csv")
 
+# 省市列表基本不变，缓存一周；两个销售网络共用同一份
+AREA_CACHE_TTL = TTL_WEEK
+
+SALE_NETWORKS = {"2": "王朝", "3": "海洋"}
+DEALER_TYPES = {"0": "售前经销", "1": "售后服务"}
+
+# 门店列表请求的并发数和速率（次/秒），速率跟随比亚迪接口的 AIMD 控制器
+DEALER_CONCURRENCY = 4
+DEALER_RATE = 1.0
+DEALER_MAX_RATE = 5.0
+MAX_RETRIES = 10  # 每个 城市 × 类型 × 销售网络 最多请求次数
+BATCH_SIZE = 100  # 每攒够多少行写入一次CSV
+
 default_payload = {
     "dealerKey": "",
     "provinceId": "",
@@ -25,8 +41,8 @@ default_payload = {
     "longtitude": 114.174328,  # 原文如此
     "latitude": 22.316554,
     "pageNum": 0,
-    "numPerPage": 100,
-    "dealerType": "0"
+    "numPerPage": 1000,
+    "dealerType": ""  # 0: 售前经销, 1: 售后服务
 }
 
 DEFAULT_HEADERS = {
@@ -35,138 +51,168 @@ DEFAULT_HEADERS = {
 }
 
 
-def sleep_with_random(interval: int,
-                      rand_max: int) -> None:
-    rand = random.random() * rand_max
-    sleep(interval + rand)
-
+def post_area(session, url: str, payload: dict) -> list:
+    """
+    请求省份或城市列表，成功的响应缓存 AREA_CACHE_TTL
 
-#创建父目录（如果不存在)
-os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
+    返回值:
+        data 列表；重试 MAX_RETRIES 次仍返回 success: false 时为空列表
+    """
+    for _ in range(MAX_RETRIES):
+        response = cached_post(url, AREA_CACHE_TTL, session=session,
+                               data=json.dumps(payload, ensure_ascii=False), headers=DEFAULT_HEADERS,
+                               validate=lambda r: r.json().get("success") is True)
+        data = response.json()
+        if data.get("success") is not False:
+            return data.get("data") or []
+        # 被限流时速率减半，重试前按新的速率等待
+        throttle(url, "HTTP请求成功但JSON返回失败，可能被限流")
+    print(f"获取失败: {url} {payload}")
+    return []
 
-with open(OUTPUT_PATH, "w", encoding="utf-8") as f: # 清除csv文件
-    # 写入表头
-    list_writer = csv.writer(f, quoting=csv.QUOTE_ALL)
-    list_writer.writerow(RESULT_FIELDS)
 
-dealer_count = 0
-for sale_network in {"2", "3"}:
-    sale_network_literal = ""
-    if sale_network == "2":
-        sale_network_literal = "王朝"
-    elif sale_network == "3":
-        sale_network_literal = "海洋"
-    print(f"开始处理 {sale_network_literal}")
+def get_city_ids(session) -> list:
+    """获取全部城市ID；省市列表与销售网络无关，只需获取一次"""
+    provinces = post_area(session, API_PROVINCE, {"dealerType": "0"})
+    print(f"获取到 {len(provinces)} 个省份信息")
 
     city_ids = []
-
-    # 获取省份列表
-    payload_provinces = {"dealerType": "0"}
-    api_province = API + "province"
-    response_provinces = requests.post(url=api_province,
-                                       data=json.dumps(payload_provinces, ensure_ascii=False),
-                                       headers=DEFAULT_HEADERS).json()
-
-    province_total = len(response_provinces["data"])
-    print(f"{sale_network_literal} 获取到 {province_total} 个省份信息")
-
-    province_ids = []
-    for m in response_provinces["data"]:
-        province_ids.append(m["n_province_id"])
-
-    # 分省处理
-    city_total = 0
-    api_city = API + "city"
-    for province_id in province_ids:
-        # 获取城市列表
-        payload_cities = {"dealerType": "0", "provinceId": province_id}
-        response_cities = requests.post(url=api_city,
-                                        data=json.dumps(payload_cities, ensure_ascii=False),
-                                        headers=DEFAULT_HEADERS).json()
-        city_total += len(response_cities["data"])
-        for m in response_cities["data"]:
-            city_ids.append(m["n_city_id"])
-
-    print(f"{sale_network_literal} 获取到 {city_total} 个城市信息")
-    processed_city = 0
-
-    # 分市处理
-    api_dealer = API + "list"
-    for city_id in city_ids:
-        payload_dealers_default = {
-            "dealerKey": "",
-            "provinceId": "",
-            "cityId": city_id,
-            "provinceName": "",
-            "cityName": "",
-            "longtitude": 114.174328,
-            "latitude": 22.316554,
-            "pageNum": 0,
-            "numPerPage": 1000,
-            "dealerType": ""  # 0: 售前经销, 1: 售后服务
-        }
-
-        for dealer_type in {"0", "1"}:
-            header_dealers = DEFAULT_HEADERS.copy()
-            header_dealers.update({"salenetwork": sale_network})
-            payload_dealers = payload_dealers_default.copy()
-            payload_dealers.update({"dealerType": dealer_type})
-
-            response_dealers = requests.post(url=api_dealer,
-                                             data=json.dumps(payload_dealers, ensure_ascii=False),
-                                             headers=header_dealers).json()
-            while response_dealers["success"] is False:
-                print("HTTP请求成功但JSON返回失败，可能被限流，10秒后重试……\n")
-                sleep_with_random(10, 1)
-                response_dealers = requests.post(url=api_dealer,
-                                                 data=json.dumps(payload_dealers, ensure_ascii=False),
-                                                 headers=header_dealers).json()
-            sleep_with_random(1, 1)
-
-            for m in response_dealers["data"]:
-                dealer_count += 1
-                # 删除\n
-                for k in m: # keys
-                    if isinstance(m[k], str):
-                        m[k] = m[k].replace('\\n', ' ').replace('\n', ' ')
-
-                dealer_type_literal = ""
-                if dealer_type == "0":
-                    dealer_type_literal = "售前经销"
-                elif dealer_type == "1":
-                    dealer_type_literal = "售后服务"
-
-                dealer_type2_literal = ""
-                has_attr = False
-                for attr in {"卫星", "城展", "服务", "4S"}:
-                    if attr in m["dealerName"] and '店' in m["dealerName"]:
-                        dealer_type2_literal += attr
-                        has_attr = True
-                if has_attr:
-                    dealer_type2_literal += '店'
-
-                for attr in {"商超店", "城市展厅", "钣喷中心"}:
-                    if attr in m["dealerName"]:
-                        dealer_type2_literal += attr
-
-                dealer = {
-                    "省": m["provinceName"],
-                    "Province": get_en_province(m["provinceName"]),
-                    "市": m["cityName"],
-                    "City": get_en_city(m["cityName"]),
-                    "区": "",
-                    "店名": m["dealerName"],
-                    "类型": dealer_type_literal,
-                    "类型2": dealer_type2_literal,
-                    "地址": m["dealerAddress"],
-                    "电话": m["dealerTel"],
-                    "备注": ""
-                }
-                print(dealer)
-                with open(OUTPUT_PATH, "a", encoding="utf-8", newline='') as f:
-                    dict_writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS, quoting=csv.QUOTE_ALL)
-                    dict_writer.writerow(dealer)
-        processed_city += 1
-        print(f"{sale_network_literal}: 已处理" + str('%.2f' % ((processed_city / city_total) * 100)) + "%")
-
-print("共计" + str(dealer_count) + "个门店")
\ No newline at end of file
+    for province in provinces:
+        cities = post_area(session, API_CITY, {"dealerType": "0", "provinceId": province["n_province_id"]})
+        city_ids.extend(m["n_city_id"] for m in cities)
+    print(f"获取到 {len(city_ids)} 个城市信息")
+    return city_ids
+
+
+def dealer_request(city_id, dealer_type: str, sale_network: str, attempt: int = 1) -> RequestSpec:
+    payload = dict(default_payload, cityId=city_id, dealerType=dealer_type)
+    headers = dict(DEFAULT_HEADERS, salenetwork=sale_network)
+    return RequestSpec(API_DEALER, "POST", data=json.dumps(payload, ensure_ascii=False),
+                       headers=headers, tag=(city_id, dealer_type, sale_network, attempt))
+
+
+def dealer_ok(result) -> bool:
+    return result.ok and result.data.get("success") is not False
+
+
+def retry_failed_dealer(result) -> list:
+    """请求失败或返回 success: false 时重试，最多 MAX_RETRIES 次"""
+    city_id, dealer_type, sale_network, attempt = result.spec.tag
+    if dealer_ok(result) or attempt >= MAX_RETRIES:
+        return []
+    return [dealer_request(city_id, dealer_type, sale_network, attempt + 1)]
+
+
+def iter_dealer_lists(session, city_ids: list):
+    """
+    并发抓取 城市 × 类型 × 销售网络 的门店列表
+
+    每个组合一个请求，最多 DEALER_CONCURRENCY 个同时进行，总速率跟随比亚迪接口的
+    AIMD 控制器（success: false 视为限流），不超过 DEALER_MAX_RATE。
+
+    返回值:
+        FetchResult 的生成器，按完成顺序产出，tag 为 (城市ID, 类型, 销售网络, 第几次请求)；
+        需要重试的结果也会产出，由调用方用 dealer_ok 和 tag 判断
+    """
+    specs = (dealer_request(city_id, dealer_type, sale_network)
+             for sale_network in SALE_NETWORKS for city_id in city_ids for dealer_type in DEALER_TYPES)
+    return fetch_iter(specs, expand=retry_failed_dealer, session=session,
+                      max_concurrency=DEALER_CONCURRENCY, host_concurrency=DEALER_CONCURRENCY,
+                      rate=DEALER_RATE, adaptive=True,
+                      throttle_check=lambda r: "success=false" if r.data.get("success") is False else None)
+
+
+def dealer_type2_of(dealer_name: str) -> str:
+    dealer_type2_literal = ""
+    has_attr = False
+    for attr in {"卫星", "城展", "服务", "4S"}:
+        if attr in dealer_name and '店' in dealer_name:
+            dealer_type2_literal += attr
+            has_attr = True
+    if has_attr:
+        dealer_type2_literal += '店'
+
+    for attr in {"商超店", "城市展厅", "钣喷中心"}:
+        if attr in dealer_name:
+            dealer_type2_literal += attr
+    return dealer_type2_literal
+
+
+def process_dealer(m: dict, dealer_type: str) -> dict:
+    # 删除\n
+    for k in m: # keys
+        if isinstance(m[k], str):
+            m[k] = m[k].replace('\\n', ' ').replace('\n', ' ')
+
+    return {
+        "省": m["provinceName"],
+        "Province": get_en_province(m["provinceName"]),
+        "市": m["cityName"],
+        "City": get_en_city(m["cityName"]),
+        "区": "",
+        "店名": m["dealerName"],
+        "类型": DEALER_TYPES[dealer_type],
+        "类型2": dealer_type2_of(m["dealerName"]),
+        "地址": m["dealerAddress"],
+        "电话": m["dealerTel"],
+        "备注": ""
+    }
+
+
+def main():
+    session = create_session(headers=DEFAULT_HEADERS)
+    # 省市列表和门店列表在同一主机上，速率控制器的参数只在首次创建时生效，须在请求省市列表之前设置
+    get_controller(API_DEALER, rate=DEALER_RATE, max_rate=DEALER_MAX_RATE)
+
+    city_ids = get_city_ids(session)
+    leaf_total = len(city_ids) * len(DEALER_TYPES) * len(SALE_NETWORKS)
+
+    #创建父目录（如果不存在)
+    os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
+
+    dealer_count = 0
+    processed = 0
+    failed = 0
+    dealers_buffer = []
+
+    # 结果都在主线程中按完成顺序处理；文件只打开一次，按批写入
+    with open(OUTPUT_PATH, "w", encoding="utf-8", newline='') as f:
+        dict_writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS, quoting=csv.QUOTE_ALL)
+        dict_writer.writeheader()
+
+        for result in iter_dealer_lists(session, city_ids):
+            city_id, dealer_type, sale_network, attempt = result.spec.tag
+            if not dealer_ok(result):
+                if attempt < MAX_RETRIES:
+                    continue  # 已安排重试
+                failed += 1
+                print(f"获取门店失败: {SALE_NETWORKS[sale_network]} 城市={city_id} "
+                      f"{DEALER_TYPES[dealer_type]}，已请求 {attempt} 次: {result.error or result.data}")
+            else:
+                for m in result.data["data"] or []:
+                    dealer = process_dealer(m, dealer_type)
+                    print(dealer)
+                    dealers_buffer.append(dealer)
+                    dealer_count += 1
+
+                if len(dealers_buffer) >= BATCH_SIZE:
+                    dict_writer.writerows(dealers_buffer)
+                    f.flush()
+                    dealers_buffer.clear()
+
+            processed += 1
+            print("已处理" + str('%.2f' % ((processed / leaf_total) * 100)) + "%")
+
+        # 写入剩余数据
+        dict_writer.writerows(dealers_buffer)
+
+    print("共计" + str(dealer_count) + "个门店")
+    if failed:
+        print(f"{failed} 个 城市 × 类型 × 销售网络 获取失败")
+    session.print_stats()
+    print_cache_stats()
+
+
+if __name__ == "__main__":
+    setup_cassette("byd")
+    main()
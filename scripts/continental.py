@@ -1,11 +1,9 @@
 import os
-import random
-import requests
 import json
 import csv
-from time import sleep
+from util.http_client import get_session
+from util.rate_controller import pace
 
-INTERVAL = 1  # 网络请求间隔（秒）
 API = "https://www.continental-tires.cn/tpservice/Search/searchAgency"
 RESULT_FIELDS = ["省", "Province", "市区辅助", "City", "区", "店名", "地址", "电话", "备注"]
 
@@ -14,10 +12,6 @@ PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
 OUTPUT_PATH = os.path.join(PROJECT_ROOT, "output/continental.csv")
 
 
-def sleep_with_random(interval: int, rand_max: int) -> None:
-    sleep(interval + random.random() * rand_max)
-
-
 # 创建父目录（如果不存在）
 os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
 
@@ -39,9 +33,9 @@ params = {
 }
 
 # 发送请求
-sleep_with_random(INTERVAL, 1)
+pace(API)
 try:
-    response = requests.get(API, params=params, headers=headers)
+    response = get_session().get(API, params=params, headers=headers)
     response.raise_for_status()
     shops = response.json()
 except Exception as e:
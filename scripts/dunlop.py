@@ -3,10 +3,14 @@ import ast
 import os
 import re
 import requests
+from html import unescape
+from urllib.parse import urlsplit
 from bs4 import BeautifulSoup
+from requests.utils import get_encoding_from_headers
 
 from util.bs_sleep import sleep_with_random
 from util.location_translator import get_en_province, get_en_city
+from util.http_client import api_url, get_session
 
 RESULT_FIELDS = ["省", "Province", "市", "City", "区", "店名", "类型", "地址", "电话", "备注"]
 DEFAULT_HEADERS = {
@@ -15,6 +19,19 @@ DEFAULT_HEADERS = {
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)#进入子目录
 OUTPUT_PATH = os.path.join(PROJECT_ROOT, "output/dunlop.csv")
+API = api_url("https://www.dunlop.com.cn/index_salearea.html")
+
+# 经销商列表页中的 <li onclick="inItBaiduMap(...)">，第 2 组为括号内的参数
+DEALER_PATTERN = re.compile(r"""<li\b[^>]*?\bonclick\s*=\s*(["'])\s*inItBaiduMap\((.*?)\);?\s*\1""", re.S)
+# 一个字符串或数字字面量，连同其后的逗号
+ARG_PATTERN = re.compile(r"""\s*(?:'((?:[^'\\]|\\.)*)'|"((?:[^"\\]|\\.)*)"|([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?))\s*(?:,|$)""", re.S)
+ESCAPE_PATTERN = re.compile(r"\\(.)", re.S)
+# 自行解码的转义，含义与 Python 字面量相同；其他转义（\uXXXX、\xNN、\0 等）交给 ast.literal_eval
+ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "\\": "\\", "'": "'", '"': '"'}
+META_CHARSET_PATTERN = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?([\w-]+)""", re.I)
+
+# 主机名 -> 页面编码，每个主机只判断一次
+_host_encodings: dict[str, str] = {}
 
 
 def save_dealers_to_csv(dealer: dict | list[dict], path: str) -> None:
@@ -30,49 +47,72 @@ def save_dealers_to_csv(dealer: dict | list[dict], path: str) -> None:
             print(e)
 
 
-def parse_baidu_map_string(s) -> dict:
+def parse_literal_args(args_str: str) -> tuple:
     """
-    解析类似 inItBaiduMap(...) 格式的字符串，返回包含地址、电话、类型和名称的字典
-    示例输入：inItBaiduMap(5196, '石牌镇梅溪路2号金象温泉城37幢2单元102室', '15759065582', 'D驾族', '大田县鑫铭轮胎店', 117.8459027000, 25.6551277600);
-    """
-    # 使用正则表达式提取括号内的参数部分
-    pattern = r'(?<=inItBaiduMap\()(.*)(?=\);?)'
-    match = re.search(pattern, s)
-
-    if not match:
-        raise ValueError("输入字符串不符合 inItBaiduMap(...) 格式")
-
-    # 获取所有参数组成的字符串
-    args_str = match.group(1)
+    解析 inItBaiduMap(...) 括号内的参数，只支持字符串和数字字面量
 
+    示例输入：5196, '石牌镇梅溪路2号金象温泉城37幢2单元102室', '15759065582', 'D驾族', '大田县鑫铭轮胎店', 117.8459027000, 25.6551277600
+    遇到无法识别的写法（ESCAPES 以外的转义、007 这样的前导零整数等）时交给 ast.literal_eval，结果与之一致
+    """
+    args = []
+    pos, end = 0, len(args_str)
+    while pos < end:
+        match = ARG_PATTERN.match(args_str, pos)
+        if not match or match.end() == pos:
+            return literal_eval_args(args_str)
+        single, double, number = match.groups()
+        if number is not None:
+            if any(c in number for c in '.eE'):
+                args.append(float(number))
+            elif number.lstrip('+-').startswith('0') and number.strip('+-0'):
+                return literal_eval_args(args_str)  # 前导零整数，literal_eval 会报错
+            else:
+                args.append(int(number))
+        else:
+            value = single if single is not None else double
+            if '\\' in value:
+                if any(c not in ESCAPES for c in ESCAPE_PATTERN.findall(value)):
+                    return literal_eval_args(args_str)
+                value = ESCAPE_PATTERN.sub(lambda m: ESCAPES[m.group(1)], value)
+            args.append(value)
+        pos = match.end()
+    return tuple(args)
+
+
+def literal_eval_args(args_str: str) -> tuple:
+    """用 ast.literal_eval 解析参数，失败时抛出 ValueError"""
     try:
-        # 创建完整的元组字符串并安全评估（eval）为Python对象
-        tuple_str = f'({args_str})'
-        args = ast.literal_eval(tuple_str)
+        return ast.literal_eval(f'({args_str},)')
     except (SyntaxError, ValueError) as e:
         raise ValueError(f"参数解析错误: {e}") from e
 
+
+def dealer_from_args(args: tuple) -> dict:
+    """由 inItBaiduMap 的参数构建包含地址、电话、类型和名称的字典"""
     # 检查参数数量是否足够
     if len(args) < 5:
         raise ValueError(f"参数数量不足，至少需要5个，实际得到{len(args)}个")
 
-    # 提取所需信息并构建结果字典
-    result = {
+    return {
         "地址": args[1],  # 第二个参数是地址
         "电话": args[2],  # 第三个参数是电话
         "类型": args[3],  # 第四个参数是类型
         "店名": args[4]  # 第五个参数是名称
     }
 
-    return result
 
+def extract_dealers(html: str) -> list[dict]:
+    """
+    从经销商列表页的原始HTML中提取全部经销商
 
-def get_dealers(soup) -> list[dict]:
+    不构建 DOM 树，用一个预编译的正则顺序扫描页面中的每个 <li onclick="inItBaiduMap(...)">
+    """
     dealers: list[dict] = list()
-    dealers_elem = soup.select('div.location_list > ul > li')
-    for e in dealers_elem:
-        p_id = e.get('onclick')
-        dealers.append(parse_baidu_map_string(p_id))
+    for match in DEALER_PATTERN.finditer(html):
+        args_str = match.group(2).strip()
+        if '&' in args_str:  # 属性值中的 &#39; 等字符实体
+            args_str = unescape(args_str)
+        dealers.append(dealer_from_args(parse_literal_args(args_str)))
     return dealers
 
 
@@ -96,16 +136,34 @@ def get_cities(soup) -> dict:
     return city_ids
 
 
-def fetch_html(url):
+def detect_encoding(response) -> str:
+    """按响应头（其次是页面开头的 <meta charset>）判断编码，都没有时才对内容做一次完整检测"""
+    if 'charset=' in response.headers.get('content-type', '').lower():
+        encoding = get_encoding_from_headers(response.headers)
+    elif match := META_CHARSET_PATTERN.search(response.content[:2048]):
+        encoding = match.group(1).decode('ascii')
+    else:
+        encoding = response.apparent_encoding or 'utf-8'
+    # GB2312/GBK 页面中常混有超出字符集的字，按其超集 GB18030 解码
+    return 'gb18030' if encoding.lower() in ('gb2312', 'gbk') else encoding
+
+
+def page_text(response) -> str:
+    """解码页面；同一主机只在第一个页面判断编码，之后直接沿用"""
+    host = urlsplit(response.url).netloc
+    if host not in _host_encodings:
+        _host_encodings[host] = detect_encoding(response)
+    return response.content.decode(_host_encodings[host], errors='replace')
+
+
+def fetch_html(url, params=None):
     try:
         # 发送 GET 请求
-        response = requests.get(url, headers=DEFAULT_HEADERS, timeout=10)
+        response = get_session().get(url, params=params, headers=DEFAULT_HEADERS, timeout=10)
 
         # 检查响应状态
         if response.status_code == 200:
-            # 处理可能的编码问题
-            response.encoding = response.apparent_encoding
-            return response.text
+            return page_text(response)
         else:
             print(f"请求失败，状态码: {response.status_code}")
             return None
@@ -122,11 +180,11 @@ def main():
         list_writer = csv.writer(f, quoting=csv.QUOTE_ALL)
         list_writer.writerow(RESULT_FIELDS)
 
-    api = "https://www.dunlop.com.cn/index_salearea.html"
-
     dealer_count: int = 0
 
-    html_content = fetch_html(api)
+    html_content = fetch_html(API)
+    if html_content is None:
+        return
 
     # 使用BeautifulSoup解析HTML
     provinces_soup = BeautifulSoup(html_content, 'html.parser')
@@ -139,9 +197,9 @@ def main():
             "paction": "getlist",
             "prov_id": province_id
         }
-        response = requests.get(api, params=city_params, headers=DEFAULT_HEADERS)
-        response.raise_for_status()  # 如果状态码非200，抛出异常
-        cities_html = response.text
+        cities_html = fetch_html(API, city_params)
+        if cities_html is None:
+            continue
         cities_soup = BeautifulSoup(cities_html, 'html.parser')
         cities: dict = get_cities(cities_soup)
         print(f'当前省份已获取{len(cities)}个城市')
@@ -150,11 +208,10 @@ def main():
                 "prov": province_id,
                 "city": city_id
             }
-            response = requests.get(api, params=dealer_params, headers=DEFAULT_HEADERS)
-            response.raise_for_status()  # 如果状态码非200，抛出异常
-            dealers_html = response.text
-            dealers_soup = BeautifulSoup(dealers_html, 'html.parser')
-            dealers: list[dict] = get_dealers(dealers_soup)
+            dealers_html = fetch_html(API, dealer_params)
+            if dealers_html is None:
+                continue
+            dealers: list[dict] = extract_dealers(dealers_html)
             for d in dealers:
                 attr_province: str = province_name
                 attr_city: str = str()
@@ -1,184 +1,241 @@
 import os
-import requests
+import time
 import pandas as pd
-import json
-import re
-from datetime import datetime
+from util.gazetteer import CACHE_DIR, load_gazetteer, read_cache, write_cache
+from util.divisions import LEVEL_CITY, load_division_index
+from util.address_segmenter import segment_address
+from util.http_client import api_url, get_session
+from util.fetch_engine import RequestSpec, fetch_iter
 
 # Constants
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
 OUTPUT_PATH = os.path.join(PROJECT_ROOT, "output/geely.csv")
+REGION_INDEX_PATH = os.path.join(CACHE_DIR, "geely_regions.pickle")
+REGION_INDEX_SIGNATURE = "geely_regions"
+# 地区索引的格式版本，与 gazetteer 的 CACHE_VERSION 无关
+REGION_INDEX_VERSION = 1
+# 有服务商的地区每隔一段时间重新发现一次，以免漏掉新开服务商的城市
+REGION_INDEX_TTL = 30 * 24 * 3600
 
 # API URLs
-SERVICE_PROVIDER_URL = "https://www.geely.com/api/geely/official/common/GetServiceProviderList"
-BATTERY_RECYCLE_URL = "https://www.geely.com/api/geely/official/common/GetBatteryRecycle"
+SERVICE_PROVIDER_URL = api_url("https://www.geely.com/api/geely/official/common/GetServiceProviderList")
+BATTERY_RECYCLE_URL = api_url("https://www.geely.com/api/geely/official/common/GetBatteryRecycle")
+
+KIND_PROVIDER = "provider"
+KIND_BATTERY = "battery"
+
+# 按地区查询时的并发数和初始速率（次/秒）
+REGION_CONCURRENCY = 4
+REGION_RATE = 2.0
+MAX_RETRIES = 3
 
 # Result fields as specified
 RESULT_FIELDS = ["省", "Province", "市区辅助", "City", "区", "店名", "类型", "地址", "电话", "备注"]
 
-# Load provinces and cities data
-PROVINCES_FILE = os.path.join(SCRIPT_DIR, "util", "provinces.json")
-CITIES_FILE = os.path.join(SCRIPT_DIR, "util", "cities.json")
+def extract_location_info(address):
+    """从地址中提取省市区信息"""
+    return segment_address(address)
 
-provinces_data = {}
-cities_data = {}
 
-try:
-    with open(PROVINCES_FILE, 'r', encoding='utf-8') as f:
-        provinces_data = json.load(f)
-except (FileNotFoundError, json.JSONDecodeError) as e:
-    print(f"Warning: Could not load provinces data: {e}")
+def api_data(result):
+    """请求成功且 isSuccess 时返回 data 列表，否则打印原因并返回 None"""
+    if not result.ok:
+        print(f"Request error: {result.error}")
+        return None
+    if result.data.get("isSuccess") and result.data.get("status") == 200:
+        return result.data.get("data") or []
+    print(f"API request failed: {result.data.get('message')}")
+    return None
 
-try:
-    with open(CITIES_FILE, 'r', encoding='utf-8') as f:
-        cities_data = json.load(f)
-except (FileNotFoundError, json.JSONDecodeError) as e:
-    print(f"Warning: Could not load cities data: {e}")
 
+def candidate_regions():
+    """
+    由行政区划索引（stand_city.json）生成候选的 (provinceId, cityId)
 
-def extract_location_info(address):
-    """从地址中提取省市区信息"""
-    province = ""
-    city = ""
-    district = ""
-
-    if not address:
-        return province, city, district
-
-    # 省份匹配
-    province_patterns = [
-        r'(\w+省)', r'(\w+自治区)', r'(北京市|上海市|天津市|重庆市)',
-        r'(内蒙古|广西|西藏|宁夏|新疆)\w*自治区', r'(香港|澳门)\w*特别行政区'
-    ]
-
-    for pattern in province_patterns:
-        match = re.search(pattern, address)
-        if match:
-            province = match.group(1)
-            break
-
-    # 城市匹配
-    city_patterns = [r'(\w+市)', r'(\w+州)', r'(\w+盟)', r'(\w+地区)']
-    for pattern in city_patterns:
-        matches = re.findall(pattern, address)
-        if matches:
-            # 取第一个非省级城市
-            for match in matches:
-                if match != province:
-                    city = match
-                    break
-
-    # 区县匹配
-    district_patterns = [r'(\w+区)', r'(\w+县)', r'(\w+旗)']
-    for pattern in district_patterns:
-        match = re.search(pattern, address)
-        if match:
-            district = match.group(1)
-            break
-
-    return province, city, district
-
-
-def make_api_request(url, params=None):
-    """Makes a GET request to the specified URL with optional parameters."""
-    try:
-        response = requests.get(url, params=params, timeout=20)
-        response.raise_for_status()
-        data = response.json()
-        if data.get("isSuccess") and data.get("status") == 200:
-            return data.get("data", [])
-        else:
-            print(f"API request failed: {data.get('message')}")
+    假设吉利接口使用六位国标代码，如 ("330000", "330100")；仓库中没有依据证实这一点，
+    这些地区都查不到服务商时，fetch_locations 改用 legacy_probe_regions
+    """
+    index = load_division_index()
+    regions = []
+    for division in index.divisions.values():
+        if division.level == LEVEL_CITY:
+            regions.append((division.parent_code.ljust(6, "0"), division.code[:6]))
+    return regions
+
+
+def legacy_probe_regions():
+    """原先逐个试探的 (provinceId, cityId)：provinceId 为 10..340，cityId 为 2{provinceId:03d}{序号:02d}"""
+    return [(str(province_id), f"2{province_id:03d}{city_id:02d}")
+            for province_id in range(10, 350, 10) for city_id in range(1, 50)]
+
+
+def load_region_index():
+    """读取上次发现的有服务商的地区，不存在、为空或超过 REGION_INDEX_TTL 时返回 None"""
+    cached = read_cache(REGION_INDEX_SIGNATURE, REGION_INDEX_PATH, REGION_INDEX_VERSION)
+    if not cached or not cached["regions"] or time.time() - cached["discovered_at"] > REGION_INDEX_TTL:
+        return None
+    return cached["regions"]
+
+
+def save_region_index(regions) -> None:
+    write_cache(REGION_INDEX_SIGNATURE, {"regions": sorted(regions), "discovered_at": time.time()},
+                REGION_INDEX_PATH, REGION_INDEX_VERSION)
+
+
+def provider_request(region=None, attempt: int = 1) -> RequestSpec:
+    params = {"provinceId": region[0], "cityId": region[1]} if region else None
+    return RequestSpec(SERVICE_PROVIDER_URL, params=params, timeout=20,
+                       tag=(KIND_PROVIDER, region, attempt))
+
+
+def battery_recycle_request(attempt: int = 1) -> RequestSpec:
+    return RequestSpec(BATTERY_RECYCLE_URL, timeout=20, tag=(KIND_BATTERY, None, attempt))
+
+
+def next_requests(result, regions) -> list:
+    """
+    某个请求完成后的后续请求：请求失败时重试；
+    不带参数的服务商请求没有返回数据时，改为按地区并发查询
+    """
+    kind, region, attempt = result.spec.tag
+    if not result.ok:
+        if attempt >= MAX_RETRIES:
             return []
-    except requests.exceptions.RequestException as e:
-        print(f"Request error: {e}")
-        return []
-    except json.JSONDecodeError as e:
-        print(f"JSON decode error: {e}")
-        return []
+        if kind == KIND_BATTERY:
+            return [battery_recycle_request(attempt + 1)]
+        return [provider_request(region, attempt + 1)]
+    if kind == KIND_PROVIDER and region is None and not result.data.get("data"):
+        print(f"尝试按 {len(regions)} 个地区获取服务商数据...")
+        return [provider_request(r) for r in regions]
+    return []
+
+
+def query_locations(specs, regions, providers: dict):
+    """
+    执行一轮请求，服务商按 DealerId 去重后合并到 providers
+
+    返回值:
+        (电池回收点列表，未请求时为 None, 有服务商的地区, 是否按地区查询过, 是否有地区请求最终失败)
+    """
+    locations = None
+    found_regions = set()
+    region_queried = False
+    region_failed = False
+    for result in fetch_iter(specs, expand=lambda r: next_requests(r, regions),
+                             max_concurrency=REGION_CONCURRENCY, host_concurrency=REGION_CONCURRENCY,
+                             rate=REGION_RATE, adaptive=True):
+        kind, region, attempt = result.spec.tag
+        if not result.ok and attempt < MAX_RETRIES:
+            continue  # 已安排重试
+        data = api_data(result) if result.ok else None
+        if kind == KIND_BATTERY:
+            locations = data or []
+            continue
+        if region is not None:
+            region_queried = True
+            region_failed = region_failed or data is None
+        if data:
+            if region is not None:
+                found_regions.add(region)
+            for provider in data:
+                key = provider.get("DealerId") or (provider.get("DealerName"), provider.get("Address"))
+                providers.setdefault(key, provider)
+    return locations, found_regions, region_queried, region_failed
+
+
+def fetch_locations():
+    """
+    并发获取服务商和电池回收点
+
+    服务商接口先不带参数请求一次；没有返回数据时按地区查询。
+    地区优先使用 cache/ 中上次发现的有服务商的地区，否则查询全部候选地区（candidate_regions）；
+    这些地区都没有服务商时，说明地区代码的假设可能不对，改用 legacy_probe_regions 再查一遍。
+    查询完后把有服务商的地区保存下来；有地区请求最终失败或一个地区都没发现时不保存，
+    以免下次运行漏掉地区。电池回收点与服务商同时请求。
+
+    返回值:
+        (服务商列表, 电池回收点列表)，服务商按 DealerId 去重
+    """
+    cached_regions = load_region_index()
+    regions = cached_regions if cached_regions is not None else candidate_regions()
+
+    providers = {}
+    locations, found_regions, region_queried, region_failed = query_locations(
+        [provider_request(), battery_recycle_request()], regions, providers)
+    rediscovered = cached_regions is None
+
+    if region_queried and not found_regions:
+        print(f"警告: 按 {len(regions)} 个地区查询都没有服务商，地区代码可能不是接口使用的编号，"
+              f"改用原先的 provinceId/cityId 探测方案")
+        regions = legacy_probe_regions()
+        _, found_regions, _, region_failed = query_locations(
+            [provider_request(region) for region in regions], regions, providers)
+        rediscovered = True
+        if not found_regions:
+            print("警告: 两种地区编号都没有查到服务商，服务商数据为空")
+
+    if region_queried and rediscovered:
+        if found_regions and not region_failed:
+            print(f"发现 {len(found_regions)} 个有服务商的地区，已保存到 {REGION_INDEX_PATH}")
+            save_region_index(found_regions)
+        else:
+            print(f"发现 {len(found_regions)} 个有服务商的地区，有地区请求失败或结果为空，不保存地区索引")
+    return list(providers.values()), locations or []
 
 
-def process_service_providers():
+def location_names(address):
+    province, city, district = extract_location_info(address)
+    # 获取英文省市名称
+    gazetteer = load_gazetteer()
+    return province, gazetteer.provinces.get(province, ""), city, gazetteer.cities.get(city, ""), district
+
+
+def process_service_providers(providers):
     """处理服务商数据"""
-    print("开始爬取吉利服务商信息...")
     all_data = []
-
-    # 尝试不同的参数组合来获取数据
-    # 根据API响应，看起来可以直接调用而不需要特定参数
-    providers = make_api_request(SERVICE_PROVIDER_URL)
-
-    if not providers:
-        # 如果直接调用失败，尝试一些常见的参数
-        print("尝试使用参数获取数据...")
-        for province_id in range(10, 350, 10):
-            for city_id in range(1, 50):
-                params = {
-                    "provinceId": str(province_id),
-                    "cityId": f"2{province_id:03d}{city_id:02d}"
-                }
-                providers = make_api_request(SERVICE_PROVIDER_URL, params)
-                if providers:
-                    break
-            if providers:
-                break
-
-    if providers:
-        for provider in providers:
-            address = provider.get("Address", "")
-            province, city, district = extract_location_info(address)
-
-            # 获取英文省市名称
-            province_en = provinces_data.get(province, "")
-            city_en = cities_data.get(city, "")
-
-            data_row = {
-                "省": province,
-                "Province": province_en,
-                "市区辅助": city,
-                "City": city_en,
-                "区": district,
-                "店名": provider.get("DealerName", ""),
-                "类型": "服务商",
-                "地址": address,
-                "电话": provider.get("HotLine", ""),
-                "备注": f"DealerId:{provider.get('DealerId', '')}, Code:{provider.get('DealerCode', '')}, 坐标:{provider.get('Coordinates', '')}"
-            }
-            all_data.append(data_row)
+    for provider in providers:
+        address = provider.get("Address", "")
+        province, province_en, city, city_en, district = location_names(address)
+
+        data_row = {
+            "省": province,
+            "Province": province_en,
+            "市区辅助": city,
+            "City": city_en,
+            "区": district,
+            "店名": provider.get("DealerName", ""),
+            "类型": "服务商",
+            "地址": address,
+            "电话": provider.get("HotLine", ""),
+            "备注": f"DealerId:{provider.get('DealerId', '')}, Code:{provider.get('DealerCode', '')}, 坐标:{provider.get('Coordinates', '')}"
+        }
+        all_data.append(data_row)
 
     print(f"服务商数据获取完成，共{len(all_data)}条记录")
     return all_data
 
 
-def process_battery_recycle():
+def process_battery_recycle(locations):
     """处理电池回收点数据"""
-    print("开始爬取吉利电池回收点信息...")
     all_data = []
-
-    locations = make_api_request(BATTERY_RECYCLE_URL)
-
-    if locations:
-        for location in locations:
-            address = location.get("Address", "")
-            province, city, district = extract_location_info(address)
-
-            # 获取英文省市名称
-            province_en = provinces_data.get(province, "")
-            city_en = cities_data.get(city, "")
-
-            data_row = {
-                "省": province,
-                "Province": province_en,
-                "市区辅助": city,
-                "City": city_en,
-                "区": district,
-                "店名": location.get("UnitName", ""),
-                "类型": "电池回收点",
-                "地址": address,
-                "电话": location.get("PhoneNo", ""),
-                "备注": f"UnitId:{location.get('UnitId', '')}, UnitNo:{location.get('UnitNo', '')}, 坐标:{location.get('Coordinates', '')}"
-            }
-            all_data.append(data_row)
+    for location in locations:
+        address = location.get("Address", "")
+        province, province_en, city, city_en, district = location_names(address)
+
+        data_row = {
+            "省": province,
+            "Province": province_en,
+            "市区辅助": city,
+            "City": city_en,
+            "区": district,
+            "店名": location.get("UnitName", ""),
+            "类型": "电池回收点",
+            "地址": address,
+            "电话": location.get("PhoneNo", ""),
+            "备注": f"UnitId:{location.get('UnitId', '')}, UnitNo:{location.get('UnitNo', '')}, 坐标:{location.get('Coordinates', '')}"
+        }
+        all_data.append(data_row)
 
     print(f"电池回收点数据获取完成，共{len(all_data)}条记录")
     return all_data
@@ -194,12 +251,15 @@ def main():
     # 获取所有数据
     all_data = []
 
+    # 服务商和电池回收点同时请求
+    providers, locations = fetch_locations()
+
     # 处理服务商数据
-    service_data = process_service_providers()
+    service_data = process_service_providers(providers)
     all_data.extend(service_data)
 
     # 处理电池回收点数据
-    battery_data = process_battery_recycle()
+    battery_data = process_battery_recycle(locations)
     all_data.extend(battery_data)
 
     # 保存数据
@@ -218,6 +278,8 @@ def main():
     else:
         print("未获取到任何数据")
 
+    get_session().print_stats()
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
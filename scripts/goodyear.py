@@ -1,25 +1,29 @@
-import io
 import json
 import os
 import csv
-import random
-import time
-import requests
-import bs4
+from html.parser import HTMLParser
 from typing import Dict, List
-import chardet
-import gzip
 from util.location_translator import get_en_province, get_en_city
+from util.http_client import api_url, get_session
+from util.http_cache import TTL_WEEK, cached_get, print_cache_stats
+from util.fetch_engine import RequestSpec, fetch_iter
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
 OUTPUT_DIR = os.path.join(PROJECT_ROOT, "output")
 OUTPUT_PATH = os.path.join(OUTPUT_DIR, "goodyear.csv")
-global totalCount
 
 # API配置
-LOCATION_API = "https://www.goodyear.com.cn/wp-content/themes/goodyearforward/js/store/location-filter.json"
-STORE_API = "https://www.goodyear.com.cn/wp-admin/admin-ajax.php"
+LOCATION_API = api_url("https://www.goodyear.com.cn/wp-content/themes/goodyearforward/js/store/location-filter.json")
+STORE_API = api_url("https://www.goodyear.com.cn/wp-admin/admin-ajax.php")
+# 省市筛选表是静态文件，缓存一周
+LOCATION_CACHE_TTL = TTL_WEEK
+
+PAGE_SIZE = 15
+# 各省份各页并发请求，速率（次/秒）跟随固特异主机的 AIMD 控制器
+CONCURRENCY = 4
+RATE = 1.0
+MAX_RETRIES = 3  # 每页最多请求次数
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
@@ -43,39 +47,122 @@ def init_output():
             writer.writerow(CSV_HEADER)
 
 
-def sleep_random(base: int = 2, rand_max: int = 3):
-    time.sleep(base + random.uniform(0, rand_max))
-
-
 def fetch_provinces() -> Dict:
     try:
-        response = requests.get(LOCATION_API, headers=HEADERS)
+        # 只缓存非空的地区列表，拦截页或报错的响应不缓存
+        response = cached_get(LOCATION_API, LOCATION_CACHE_TTL, headers=HEADERS,
+                              validate=lambda r: bool(r.json()))
         return response.json() if response.status_code == 200 else {}
     except Exception as e:
         print(f"获取地区数据失败: {str(e)}")
         return {}
 
 
+class StoreCardParser(HTMLParser):
+    """
+    单次扫描 resultHTML，提取每个 article.store-card 中的店名、地址、省市和电话，不构建 DOM 树
+
+    每个门店得到一个字典：name（a.inline-link-p1 的文本）、address（.address-street 的文本）、
+    region（.address-city-state 的文本）、phone（.phone-no-analytics 中第一个链接的 href），
+    缺少的字段为 None。与 BeautifulSoup 的 find/select_one 一样，同名字段只取第一个。
+    """
+
+    # class -> (字段, 限定的标签)
+    TEXT_FIELDS = {
+        "inline-link-p1": ("name", "a"),
+        "address-street": ("address", None),
+        "address-city-state": ("region", None),
+    }
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.cards: List[Dict] = []
+        self.card = None
+        self.card_depth = 0  # 当前门店内 article 的嵌套层数
+        self.captures = []  # 正在收集文本的字段: [字段, 标签, 嵌套层数, 文本片段]
+        self.phone_tag = None  # .phone-no-analytics 元素: [标签, 嵌套层数]
+
+    def handle_starttag(self, tag, attrs):
+        classes = (dict(attrs).get("class") or "").split()
+        if self.card is None:
+            if tag == "article" and "store-card" in classes:
+                self.card = {"name": None, "address": None, "region": None, "phone": None}
+                self.card_depth = 1
+            return
+
+        if tag == "article":
+            self.card_depth += 1
+        for capture in self.captures:
+            if capture[1] == tag:
+                capture[2] += 1
+        if self.phone_tag and self.phone_tag[0] == tag:
+            self.phone_tag[1] += 1
+
+        for cls in classes:
+            if cls in self.TEXT_FIELDS:
+                field, only_tag = self.TEXT_FIELDS[cls]
+                if self.card[field] is None and (only_tag is None or only_tag == tag) \
+                        and not any(c[0] == field for c in self.captures):
+                    self.captures.append([field, tag, 1, []])
+        if self.phone_tag and tag == "a" and self.card["phone"] is None:
+            self.card["phone"] = dict(attrs).get("href") or ""
+        if "phone-no-analytics" in classes and self.phone_tag is None:
+            self.phone_tag = [tag, 1]
+
+    def handle_endtag(self, tag):
+        if self.card is None:
+            return
+        for capture in list(self.captures):
+            if capture[1] == tag:
+                capture[2] -= 1
+                if capture[2] == 0:
+                    self.card[capture[0]] = "".join(capture[3])
+                    self.captures.remove(capture)
+        if self.phone_tag and self.phone_tag[0] == tag:
+            self.phone_tag[1] -= 1
+            if self.phone_tag[1] == 0:
+                self.phone_tag = None
+        if tag == "article":
+            self.card_depth -= 1
+            if self.card_depth == 0:
+                # 未闭合的字段按已收集到的文本计
+                for capture in self.captures:
+                    self.card[capture[0]] = "".join(capture[3])
+                self.cards.append(self.card)
+                self.card, self.captures, self.phone_tag = None, [], None
+
+    def handle_data(self, data):
+        for capture in self.captures:
+            capture[3].append(data)
+
+
+def parse_store_cards(html: str) -> List[Dict]:
+    parser = StoreCardParser()
+    parser.feed(html)
+    parser.close()
+    return parser.cards
+
+
 def parse_store(html: str) -> List[Dict]:
-    soup = bs4.BeautifulSoup(html, 'html.parser')
     stores = []
 
-    for article in soup.find_all('article', class_='store-card'):
+    for card in parse_store_cards(html):
         try:
             # 基础信息解析
-            name = article.find('a', class_='inline-link-p1').text.strip()
-            address = article.select_one('.address-street').text.strip()
-            phone_element = article.select_one('.phone-no-analytics a')
-            phone = phone_element['href'].replace('tel:', '') if phone_element else ''
+            if card["name"] is None or card["address"] is None:
+                raise ValueError("缺少店名或地址")
+            name = card["name"].strip()
+            address = card["address"].strip()
+            phone = card["phone"].replace('tel:', '') if card["phone"] is not None else ''
 
             # 增强版地址解析
             region_text = ''
             # 解析省市信息
             city = ''
             province = ''
-            if address_city_state := article.select_one('.address-city-state'):
-                region_text = address_city_state.text.strip()
-                
+            if card["region"] is not None:
+                region_text = card["region"].strip()
+
                 # 处理城市和省份信息
                 if ',' in region_text:
                     parts = [p.strip() for p in region_text.split(',')]
@@ -117,100 +204,67 @@ def parse_store(html: str) -> List[Dict]:
 
         except Exception as e:
             print(f"解析异常: {str(e)}")
-            print("异常节点内容:", article.prettify())
+            print("异常节点内容:", card)
 
     return stores
 
 
-def save_data(data: List[Dict]):
-    with open(OUTPUT_PATH, 'a', newline='', encoding='utf-8-sig') as f:
-        writer = csv.DictWriter(f, fieldnames=CSV_HEADER)
-        writer.writerows(data)
-
-
-def fetch_store_page(province: str, page: int) -> int:
-
-    total = 0
-    try:
-        with requests.Session() as session:
-            session.headers.update({
-                "Accept-Encoding": "gzip, deflate",
-                "Content-Type": "application/x-www-form-urlencoded"
-            })
-
-            form_data = {
-                'province': province,
-                'page_no': str(max(page, 1)),
-                'page_size': '15',
-                'action': 'filterStores'
-            }
-
-            response = session.post(
-                STORE_API,
-                data=form_data,
-                timeout=10,
-                allow_redirects=False,
-                stream=True
-            )
-
-            # 处理压缩响应
-            raw_bytes = response.raw.read()
-            try:
-                with gzip.GzipFile(fileobj=io.BytesIO(raw_bytes)) as f:
-                    decompressed = f.read()
-            except OSError:
-                decompressed = raw_bytes
-
-            # 自动检测编码
-            encoding = chardet.detect(decompressed)['encoding'] or 'utf-8'
-            content = decompressed.decode(encoding, errors='replace')
-
-            if response.status_code == 200:
-                try:
-                    data = json.loads(content)
-                    total = int(data.get('count', 0))
-                    print(f"当前省份 {province} 第 {page} 页，总计 {total} 条数据")
-
-                    if 'resultHTML' in data:
-                        stores = parse_store(data['resultHTML'])
-                        if stores:
-                            save_data(stores)
-                            print(f"成功保存 {len(stores)} 条记录")
-
-                except json.JSONDecodeError:
-                    print("响应数据不是有效的JSON格式")
-                    print("原始响应内容:", content[:500])
-
-            return total
-
-    except requests.exceptions.RequestException as e:
-        print(f"网络请求异常: {str(e)}")
-        return total
+def store_page_request(province: str, page: int, attempt: int = 1) -> RequestSpec:
+    form_data = {
+        'province': province,
+        'page_no': str(max(page, 1)),
+        'page_size': str(PAGE_SIZE),
+        'action': 'filterStores'
+    }
+    # 响应由共享会话自动解压；按 JSON 解析时编码取自响应头，未声明时按 JSON 的 UTF 编码规则判断，
+    # 只有都判断不了时 requests 才会检测编码
+    return RequestSpec(STORE_API, "POST", data=form_data,
+                       headers={"Content-Type": "application/x-www-form-urlencoded"},
+                       timeout=10, tag=(province, page, attempt))
+
+
+def next_store_pages(result) -> List[RequestSpec]:
+    """第 1 页完成后按总数并发请求该省其余各页；请求失败时重试本页"""
+    province, page, attempt = result.spec.tag
+    if not result.ok:
+        return [store_page_request(province, page, attempt + 1)] if attempt < MAX_RETRIES else []
+    if page != 1:
+        return []
+    total = int(result.data.get('count', 0))
+    page_count = (total + PAGE_SIZE - 1) // PAGE_SIZE
+    return [store_page_request(province, p) for p in range(2, page_count + 1)]
 
 
 def main():
     init_output()
     provinces = fetch_provinces()
-
-    for province_name in provinces.keys():
-        print(f"\n{'=' * 40}\n开始处理省份: {province_name}\n{'=' * 40}")
-        page = 1
-        max_retry = 3
-
-        while True:
-            print(f"\n▶ 正在获取第 {page} 页...")
-            total = fetch_store_page(province_name, page)
-
-            # 分页终止条件
-            if total == 0 or page * 15 >= total:
-                break
-
-            page += 1
-            sleep_random(1, 2)
-
-        sleep_random(3, 2)
-
+    province_index = {name: i for i, name in enumerate(provinces)}
+
+    # 各省第 1 页同时提交，第 1 页返回总数后该省其余各页并发请求
+    pages = {}  # (省份序号, 页码) -> 门店列表
+    specs = [store_page_request(province_name, 1) for province_name in provinces]
+    for result in fetch_iter(specs, expand=next_store_pages, max_concurrency=CONCURRENCY,
+                             host_concurrency=CONCURRENCY, rate=RATE, adaptive=True):
+        province, page, attempt = result.spec.tag
+        if not result.ok:
+            if attempt >= MAX_RETRIES:
+                print(f"网络请求异常: {province} 第 {page} 页: {result.error}")
+            continue
+        data = result.data
+        print(f"当前省份 {province} 第 {page} 页，总计 {data.get('count', 0)} 条数据")
+        if 'resultHTML' in data:
+            pages[(province_index[province], page)] = parse_store(data['resultHTML'])
+
+    # 按省份、页码顺序一次写入
+    with open(OUTPUT_PATH, 'a', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_HEADER)
+        for key in sorted(pages):
+            writer.writerows(pages[key])
+    print(f"成功保存 {sum(len(stores) for stores in pages.values())} 条记录")
 
 
-main()
-print(f"所有门店数据抓取完成")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
+    print(f"所有门店数据抓取完成")
+    get_session().print_stats()
+    print_cache_stats()
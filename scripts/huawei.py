@@ -1,20 +1,15 @@
-import requests
 import csv
 import os
 import json
-from time import sleep
-import random
 from util.location_translator import get_en_province, get_en_city
+from util.http_client import get_session
+from util.rate_controller import pace
 
 BRAND_MAPPING = {
     "JK": "华为问界",
     "CH": "华为智界",
     "BQ": "华为享界"
 }
-def sleep_with_random(interval: int,
-                      rand_max: int) -> None:
-    rand = random.random() * rand_max
-    sleep(interval + rand)
 CSV_HEADER = ["品牌", "省", "Province", "市区辅助", "City/Area", "区",
               "店名", "类型", "地址", "电话", "备注"]
 API_URL = "https://cbg.huawei.com/isrp/lms/store-info/car-store-list/query"
@@ -26,7 +21,8 @@ OUTPUT_PATH = os.path.join(PROJECT_ROOT, "output/huawei.csv")
 def fetch_stores(brand_code):
     payload = {"brandCodes": [brand_code]}
     try:
-        response = requests.post(API_URL, json=payload, timeout=10)
+        pace(API_URL)
+        response = get_session().post(API_URL, json=payload, timeout=10)
         response.raise_for_status()
         data = response.json()
 
@@ -75,9 +71,9 @@ def main():
                 row = process_store(store, brand)
                 writer.writerow(row)
                 total_count += 1
-                sleep_with_random(1,1)  # 避免请求过快
 
     print(f"\n 数据抓取完成！共获取 {total_count} 家门店数据，已保存至：{OUTPUT_PATH}")
+    get_session().print_stats()
 
 
 
@@ -1,15 +1,16 @@
 import os
-import random
-import time
 import csv
-import json
+import threading
 import urllib.request
 from bs4 import BeautifulSoup
 import requests
+from requests.auth import AuthBase
 
-import requests
 import urllib3
 
+from util.http_client import api_url, create_session
+from util.fetch_engine import RequestSpec, fetch_iter
+
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 
@@ -36,15 +37,76 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
 OUTPUT_PATH = os.path.join(PROJECT_ROOT, "output", "kumho_stores.csv")  # 修正了CSV文件名
 
+# list.do 不传 pageSize 时每页的门店数
+DEFAULT_PAGE_SIZE = 5
+# 探测每页条数时从大到小依次尝试
+PAGE_SIZE_CANDIDATES = (100, 50, 20, 10)
+# 最多用几个省份探测（门店太少的省份无法判断服务端的上限）
+PROBE_PROVINCES = 5
+# 各省份并发抓取，速率（次/秒）跟随锦湖主机的 AIMD 控制器
+CONCURRENCY = 4
+RATE = 1.0
+MAX_RETRIES = 3  # 每页最多请求次数
+
+
+class CsrfAuth(AuthBase):
+    """
+    给 POST 请求带上当前的 CSRF token；响应 403 时刷新 token 并重发一次
+
+    多个线程同时收到 403 时只刷新一次：只有请求所带的 token 仍是当前 token 时才刷新，
+    否则说明其他线程已经刷新过，直接用新 token 重发。
+    """
+
+    def __init__(self, scraper):
+        self.scraper = scraper
+        self.lock = threading.Lock()
+
+    def __call__(self, r):
+        # 获取 token 的页面本身是 GET，不带 token，也不在 403 时刷新，避免递归
+        if r.method != 'POST' or not self.scraper.csrf_header_name:
+            return r
+        r.headers[self.scraper.csrf_header_name] = self.scraper.csrf_token
+        r.register_hook('response', self.handle_403)
+        return r
+
+    def handle_403(self, r, **kwargs):
+        if r.status_code != 403:
+            return r
+        header_name = self.scraper.csrf_header_name
+        used_token = r.request.headers.get(header_name)
+        with self.lock:
+            if used_token == self.scraper.csrf_token:
+                print("CSRF token 已失效（403），重新获取...")
+                self.scraper.get_csrf_token_from_page()
+        if self.scraper.csrf_token == used_token:
+            return r  # 刷新失败
+
+        # 读完并释放原响应的连接，再带着新的 token 和会话 cookie 重发
+        r.content
+        r.close()
+        prep = r.request.copy()
+        prep.headers[header_name] = self.scraper.csrf_token
+        prep.headers.pop('Cookie', None)
+        prep.prepare_cookies(self.scraper.session.cookies)
+        _r = r.connection.send(prep, **kwargs)
+        _r.history.append(r)
+        _r.request = prep
+        return _r
+
 
 class KumhoScraper(BaseScraper):
     def __init__(self, brand_name="锦湖轮胎"):
         super().__init__(brand_name)
-        self.base_url = "http://www.kumhotire.com.cn"
-        self.api_url = "http://www.kumhotire.com.cn/cn/global/tire/agnc/list.do"
-        self.session = requests.Session()
+        self.base_url = api_url("http://www.kumhotire.com.cn")
+        self.api_url = api_url("http://www.kumhotire.com.cn/cn/global/tire/agnc/list.do")
+        # 所有省份共用一个带连接池的会话；token 与会话 cookie 绑定，由 CsrfAuth 统一携带和刷新
+        self.session = create_session(pool_maxsize=CONCURRENCY)
+        # 添加 verify=False 来禁用 SSL 验证
+        self.session.verify = False
+        self.session.auth = CsrfAuth(self)
         self.csrf_token = None
         self.csrf_header_name = None
+        self.page_size = DEFAULT_PAGE_SIZE
         # self.output_file = os.path.join(self.output_dir, f"{self.brand_name}_stores.json") # 改为CSV输出
         self.driver = None  # 初始化 driver 属性
 
@@ -54,7 +116,7 @@ class KumhoScraper(BaseScraper):
             list_do_url = self.base_url + "/cn/global/tire/agnc/list.do"
             print(f"正在从 {list_do_url} 获取 CSRF token 和省份列表...")
             # 添加 verify=False 来禁用 SSL 验证
-            response = self.session.get(list_do_url, timeout=20, verify=False)
+            response = self.session.get(list_do_url, timeout=20)
             response.raise_for_status()
             soup = BeautifulSoup(response.text, 'html.parser')
 
@@ -137,70 +199,96 @@ class KumhoScraper(BaseScraper):
             print(f"解析 {province_name} 的API门店数据时出错: {type(e).__name__} - {e}")
         return new_stores_found_in_this_parse
 
-    def search_stores_by_province(self, province_code, province_name):
-        if not self.csrf_token or not self.csrf_header_name:
-            print("错误：CSRF token 未获取。")
-            return []
-
-        all_stores_for_province = []  # 当前省份的所有门店
-        # 移除 existing_store_names_for_province = set()
-        current_page_num = 0
-        page_size = 5
+    def list_payload(self, province_code, page_num, page_size):
+        payload = {
+            'currentPage': 0,
+            'pageNum': page_num,  # 起始记录的序号
+            'langCd': 'LN000020',
+            'isoCd': 'cn',
+            'ajaxType': 'Y',
+            'searchGubun': 'Y' if page_num == 0 else 'N',
+            'lat': '',
+            'lon': '',
+            'states': province_code,
+        }
+        if page_size != DEFAULT_PAGE_SIZE:
+            payload['pageSize'] = page_size
+        return payload
 
+    def list_request(self, province, page_num, attempt=1):
         headers = {
             'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
             'X-Requested-With': 'XMLHttpRequest',
-            self.csrf_header_name: self.csrf_token,
             'Referer': self.base_url
         }
-
-        while True:
-            payload = {
-                'currentPage': 0,
-                'pageNum': current_page_num,
-                'langCd': 'LN000020',
-                'isoCd': 'cn',
-                'ajaxType': 'Y',
-                'searchGubun': 'Y' if current_page_num == 0 else 'N',
-                'lat': '',
-                'lon': '',
-                'states': province_code,
-            }
-            print(
-                f"正在请求省份 {province_name} 的门店数据，pageNum: {current_page_num}, searchGubun: {payload['searchGubun']}")
-            try:
-                # 添加 verify=False 来禁用 SSL 验证
-                response = self.session.post(self.api_url, headers=headers, data=payload, timeout=50, verify=False)
-                response.raise_for_status()
-                data = response.json()
-
-                stores_on_page = data.get('agncList', [])
-                if not stores_on_page:
-                    print(f"省份 {province_name} 在 pageNum {current_page_num} 没有更多门店数据了。")
-                    break
-
-                # 不再传递 existing_store_names_for_province
-                parsed_stores = self.parse_store_data(data, province_name)
-                all_stores_for_province.extend(parsed_stores)
-                print(f"已获取 {len(parsed_stores)} 家门店，当前省份总计 {len(all_stores_for_province)} 家。")
-
-                total_count = data.get('totalCount', 0)
-                # total_count 是该省份的总数，所以用 all_stores_for_province 的长度比较
-                if len(all_stores_for_province) >= total_count:
-                    print(f"已获取省份 {province_name} 的所有 {total_count} 家门店。")
-                    break
-
-                current_page_num += page_size
-                time.sleep(random.uniform(1, 3))
-
-            except requests.exceptions.RequestException as e:
-                print(f"请求省份 {province_name} (pageNum: {current_page_num}) 门店数据时发生错误: {e}")
-                break
-            except json.JSONDecodeError:
-                print(
-                    f"解析省份 {province_name} (pageNum: {current_page_num}) 门店数据时发生JSON解码错误。响应内容: {response.text}")
-                break
-        return all_stores_for_province
+        return RequestSpec(self.api_url, "POST", data=self.list_payload(province['value'], page_num, self.page_size),
+                           headers=headers, timeout=50, tag=(province, page_num, attempt))
+
+    def probe_page_size(self, provinces):
+        """
+        探测 list.do 实际支持的最大每页条数
+
+        从大到小尝试 PAGE_SIZE_CANDIDATES：返回的条数少于请求的条数且未到该省总数时，
+        说明服务端有上限（忽略 pageSize 时为默认的 5 条），以返回的条数为准；
+        某个候选值报错时换下一个更小的值；省内门店太少无法判断时换下一个省份。
+        """
+        for province in provinces[:PROBE_PROVINCES]:
+            for size in PAGE_SIZE_CANDIDATES:
+                try:
+                    response = self.session.post(self.api_url, data=self.list_payload(province['value'], 0, size),
+                                                 headers={'X-Requested-With': 'XMLHttpRequest', 'Referer': self.base_url},
+                                                 timeout=50)
+                    response.raise_for_status()
+                    data = response.json()
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    print(f"每页 {size} 条的探测请求失败: {e}")
+                    continue
+                stores = data.get('agncList') or []
+                total = data.get('totalCount', 0)
+                if not stores:
+                    continue
+                if len(stores) < min(size, total):
+                    return max(len(stores), DEFAULT_PAGE_SIZE)
+                if total >= size:
+                    return size
+                break  # 本省门店太少，换一个省份再试
+        return DEFAULT_PAGE_SIZE
+
+    def next_list_requests(self, result):
+        """第一页完成后按总数并发请求该省其余各页；请求失败时重试本页"""
+        province, page_num, attempt = result.spec.tag
+        if not result.ok:
+            return [self.list_request(province, page_num, attempt + 1)] if attempt < MAX_RETRIES else []
+        if page_num != 0:
+            return []
+        total_count = result.data.get('totalCount', 0)
+        return [self.list_request(province, n) for n in range(self.page_size, total_count, self.page_size)]
+
+    def crawl_provinces(self, provinces):
+        """
+        并发抓取各省份的门店
+
+        各省第一页同时提交，第一页返回总数后该省其余各页并发请求；
+        最多 CONCURRENCY 个请求同时进行，共用一个会话和 CSRF token。
+
+        返回值:
+            门店列表，按省份、页码排列，与逐省逐页抓取时的顺序一致
+        """
+        pages = {}  # (省份序号, 起始序号) -> 门店列表
+        province_index = {province['value']: i for i, province in enumerate(provinces)}
+        specs = [self.list_request(province, 0) for province in provinces]
+        for result in fetch_iter(specs, expand=self.next_list_requests, session=self.session,
+                                 max_concurrency=CONCURRENCY, host_concurrency=CONCURRENCY,
+                                 rate=RATE, adaptive=True):
+            province, page_num, attempt = result.spec.tag
+            province_name = province['text']
+            if not result.ok:
+                if attempt >= MAX_RETRIES:
+                    print(f"请求省份 {province_name} (pageNum: {page_num}) 门店数据时发生错误: {result.error}")
+                continue
+            print(f"省份 {province_name} pageNum: {page_num}，共 {result.data.get('totalCount', 0)} 家")
+            pages[(province_index[province['value']], page_num)] = self.parse_store_data(result.data, province_name)
+        return [store for key in sorted(pages) for store in pages[key]]
 
     def get_provinces(self, soup):
         """从已获取的页面 BeautifulSoup 对象中解析省份列表"""
@@ -239,16 +327,10 @@ class KumhoScraper(BaseScraper):
 
         print(f"获取到的 CSRF Token: {self.csrf_token}, Header Name: {self.csrf_header_name}")
 
-        for province in provinces:
-            province_value = province['value']
-            province_name = province['text']
-            print(f"\n正在处理省份: {province_name} ({province_value})")
-
-            province_stores = self.search_stores_by_province(province_value, province_name)
+        self.page_size = self.probe_page_size(provinces)
+        print(f"list.do 每页 {self.page_size} 条")
 
-            if province_stores:
-                self.stores_data.extend(province_stores)
-            time.sleep(random.uniform(1, 2))  # API请求之间可以加个小延时
+        self.stores_data = self.crawl_provinces(provinces)
 
         self.save_to_csv(self.stores_data)  # 传递 self.stores_data
         print(f"\n所有省份处理完毕，共抓取 {len(self.stores_data)} 条门店数据。")
@@ -276,6 +358,7 @@ class KumhoScraper(BaseScraper):
 def main():
     scraper = KumhoScraper()
     scraper.scrape()
+    scraper.session.print_stats()
 
 
 if __name__ == "__main__":
@@ -1,9 +1,9 @@
-import requests
 import csv
 import os
 import time
 import random
 from typing import List, Dict
+from util.http_client import get_session
 
 BASE_URL = "https://store-center.leapmotor.cn/leap-store/storeDrainage"
 CSV_HEADER = ["品牌", "省", "Province", "市区辅助", "City/Area", "区",
@@ -19,7 +19,7 @@ OUTPUT_PATH = os.path.join(PROJECT_ROOT, "output/leapmotor.csv")
 def get_province_cities() -> List[Dict]:
 
     try:
-        response = requests.get(
+        response = get_session().get(
             f"{BASE_URL}/getAllProvinceCityStore",
             headers={'User-Agent': 'Mozilla/5.0'}
         )
@@ -44,7 +44,7 @@ def fetch_stores(province: Dict) -> List[Dict]:
     }
 
     try:
-        response = requests.get(
+        response = get_session().get(
             f"{BASE_URL}/getLastStoreInfo",
             params=params,
             headers={'User-Agent': 'Mozilla/5.0'},
@@ -99,6 +99,7 @@ def main():
             time.sleep(1 + random.uniform(0, 1))
 
     print(f"\n抓取完成！总计店铺数量: {total_count}")
+    get_session().print_stats()
 
 
 
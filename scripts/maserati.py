@@ -1,12 +1,9 @@
 import os
-import random
-import requests
 import json
 import csv
-from time import sleep
 from util.location_translator import get_en_city, get_en_province
-
-INTERVAL = 1  # 网络请求间隔（秒）
+from util.http_client import get_session
+from util.rate_controller import pace
 
 API = "https://api.onthemap.io/server/v1/api/location"
 
@@ -29,12 +26,6 @@ DEFAULT_HEADERS = {
 }
 
 
-def sleep_with_random(interval: int,
-                      rand_max: int) -> None:
-    rand = random.random() * rand_max
-    sleep(interval + rand)
-
-
 def get_business_hours(properties):
     """获取营业时间信息"""
     hours = []
@@ -56,8 +47,8 @@ with open(OUTPUT_PATH, "w", encoding="utf-8",newline="") as f: # 清除csv文件
     list_writer.writerow(RESULT_FIELDS)
 
 dealer_count = 0
-result_store = requests.get(url=API, headers=DEFAULT_HEADERS, params=default_payload).json()
-sleep_with_random(INTERVAL, 1)
+pace(API)
+result_store = get_session().get(url=API, headers=DEFAULT_HEADERS, params=default_payload).json()
 
 for feature in result_store.get("data", {}).get("results", {}).get("features", []):
     try:
@@ -11,13 +11,21 @@ import random
 import requests
 import json
 import csv
-from time import sleep
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from util.location_translator import get_en_province, get_en_city
+from util.http_client import api_url
+from util.http_cache import TTL_DAY, cached_get, print_cache_stats
+from util.rate_controller import get_controller
 
 # 配置参数
-INTERVAL = 1  # 基础请求间隔（秒）
-RANDOM_DELAY = 0.5  # 随机延迟上限
-API_TEMPLATE = "https://www.michelin.com.cn/auto/dealer-locator/assets/js/city_az-dealer/{}.json"
+API_TEMPLATE = api_url("https://www.michelin.com.cn/auto/dealer-locator/assets/js/city_az-dealer/{}.json")
+# 字母索引文件很少变化，一天内重复运行直接使用缓存
+LETTER_CACHE_TTL = TTL_DAY
+# 同时下载的字母文件数，不超过共享会话每个主机的连接池大小
+LETTER_CONCURRENCY = 8
+# 字母文件是静态资源，初始速率（次/秒）可以高一些
+LETTER_RATE = 4.0
+LETTER_MAX_RATE = 10.0
 USER_AGENTS = [
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
     'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.4 Safari/605.1.15'
@@ -28,11 +36,6 @@ RESULT_FIELDS = ["省", "Province", "市区辅助", "City", "区", "店名", "
 OUTPUT_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "output/michelin.csv")
 
 
-def random_delay():
-    """随机延迟机制"""
-    sleep(INTERVAL + random.uniform(0, RANDOM_DELAY))
-
-
 def get_headers():
     """生成随机请求头"""
     return {
@@ -80,33 +83,46 @@ def process_store(writer, city_name, district_name, store):
         return False
 
 
+def fetch_letter(letter):
+    """
+    下载一个字母的索引文件
+
+    返回值:
+        (字母, 城市 -> 区县 -> 门店列表 的字典)；文件不存在或请求失败时字典为 None
+    """
+    url = API_TEMPLATE.format(letter)
+    try:
+        # 请求间隔由 rate_controller 控制，命中缓存时不访问网络
+        response = cached_get(url, LETTER_CACHE_TTL, headers=get_headers(),
+                              validate=lambda r: isinstance(r.json(), dict))
+        response.raise_for_status()
+        return letter, response.json()
+    except requests.HTTPError:
+        print(f"跳过无效字母：{letter.upper()}")
+    except Exception as e:
+        print(f"请求失败：{letter.upper()} {e}")
+    return letter, None
+
+
 def main():
-    # 初始化输出文件
-    os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
-    with open(OUTPUT_PATH, 'w', encoding='utf-8', newline='') as f:
-        csv.writer(f).writerow(RESULT_FIELDS)
+    # 26 个文件在同一主机上，速率控制器的参数只在首次创建时生效，须在请求之前设置
+    get_controller(API_TEMPLATE.format("a"), rate=LETTER_RATE, max_rate=LETTER_MAX_RATE)
 
+    os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
     total_count = 0
 
-    # 遍历所有字母a-z
-    for letter in 'abcdefghijklmnopqrstuvwxyz':
-        url = API_TEMPLATE.format(letter)
-        print(f"正在处理字母：{letter.upper()}")
-
-        try:
-            response = requests.get(url, headers=get_headers())
-            response.raise_for_status()
-            data = response.json()
-        except requests.HTTPError:
-            print(f"跳过无效字母：{letter.upper()}")
-            continue
-        except Exception as e:
-            print(f"请求失败：{e}")
-            continue
-
-        # 处理获取到的数据
-        with open(OUTPUT_PATH, 'a', encoding='utf-8', newline='') as f:
-            writer = csv.writer(f)
+    # 所有字母并发下载，哪个先到就先解析；只有主线程写文件，文件只打开一次
+    with open(OUTPUT_PATH, 'w', encoding='utf-8', newline='') as f, \
+            ThreadPoolExecutor(max_workers=LETTER_CONCURRENCY) as executor:
+        writer = csv.writer(f)
+        writer.writerow(RESULT_FIELDS)
+
+        futures = [executor.submit(fetch_letter, letter) for letter in 'abcdefghijklmnopqrstuvwxyz']
+        for future in as_completed(futures):
+            letter, data = future.result()
+            if data is None:
+                continue
+            print(f"正在处理字母：{letter.upper()}")
             for city, districts in data.items():
                 for district, stores in districts.items():
                     total_count += sum(
@@ -114,9 +130,8 @@ def main():
                         if process_store(writer, city, district, store)
                     )
 
-        random_delay()
-
     print(f"爬取完成，共找到 {total_count} 家门店")
+    print_cache_stats()
 
 
 if __name__ == "__main__":
@@ -1,13 +1,15 @@
-import requests
 import time
 import csv
 import os
 from bs4 import BeautifulSoup
 from urllib.parse import urlencode
 from util.location_translator import get_en_city, get_en_province
+from util.http_client import api_url
+from util.http_cache import TTL_WEEK
+from util.fetch_engine import PARSE_JSON, PARSE_TEXT, RequestSpec, fetch_iter
+from util.gazetteer import CACHE_DIR, read_cache, write_cache
 
 # 基础参数
-INTERVAL = 1  # 网络请求间隔（秒）
 RESULT_FIELDS = ["省", "Province", "市", "City", "区", "店名", "类型", "地址", "电话", "备注"]
 
 # 文件路径设置
@@ -15,47 +17,145 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
 OUTPUT_PATH = os.path.join(PROJECT_ROOT, "output/nexen.csv")
 
-# 确保输出目录存在
-os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
+# 地区树（addr1 → addr2 → addr3）缓存，有效期内重复运行不再请求上层地区列表
+REGION_TREE_PATH = os.path.join(CACHE_DIR, "nexen_region_tree.pickle")
+REGION_TREE_SIGNATURE = "nexen_region_tree"
+# 地区树缓存的格式版本，与 gazetteer 的 CACHE_VERSION 无关
+REGION_TREE_VERSION = 1
+REGION_TREE_TTL = TTL_WEEK
+
+# 地区列表和门店列表请求的并发数和初始速率（次/秒），速率跟随耐克森主机的 AIMD 控制器
+CONCURRENCY = 4
+RATE = 1.0
+MAX_RETRIES = 3  # 每个请求最多请求次数
+LEVELS = 3  # addr1、addr2、addr3
 
 # 基础URL
-BASE_URL = "https://www.nexentire.com/cn/utils/"
-
-def fetch_data(payload, api_name):
-    """发送POST请求获取数据"""
-    url = BASE_URL + api_name
-    headers = {
-        "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-        "X-Requested-With": "XMLHttpRequest"
-    }
-    
-    try:
-        response = requests.post(url, data=payload, headers=headers)
-        response.raise_for_status()
-        return response
-    except requests.exceptions.RequestException as e:
-        print(f"请求失败: {e}")
-        return None
+BASE_URL = api_url("https://www.nexentire.com/cn/utils/")
+ATTR_URL = BASE_URL + "get_shop_attr.php"
+SHOP_LIST_URL = BASE_URL + "get_shop_list.php"
+
+HEADERS = {
+    "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "X-Requested-With": "XMLHttpRequest"
+}
+
+
+def attr_request(path: tuple, attempt: int = 1) -> RequestSpec:
+    """
+    请求 path 下一级的地区列表
+
+    参数:
+        path: 上级地区，如 () 表示请求省份列表，("广东省",) 表示请求该省的城市列表
+    """
+    params = {f"addr{i + 1}": name for i, name in enumerate(path)}
+    params["target"] = f"addr{len(path) + 1}"
+    return RequestSpec(ATTR_URL, "POST", data=urlencode(params), headers=HEADERS,
+                       parse=PARSE_JSON, tag=(path, attempt))
+
+
+def shop_list_request(leaf: tuple, attempt: int = 1) -> RequestSpec:
+    addr1, addr2, addr3 = leaf
+    payload = urlencode({'addr1': addr1, 'addr2': addr2, 'addr3': addr3, 'offset': 0})
+    return RequestSpec(SHOP_LIST_URL, "POST", data=payload, headers=HEADERS,
+                       parse=PARSE_TEXT, tag=(leaf, attempt))
+
+
+def retry_or_expand(result) -> list:
+    """地区列表请求失败时重试；成功且未到最后一级时，请求每个下级地区的列表"""
+    path, attempt = result.spec.tag
+    if not result.ok:
+        return [attr_request(path, attempt + 1)] if attempt < MAX_RETRIES else []
+    if len(path) + 1 < LEVELS:
+        return [attr_request(path + (name,)) for name in result.data]
+    return []
+
+
+def retry_shop_list(result) -> list:
+    leaf, attempt = result.spec.tag
+    if result.ok or attempt >= MAX_RETRIES:
+        return []
+    return [shop_list_request(leaf, attempt + 1)]
+
+
+def discover_region_tree():
+    """
+    按广度优先并发请求 addr1 → addr2 → addr3 三级地区列表
+
+    同一级的地区并发请求，一个地区的列表到达后立即请求其下级，
+    不必等同级的其他地区完成。
+
+    返回值:
+        (地区树, 是否完整)；地区树为 {省: {市: [区, ...]}}，
+        有请求重试 MAX_RETRIES 次仍失败时不完整
+    """
+    tree = {}
+    complete = True
+    for result in fetch_iter([attr_request(())], expand=retry_or_expand,
+                             max_concurrency=CONCURRENCY, host_concurrency=CONCURRENCY,
+                             rate=RATE, adaptive=True):
+        path, attempt = result.spec.tag
+        if not result.ok:
+            if attempt >= MAX_RETRIES:
+                complete = False
+                print(f"获取地区列表失败 ({'/'.join(path) or '省份'}): {result.error}")
+            continue
+        if len(path) == 0:
+            print(f"获取到 {len(result.data)} 个省份")
+            for addr1 in result.data:
+                tree.setdefault(addr1, {})
+        elif len(path) == 1:
+            print(f"处理省份: {path[0]}，{len(result.data)} 个城市")
+            for addr2 in result.data:
+                tree[path[0]].setdefault(addr2, [])
+        else:
+            print(f"处理城市: {'/'.join(path)}，{len(result.data)} 个区域")
+            tree[path[0]][path[1]] = list(result.data)
+    return tree, complete
+
+
+def load_region_tree():
+    """
+    获取地区树：缓存未过期时直接使用，否则重新发现；只有完整的地区树才写入缓存
+    """
+    cached = read_cache(REGION_TREE_SIGNATURE, REGION_TREE_PATH, REGION_TREE_VERSION)
+    if cached is not None and time.time() - cached["stored_at"] < REGION_TREE_TTL:
+        print(f"使用缓存的地区树: {REGION_TREE_PATH}")
+        return cached["tree"]
+
+    tree, complete = discover_region_tree()
+    if complete:
+        write_cache(REGION_TREE_SIGNATURE, {"tree": tree, "stored_at": time.time()},
+                    REGION_TREE_PATH, REGION_TREE_VERSION)
+    return tree
+
+
+def region_leaves(tree: dict) -> list:
+    return [(addr1, addr2, addr3)
+            for addr1, cities in tree.items()
+            for addr2, districts in cities.items()
+            for addr3 in districts]
+
 
 def parse_shop_list(html, addr1, addr2, addr3):
     """解析门店列表HTML"""
     soup = BeautifulSoup(html, 'html.parser')
     shops = []
-    
+
     # 查找门店行
     rows = soup.select('table.branch-table tbody tr')
-    
+
     for row in rows:
         # 店名可能在第一个td或隐藏的strong标签中
         if name_td := row.select_one('td:first-child'):
             shop_name = name_td.text.strip()
         else:
             shop_name = row.select_one('strong.txt2').text.strip() if row.select_one('strong.txt2') else ""
-        
+
         # 地址
         address = row.select_one('span.address').text.strip() if row.select_one('span.address') else ""
-        
+
         # 电话 - 优先从隐藏的电话单元格获取
         if phone_td := row.select_one('td.hidden-xs.hidden-sm:nth-child(3)'):
             phone = phone_td.text.strip()
@@ -63,103 +163,56 @@ def parse_shop_list(html, addr1, addr2, addr3):
             phone = tel_link['href'].replace("tel:", "")
         else:
             phone = ""
-        
+
         shop_data = {
             "省": addr1, "Province": get_en_province(addr1),
             "市": addr2, "City": get_en_city(addr2),
-            "区": addr3, 
+            "区": addr3,
             "店名": shop_name.replace('\\n', ' ').replace('\n', ' '),
-            "类型": "", 
-            "地址": address.replace('\\n', ' ').replace('\n', ' '), 
+            "类型": "",
+            "地址": address.replace('\\n', ' ').replace('\n', ' '),
             "电话": phone.replace('\\n', ' ').replace('\n', ' '),
             "备注": ""
         }
         shops.append(shop_data)
         print(shop_data)  # 控制台输出门店信息
-    
-    return shops
 
-def save_to_csv(shops):
-    """保存数据到CSV文件"""
-    
-    with open(OUTPUT_PATH, 'a', newline='', encoding='utf-8-sig') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=RESULT_FIELDS, 
-                              quoting=csv.QUOTE_ALL)
-        for shop in shops:
-            writer.writerow(shop)
+    return shops
 
 def main():
-    # 清空csv文件
-    with open(file=OUTPUT_PATH, mode='w', encoding='utf-8', newline='') as f:
-        writer = csv.DictWriter(f=f, fieldnames=RESULT_FIELDS)
-        writer.writeheader()
-    # 1. 获取省份列表(addr1)
-    payload1 = 'target=addr1'
-    response = fetch_data(payload1, "get_shop_attr.php")
-    if not response:
-        print("获取省份列表失败")
-        return
-    
-    addr1_list = response.json()
-    print(f"获取到 {len(addr1_list)} 个省份")
-    
+    # 确保输出目录存在
+    os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
+
+    # 1. 获取地区树（省份 → 城市 → 区域）
+    leaves = region_leaves(load_region_tree())
+    print(f"共 {len(leaves)} 个区域")
+
     total_shops = 0
-    
-    # 2. 遍历每个省份
-    for addr1 in addr1_list:
-        time.sleep(INTERVAL)
-        print(f"\n处理省份: {addr1}")
-        
-        # 3. 获取该省份的城市列表(addr2)
-        payload2 = urlencode({'addr1': addr1, 'target': 'addr2'})
-        response = fetch_data(payload2, "get_shop_attr.php")
-        if not response:
-            print(f"获取城市列表失败 (省份: {addr1})")
-            continue
-            
-        addr2_list = response.json()
-        
-        # 4. 遍历每个城市
-        for addr2 in addr2_list:
-            time.sleep(INTERVAL)
-            print(f"处理城市: {addr1}/{addr2}")
-            
-            # 5. 获取该城市的区域列表(addr3)
-            payload3 = urlencode({'addr1': addr1, 'addr2': addr2, 'target': 'addr3'})
-            response = fetch_data(payload3, "get_shop_attr.php")
-            if not response:
-                print(f"获取区域列表失败 (城市: {addr2})")
+
+    # 2. 并发请求各区域的门店列表，在主线程中按完成顺序解析并写入同一个文件
+    with open(file=OUTPUT_PATH, mode='w', encoding='utf-8', newline='') as f:
+        csv.writer(f).writerow(RESULT_FIELDS)
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS, quoting=csv.QUOTE_ALL)
+
+        specs = (shop_list_request(leaf) for leaf in leaves)
+        for result in fetch_iter(specs, expand=retry_shop_list,
+                                 max_concurrency=CONCURRENCY, host_concurrency=CONCURRENCY,
+                                 rate=RATE, adaptive=True):
+            leaf, attempt = result.spec.tag
+            if not result.ok and attempt < MAX_RETRIES:
+                continue  # 已安排重试
+            if not result.ok or not result.data:
+                print(f"获取门店列表失败 (区域: {'/'.join(leaf)})")
                 continue
-                
-            addr3_list = response.json()
-            
-            # 6. 遍历每个区域
-            for addr3 in addr3_list:
-                time.sleep(INTERVAL)
-                print(f"处理区域: {addr1}/{addr2}/{addr3}")
-                
-                # 7. 获取该区域的门店列表
-                payload4 = urlencode({
-                    'addr1': addr1,
-                    'addr2': addr2,
-                    'addr3': addr3,
-                    'offset': 0
-                })
-                response = fetch_data(payload4, "get_shop_list.php")
-                if not response or not response.text:
-                    print(f"获取门店列表失败 (区域: {addr3})")
-                    continue
-                
-                # 8. 解析门店数据
-                shops = parse_shop_list(response.text, addr1, addr2, addr3)
-                total_shops += len(shops)
-                
-                # 9. 保存到CSV
-                save_to_csv(shops)
-    
-    # 10. 输出结果
+
+            # 3. 解析门店数据并保存到CSV
+            shops = parse_shop_list(result.data, *leaf)
+            total_shops += len(shops)
+            writer.writerows(shops)
+
+    # 4. 输出结果
     print(f"\n爬取完成! 共找到 {total_shops} 家门店")
     print(f"数据已保存至: {OUTPUT_PATH}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,14 +1,12 @@
 import os
-import random
-import requests
 import json
 import csv
-from time import sleep
 from util.location_translator import get_en_city, get_en_province
-
-INTERVAL = 1  # 网络请求间隔（秒）
+from util.http_cache import TTL_DAY, cached_get, print_cache_stats
 
 API = "https://resources-nav.porsche.services/dealers/region/CN?env=production"
+# 整个地区的经销商文档，一天内重复运行直接使用缓存
+REGION_CACHE_TTL = TTL_DAY
 
 RESULT_FIELDS = ["省", "Province", "市", "City", "区", "店名", "类型", "地址", "电话", "备注"]
 
@@ -25,12 +23,6 @@ DEFAULT_HEADERS = {
 }
 
 
-def sleep_with_random(interval: int,
-                      rand_max: int) -> None:
-    rand = random.random() * rand_max
-    sleep(interval + rand)
-
-
 #创建父目录（如果不存在)
 os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
 
@@ -40,8 +32,9 @@ with open(OUTPUT_PATH, "w", encoding="utf-8", newline="") as f: # 清除csv文
     list_writer.writerow(RESULT_FIELDS)
 
 dealer_count = 0
-result_store = requests.get(url=API, headers=DEFAULT_HEADERS, params=default_payload).json()
-sleep_with_random(INTERVAL, 1)
+# 只缓存含地区列表的响应，WAF 拦截页或报错的 JSON 不缓存
+result_store = cached_get(API, REGION_CACHE_TTL, headers=DEFAULT_HEADERS, params=default_payload,
+                          validate=lambda r: isinstance(r.json(), dict) and bool(r.json().get("regions"))).json()
 
 for region in result_store["regions"]:
     region_name = region.get("regionNameLocalized", "")
@@ -105,4 +98,5 @@ for region in result_store["regions"]:
                 print(f"处理经销商数据时出错: {str(e)}")
                 continue
 
-print(f"\n爬取完成！共处理 {dealer_count} 家经销商信息")
\ No newline at end of file
+print(f"\n爬取完成！共处理 {dealer_count} 家经销商信息")
+print_cache_stats()
@@ -1,35 +1,48 @@
 import os
 import random
-import sys
-import requests
 import json
 import csv
-from time import sleep
-import time
+from datetime import date
 from typing import List, Dict, Tuple
 from util.location_translator import get_en_province, get_en_city
-
-
-def sleep_with_random(interval: int, rand_max: int) -> None:
-    rand = random.uniform(0.0, 1.0) * rand_max
-    sleep(interval + rand)
+from util.http_client import api_url, get_session
+from util.rate_controller import get_controller
+from util.fetch_engine import RequestSpec, fetch_iter
+from util.http_cache import TTL_WEEK, cached_get, print_cache_stats
+from util.cassette import setup_cassette
+from util.gazetteer import CACHE_DIR, read_cache, write_cache
 
 
 # 全局变量
-batch_size = 1000
-shops_buffer = []
-request_count = 0
 MAX_RETRIES = 5
-INTERVAL = 1
+PAGE_SIZE = 20
+MAX_PAGES = 100  # 接口最多返回 100 页
+
+# 保养、轮胎列表包含城市的全部门店，先完整抓取；美容、改装列表只含部分门店，大多已在前者中出现
+SERVICE_TYPES = ["BY", "TR", "MR", "GZ"]
+FULL_COVERAGE_TYPES = ["BY", "TR"]
+# 部分覆盖的服务类型从第 1 页起连续这么多页的门店都已在完整类型中出现时，停止翻页
+EARLY_STOP_PAGES = 3
+
+# 同时抓取的 服务类型 × 城市 数
+SHOP_CONCURRENCY = 8
+# 店铺接口的初始速率和速率上限（次/秒）
+SHOP_RATE = 2.0
+SHOP_MAX_RATE = 5.0
 
 # API 接口
-GET_CITY_API = "https://gateway.tuhu.cn/cl/cl-base-region-query/region/selectCityList"
-GET_SHOP_API = "https://gateway.tuhu.cn/cl/cl-shop-api/shopList/getMainShopList"
+GET_CITY_API = api_url("https://gateway.tuhu.cn/cl/cl-base-region-query/region/selectCityList")
+CITY_LIST_CACHE_TTL = TTL_WEEK
+GET_SHOP_API = api_url("https://gateway.tuhu.cn/cl/cl-shop-api/shopList/getMainShopList")
 
 # 文件路径
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
 OUTPUT_PATH = os.path.join(PROJECT_ROOT, "output/tuhu_app.csv")
+SHOP_INDEX_PATH = os.path.join(CACHE_DIR, "tuhu_shop_index.pickle")
+SHOP_INDEX_SIGNATURE = "tuhu_shop_index"
+# 门店索引的格式版本，与 gazetteer 的 CACHE_VERSION 无关
+SHOP_INDEX_VERSION = 2
 
 RESULT_FIELDS = ["品牌", "省", "Province", "市区辅助", "City/Area", "区", "店名", "类型", "地址", "电话", "备注"]
 USER_AGENTS = [
@@ -58,33 +71,6 @@ def get_request_headers():
     return headers
 
 
-ACCEPT_LANGUAGES = [
-    "en-US,en;q=0.9",
-    "zh-CN,zh;q=0.9",
-    "ja-JP,ja;q=0.9",
-    "fr-FR,fr;q=0.9"
-]
-
-CONNECTION_TYPES = [
-    "keep-alive",
-    "close"
-]
-
-
-# 获取随机headers的函数
-def get_random_headers():
-    return {
-        "User-Agent": random.choice(USER_AGENTS),
-        "Content-Type": "application/json",
-        "Accept-Encoding": "gzip",
-        "Referer": "https://www.tuhu.cn/",
-        "Host": "gateway.tuhu.cn",
-        "X-Requested-With": "XMLHttpRequest",
-        "Accept-Language": random.choice(ACCEPT_LANGUAGES),
-        "Connection": random.choice(CONNECTION_TYPES)
-    }
-
-
 # 确保输出目录存在
 os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
 
@@ -93,7 +79,8 @@ os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
 def get_all_cities():
     """获取所有城市数据"""
     try:
-        response = requests.get(GET_CITY_API, headers=get_request_headers(), timeout=10)
+        response = cached_get(GET_CITY_API, CITY_LIST_CACHE_TTL, headers=get_request_headers(), timeout=10,
+                              validate=lambda r: r.json().get('code') == 10000)
         response.raise_for_status()
 
         if response.json().get('code') == 10000:
@@ -125,8 +112,25 @@ def get_all_cities():
         return []
 
 
-def get_shops_by_city(city_info: Dict, service_type: str, page_index: int = 1, page_size: int = 20):
-    """根据城市和服务类型获取店铺数据"""
+def group_by_city(city_list: List[Dict]) -> List[Dict]:
+    """
+    把区县一级的地区列表合并为城市列表
+
+    返回值:
+        每个城市一项，district 为空，districts 为该市各区县的地区信息，
+        用于在城市的店铺超过接口页数上限时按区县拆分查询
+    """
+    cities = {}
+    for region in city_list:
+        key = (region['province'], region['city'])
+        if key not in cities:
+            cities[key] = {**region, 'district': '', 'districtId': None, 'districts': []}
+        if region['district']:
+            cities[key]['districts'].append(region)
+    return list(cities.values())
+
+
+def shop_payload(city_info: Dict, service_type: str, page_index: int, page_size: int = PAGE_SIZE) -> Dict:
     payload = {
         "serviceType": service_type,
         "city": city_info['city'],
@@ -141,31 +145,186 @@ def get_shops_by_city(city_info: Dict, service_type: str, page_index: int = 1, p
         "isMatchRegion": False,
         "longitude": ""
     }
+    if city_info.get('district'):
+        payload["district"] = city_info['district']
+    return payload
+
+
+def shop_request(city_info: Dict, service_type: str, page: int, attempt: int = 1,
+                 covered_pages: int | None = 0) -> RequestSpec:
+    """
+    参数:
+        covered_pages: 此前连续几页的门店都已在完整类型中出现；出现过新门店后为 None
+    """
+    payload = shop_payload(city_info, service_type, page)
+    return RequestSpec(GET_SHOP_API, "POST", data=json.dumps(payload, ensure_ascii=False),
+                       headers=get_request_headers(), timeout=20,
+                       tag=(city_info, service_type, page, attempt, covered_pages))
+
+
+def pair_key(city_info: Dict, service_type: str) -> Tuple[str, str, str, str]:
+    return city_info['province'], city_info['city'], city_info['district'], service_type
+
+
+class ShopIndex:
+    """
+    按途虎门店 ID 去重的索引
+
+    同一家门店会出现在多个服务类型下，店名又可能重名，因此按门店 ID 去重。
+
+    完整类型（FULL_COVERAGE_TYPES）抓完后调用 mark_covered 记下它们的门店，
+    部分覆盖的类型据此提前停止翻页（见 covered_pages_after）。
+    含有完整类型以外门店的 省市区 × 服务类型 保存在 cache/ 下，下次运行时这些组合总是翻到最后一页，
+    不靠前几页判断；同时跨运行记录每家门店首次和最近出现的日期，结束时报告新增和未再出现的门店。
+    """
+
+    def __init__(self, path: str = SHOP_INDEX_PATH):
+        self.path = path
+        cached = read_cache(SHOP_INDEX_SIGNATURE, path, SHOP_INDEX_VERSION) or {}
+        # 门店 ID -> {"name": 店名, "first_seen": 首次出现日期, "last_seen": 最近出现日期}
+        self.shops: Dict[str, Dict] = cached.get("shops", {})
+        # 上次运行中含有完整类型以外门店的 pair_key
+        self.previous_extra_pairs = frozenset(cached.get("extra_pairs", ()))
+        self.extra_pairs = set()  # 本次运行中的
+        self.previous = set(self.shops)
+        self.seen = set()  # 本次运行中已出现的门店 ID
+        self.covered = frozenset()  # 完整类型中出现的门店 ID，mark_covered 之后不再变化
+        self.today = date.today().isoformat()
+
+    def add(self, shop_id: str, name: str) -> bool:
+        """登记一家门店，本次运行中首次出现时返回 True"""
+        if shop_id in self.seen:
+            return False
+        self.seen.add(shop_id)
+        entry = self.shops.setdefault(shop_id, {"name": name, "first_seen": self.today})
+        entry["name"] = name
+        entry["last_seen"] = self.today
+        return True
+
+    def mark_covered(self) -> None:
+        """完整类型抓完后调用"""
+        self.covered = frozenset(self.seen)
+
+    def has_extra(self, shop_list: List[Dict]) -> bool:
+        return any(shop_id_of(shop_item) not in self.covered for shop_item in shop_list)
+
+    def covered_pages_after(self, city_info: Dict, service_type: str, covered_pages: int | None,
+                            shop_list: List[Dict]) -> int | None:
+        """
+        部分覆盖的类型翻过一页后，连续都已出现过的页数；出现过新门店，或上次运行中
+        这个组合含有新门店时为 None（不再提前停止）。在抓取引擎的线程中调用，只读不变的数据
+        """
+        if covered_pages is None or pair_key(city_info, service_type) in self.previous_extra_pairs:
+            return None
+        if self.has_extra(shop_list):
+            return None
+        return covered_pages + 1
 
-    try:
-        response = requests.post(
-            GET_SHOP_API,
-            headers=get_request_headers(),
-            data=json.dumps(payload, ensure_ascii=False),
-            timeout=20
-        )
-        response.raise_for_status()
+    def save(self) -> None:
+        write_cache(SHOP_INDEX_SIGNATURE, {"shops": self.shops, "extra_pairs": self.extra_pairs},
+                    self.path, SHOP_INDEX_VERSION)
 
-        if response.status_code == 200:
-            response_json = response.json()
-            if response_json.get('code') == 10000:
-                return response_json.get('data', {})
-            else:
-                print(f"API业务错误: code={response_json.get('code')}, message={response_json.get('message')}")
-                print(json.dumps(response_json, ensure_ascii=False))
-                return None
-        else:
-            print(f"HTTP错误: {response.status_code}")
-            return None
+    def print_summary(self) -> None:
+        new = len(self.seen - self.previous)
+        gone = len(self.previous - self.seen)
+        print(f"门店索引: 本次 {len(self.seen)} 家，索引共 {len(self.shops)} 家；"
+              f"相对以前的运行新增 {new} 家，未再出现 {gone} 家")
 
-    except Exception as e:
-        print(f"请求店铺数据失败: {str(e)}")
+
+def shop_id_of(shop_item: Dict) -> str:
+    """途虎门店 ID；缺少 ID 时退回到 店名 + 地址"""
+    base = shop_item.get("shopBaseInfo", {})
+    shop_id = base.get("shopId")
+    if shop_id:
+        return str(shop_id)
+    return f"{base.get('carparName', '').strip()}|{base.get('address', '').strip()}"
+
+
+def shop_data_of(result):
+    """请求成功且业务码为 10000 时返回 data，否则返回 None"""
+    if not result.ok or result.data.get('code') != 10000:
         return None
+    return result.data.get('data') or {}
+
+
+def is_split(city_info: Dict, page: int, shop_data: Dict) -> bool:
+    """城市的第 1 页报告的总页数超过上限时，改为按区县查询，这一页本身不再使用"""
+    return (page == 1 and shop_data.get("totalPage", 1) > MAX_PAGES
+            and not city_info['district'] and bool(city_info.get('districts')))
+
+
+def next_shop_request(result, shop_index: ShopIndex | None = None):
+    """
+    某一页完成后的后续请求：成功时请求下一页，失败时重试本页；
+    城市的总页数超过接口上限时，改为按区县分别查询，各区县并发抓取。
+
+    完整类型总是翻到最后一页。部分覆盖的类型（传入 shop_index 时）从第 1 页起连续
+    EARLY_STOP_PAGES 页的门店都已在完整类型中出现时停止翻页；只要有一页出现新门店，
+    或上次运行中这个组合出现过新门店，就翻到最后一页
+    """
+    city_info, service_type, page, attempt, covered_pages = result.spec.tag
+    shop_data = shop_data_of(result)
+    if shop_data is None:
+        if attempt < MAX_RETRIES:
+            return [shop_request(city_info, service_type, page, attempt + 1, covered_pages)]
+        return []
+    total_page = shop_data.get("totalPage", 1)
+    shop_list = shop_data.get("shopList")
+    if page == 1 and total_page > MAX_PAGES:
+        if is_split(city_info, page, shop_data):
+            print(f"{city_info['city']} {service_type} 共 {total_page} 页，超过 {MAX_PAGES} 页上限，"
+                  f"按 {len(city_info['districts'])} 个区县拆分查询")
+            return [shop_request(district_info, service_type, 1) for district_info in city_info['districts']]
+        print(f"警告: {city_info['city']}{city_info['district']} {service_type} 共 {total_page} 页，"
+              f"超过 {MAX_PAGES} 页上限且无法再拆分，超出部分无法获取")
+    if not shop_list or page >= min(total_page, MAX_PAGES):
+        return []
+    if shop_index is not None:
+        covered_pages = shop_index.covered_pages_after(city_info, service_type, covered_pages, shop_list)
+        if covered_pages is not None and covered_pages >= EARLY_STOP_PAGES:
+            print(f"{city_info['city']}{city_info['district']} {service_type} 前 {page} 页的门店都已出现过，"
+                  f"跳过其余 {min(total_page, MAX_PAGES) - page} 页")
+            return []
+    return [shop_request(city_info, service_type, page + 1, covered_pages=covered_pages)]
+
+
+def iter_shop_pages(city_list: List[Dict], service_types: List[str], shop_index: ShopIndex | None = None):
+    """
+    并发抓取 服务类型 × 城市 的全部分页
+
+    每个 服务类型 × 城市 内按页顺序请求，一页完成后立即请求下一页，
+    不同的 服务类型 × 城市 之间最多 SHOP_CONCURRENCY 个同时进行，
+    总速率跟随途虎接口的 AIMD 控制器，不超过 SHOP_MAX_RATE。
+    超过页数上限的城市改为按区县查询（见 next_shop_request）。
+
+    参数:
+        city_list: group_by_city 合并后的城市列表
+        service_types: 服务类型代码列表
+        shop_index: 抓取部分覆盖的类型时传入，用于提前停止翻页；抓取完整类型时为 None
+
+    返回值:
+        FetchResult 的生成器，按完成顺序产出，
+        tag 为 (城市信息, 服务类型, 页码, 第几次请求, 连续都已出现过的页数)
+    """
+    specs = (shop_request(city_info, service_type, 1)
+             for service_type in service_types for city_info in city_list)
+    return fetch_iter(specs, expand=lambda result: next_shop_request(result, shop_index),
+                      max_concurrency=SHOP_CONCURRENCY, host_concurrency=SHOP_CONCURRENCY,
+                      rate=SHOP_RATE, adaptive=True,
+                      throttle_check=lambda r: None if r.data.get('code') == 10000 else f"code={r.data.get('code')}")
+
+
+def iter_all_shop_pages(city_list: List[Dict], shop_index: ShopIndex):
+    """
+    先完整抓取 FULL_COVERAGE_TYPES，再抓取其余类型并提前停止翻页
+
+    调用方须在取下一个结果之前把本页门店登记到 shop_index，
+    这样完整类型的生成器耗尽时，其门店都已登记，可以 mark_covered
+    """
+    yield from iter_shop_pages(city_list, FULL_COVERAGE_TYPES)
+    shop_index.mark_covered()
+    partial_types = [t for t in SERVICE_TYPES if t not in FULL_COVERAGE_TYPES]
+    yield from iter_shop_pages(city_list, partial_types, shop_index)
 
 
 def process_shop(shop_data: Dict, city_info: Dict) -> Dict:
@@ -204,107 +363,87 @@ def process_shop(shop_data: Dict, city_info: Dict) -> Dict:
 
 # --- 主程序 ---
 def main():
+    # 城市列表和店铺接口在同一主机上，速率控制器的参数只在首次创建时生效，须在请求城市列表之前设置
+    get_controller(GET_SHOP_API, rate=SHOP_RATE, max_rate=SHOP_MAX_RATE)
+
     # 获取城市数据
     print("正在获取城市数据...")
-    city_list = get_all_cities()
-    if not city_list:
+    region_list = get_all_cities()
+    if not region_list:
         print("无法获取城市数据，程序退出")
         return
 
-    print(f"共获取 {len(city_list)} 个城市")
-
-    service_types = ["BY", "TR", "MR", "GZ"]
+    city_list = group_by_city(region_list)
+    print(f"共获取 {len(city_list)} 个城市，{len(region_list)} 个地区")
 
-    # 新增：用于跟踪已处理的店名（全局唯一）
-    seen_shop_names = set()  # 存储已处理的店名
+    # 按门店 ID 去重，索引跨运行保存
+    shop_index = ShopIndex()
 
     dealer_count = 0
     shops_buffer = []
     batch_size = 100
 
-    # 创建CSV文件并写入表头
+    # 结果都在主线程中按完成顺序处理，去重和写文件无需加锁；文件只打开一次，按批写入
     with open(OUTPUT_PATH, "w", encoding="utf-8", newline='') as f:
         dict_writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
         dict_writer.writeheader()
 
-    for service_type in service_types:
-        for city_info in city_list:
-            page = 1
-            retries = 0
-
-            print(f"\n正在处理: 服务类型={service_type}, 城市={city_info['province']}-{city_info['city']}")
-
-            while True:
-                try:
-                    shop_data = get_shops_by_city(city_info, service_type, page, 20)
-
-                    if shop_data is None:
-                        print(f"获取店铺数据失败，跳过当前页面")
-                        break
-
-                    shop_list = shop_data.get("shopList", [])
-
-                    if not shop_list:
-                        print(f"没有相关店铺信息: 服务类型={service_type}, 城市={city_info['city']}, 页码={page}")
-                        break
-
-                    for shop_item in shop_list:
-                        row = process_shop(shop_item, city_info)
-                        shop_name = row["店名"]
-
-                        # 新增：检查店名是否已存在（去重逻辑）
-                        if shop_name in seen_shop_names:
-                            print(f"跳过重复店铺: {shop_name}")
-                            continue
-
-                        seen_shop_names.add(shop_name)
-                        shops_buffer.append(row)
-                        dealer_count += 1
-
-                        print(json.dumps(row, ensure_ascii=False))  # 打印店铺信息
-
-                        # 批量写入到CSV
-                        if len(shops_buffer) >= batch_size:
-                            with open(OUTPUT_PATH, "a", encoding="utf-8", newline='') as f:
-                                dict_writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
-                                dict_writer.writerows(shops_buffer)
-                            print(f"已批量写入 {len(shops_buffer)} 条店铺数据到CSV")
-                            shops_buffer.clear()
-
-                    total_page = shop_data.get("totalPage", 1)
-                    if page >= total_page or page >= 100:
-                        break
-
-                    page += 1
-                    sleep_with_random(1, 1)
-                    retries = 0
-
-                except Exception as e:
-                    print(f"请求异常: {str(e)}")
-                    retries += 1
-
-                    if retries >= MAX_RETRIES:
-                        print(f"已达到最大重试次数 {MAX_RETRIES}，退出")
-                        if shops_buffer:
-                            with open(OUTPUT_PATH, "a", encoding="utf-8", newline='') as f:
-                                dict_writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
-                                dict_writer.writerows(shops_buffer)
-                            print(f"已保存 {len(shops_buffer)} 条数据到CSV")
-                            shops_buffer.clear()
-                        sys.exit(1)
-
-                    print(f"等待 {2   **   retries} 秒后重试...")
-                    sleep(2   **  retries)
-
-            # 写入剩余数据（新增：确保最后一批数据也被写入）
-            if shops_buffer:
-                with open(OUTPUT_PATH, "a", encoding="utf-8", newline='') as f:
-                    dict_writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        for result in iter_all_shop_pages(city_list, shop_index):
+            city_info, service_type, page, attempt, _ = result.spec.tag
+            shop_data = shop_data_of(result)
+
+            if shop_data is None:
+                print(f"获取店铺数据失败: 服务类型={service_type}, 城市={city_info['city']}, "
+                      f"页码={page}, 第 {attempt} 次: {result.error or result.data}")
+                continue
+
+            if is_split(city_info, page, shop_data):
+                continue  # 这些门店会在按区县查询时获取
+
+            shop_list = shop_data.get("shopList", [])
+
+            if not shop_list:
+                print(f"没有相关店铺信息: 服务类型={service_type}, 城市={city_info['city']}, 页码={page}")
+                continue
+
+            print(f"\n正在处理: 服务类型={service_type}, 城市={city_info['province']}-{city_info['city']}, 页码={page}")
+
+            if service_type not in FULL_COVERAGE_TYPES and shop_index.has_extra(shop_list):
+                shop_index.extra_pairs.add(pair_key(city_info, service_type))
+
+            for shop_item in shop_list:
+                row = process_shop(shop_item, city_info)
+                shop_name = row["店名"]
+
+                if not shop_index.add(shop_id_of(shop_item), shop_name):
+                    print(f"跳过重复店铺: {shop_name}")
+                    continue
+
+                shops_buffer.append(row)
+                dealer_count += 1
+
+                print(json.dumps(row, ensure_ascii=False))  # 打印店铺信息
+
+                # 批量写入到CSV
+                if len(shops_buffer) >= batch_size:
                     dict_writer.writerows(shops_buffer)
-                print(f"已写入剩余 {len(shops_buffer)} 条店铺数据到CSV")
-                shops_buffer.clear()
+                    f.flush()
+                    print(f"已批量写入 {len(shops_buffer)} 条店铺数据到CSV")
+                    shops_buffer.clear()
+
+        # 写入剩余数据
+        if shops_buffer:
+            dict_writer.writerows(shops_buffer)
+            print(f"已写入剩余 {len(shops_buffer)} 条店铺数据到CSV")
+            shops_buffer.clear()
+
+    print(f"爬取完成，共计 {dealer_count} 个门店数据已保存到 {OUTPUT_PATH}")
+    shop_index.save()
+    shop_index.print_summary()
 
-            print(f"爬取完成，共计 {dealer_count} 个门店数据已保存到 {OUTPUT_PATH}")
+    get_session().print_stats()
+    print_cache_stats()
 
 if __name__ == "__main__":
+    setup_cassette("tuhu")
     main()
\ No newline at end of file
@@ -0,0 +1,181 @@
+"""
+地址省市区切分
+
+用 divisions 索引中全部省级、地级名称（含简称）构建一个 Aho-Corasick 自动机，
+对地址只做一次线性扫描就找出所有行政区划名称，再按层级一致性选出省和市：
+例如 “江苏省南京市鼓楼区中山路” 中的 “中山” 虽然也是地级市名称，
+但不属于江苏省，因此不会被选中。
+简称紧跟 路/街/道/大道 时是路名（如 “中山路”“南京路”），不作为省市。
+
+仓库中没有区县级数据，区县取紧跟在市名之后、以区/县/旗/市结尾的词。
+"""
+
+import re
+from collections import deque
+
+from util.divisions import (LEVEL_CITY, LEVEL_PROVINCE, MUNICIPALITY_CODES, Division,
+                            DivisionIndex, load_division_index)
+
+DISTRICT_PATTERN = re.compile(r"\s*([一-龥]{1,8}?(?:自治县|自治旗|区|县|旗|市))")
+# 以这些词结尾的是住宅或单位，不是区县
+NON_DISTRICT_SUFFIXES = ("小区", "社区", "校区", "景区", "厂区")
+# 省市简称之后紧跟这些字时是路名
+ROAD_SUFFIXES = ("路", "街", "道", "大道")
+
+
+class AhoCorasick:
+    """多模式字符串匹配自动机，构建后对任意文本的扫描时间与文本长度成正比"""
+
+    def __init__(self, patterns: dict):
+        """
+        参数:
+            patterns: 模式串到任意附加数据的字典
+        """
+        self.goto: list[dict] = [{}]
+        self.fail: list[int] = [0]
+        # 每个状态结束的模式串（已合并失败链上的输出）
+        self.output: list[list[str]] = [[]]
+        self.payload = dict(patterns)
+
+        for pattern in patterns:
+            state = 0
+            for char in pattern:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state].append(pattern)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def iter_matches(self, text: str):
+        """按结束位置顺序产出 (起始下标, 结束下标, 模式串)"""
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for pattern in output[state]:
+                yield end - len(pattern), end, pattern
+
+    def leftmost_longest(self, text: str) -> list[tuple[int, int, str]]:
+        """互不重叠的匹配，同一起点取最长者，从左到右贪心选择"""
+        matches = sorted(self.iter_matches(text), key=lambda m: (m[0], m[0] - m[1]))
+        selected = []
+        position = 0
+        for start, end, pattern in matches:
+            if start >= position:
+                selected.append((start, end, pattern))
+                position = end
+        return selected
+
+
+class AddressSegmenter:
+    def __init__(self, index: DivisionIndex | None = None):
+        self.index = index or load_division_index()
+        # 同一名称的省级排在地级之前，如 “吉林” 先作为吉林省
+        patterns: dict[str, list[Division]] = {}
+        for level in (LEVEL_PROVINCE, LEVEL_CITY):
+            for name, code in self.index.name_to_code[level].items():
+                patterns.setdefault(name, []).append(self.index.divisions[code])
+        self.automaton = AhoCorasick(patterns)
+        self.full_names = {division.name for divisions in patterns.values() for division in divisions}
+
+    def segment(self, address: str) -> tuple[Division | None, Division | None, str]:
+        """
+        切分地址
+
+        参数:
+            address: 地址字符串
+
+        返回值:
+            (省级 Division, 地级 Division, 区县名)，缺失的部分为 None 或空字符串
+        """
+        province = city = None
+        city_end = 0
+        matches = self.automaton.leftmost_longest(address or "")
+        for start, end, pattern in matches:
+            if pattern not in self.full_names and address.startswith(ROAD_SUFFIXES, end):
+                continue
+            for division in self.automaton.payload[pattern]:
+                if division.level == LEVEL_PROVINCE:
+                    if province is None and (city is None or city.parent_code == division.code):
+                        province = division
+                        if division.code in MUNICIPALITY_CODES:
+                            city_end = end
+                        else:
+                            # 非直辖市时，作为省的名称不再同时作为市
+                            break
+                elif city is None and (province is None or division.parent_code == province.code):
+                    city = division
+                    city_end = end
+            if city is not None and province is not None:
+                break
+
+        if city is None and province is not None and province.code in MUNICIPALITY_CODES:
+            city = self.index.children(province.code)[0]
+        if province is None and city is not None:
+            province = self.index.divisions[city.parent_code]
+
+        district = ""
+        if city is not None:
+            city_end = self._skip_repeated(address, matches, city_end, (province, city))
+            match = DISTRICT_PATTERN.match(address, city_end)
+            if match and not match.group(1).endswith(NON_DISTRICT_SUFFIXES):
+                district = match.group(1)
+        return province, city, district
+
+    def _skip_repeated(self, address: str, matches: list, position: int, divisions: tuple) -> int:
+        """跳过紧跟在 position 之后、重复的省市名（如 “北京市北京市朝阳区”），返回区县的起始下标"""
+        for start, end, pattern in matches:
+            if start < position:
+                continue
+            if address[position:start].strip() or not any(
+                    division in divisions for division in self.automaton.payload[pattern]):
+                break
+            position = end
+        return position
+
+    def segment_names(self, address: str) -> tuple[str, str, str]:
+        """切分地址，返回 (省, 市, 区) 的中文全称，缺失的部分为空字符串"""
+        province, city, district = self.segment(address)
+        return (province.name if province else "",
+                city.name if city else "",
+                district)
+
+
+_segmenter = None
+
+
+def get_segmenter() -> AddressSegmenter:
+    """获取全局共享的 AddressSegmenter 实例，首次调用时才构建自动机"""
+    global _segmenter
+    if _segmenter is None:
+        _segmenter = AddressSegmenter()
+    return _segmenter
+
+
+def segment_address(address: str) -> tuple[str, str, str]:
+    """
+    从地址中切分省、市、区
+
+    参数:
+        address: 地址字符串，如 "云南省丽江市古城区金虹路"
+
+    返回值:
+        (省, 市, 区)，省市为标准全称，如 ("云南省", "丽江市", "古城区")；
+        直辖市的省和市相同；未识别的部分为空字符串
+    """
+    return get_segmenter().segment_names(address)
@@ -0,0 +1,302 @@
+"""
+录制与回放 HTTP 请求（录像）
+
+录制模式下，http_client 创建的会话在发出每个请求的同时，把请求和响应
+（状态码、响应头、解压后的内容、耗时）记入该品牌的录像文件
+cache/cassettes/<品牌>.json.gz；回放模式下不访问网络，直接按请求从录像中取出响应，
+可选模拟固定或录制时的延迟。回放时关闭请求前的限速等待和 HTTP 缓存，
+因此同一份录像每次运行的耗时都可比较，用于衡量解析、去重、写文件等本地开销。
+
+爬虫在创建会话之前调用 setup_cassette，之后照常运行：
+
+    python scripts/tuhu.py --record           # 正常爬取，同时录制
+    python scripts/tuhu.py --replay           # 不联网，按录像重跑
+    python scripts/tuhu.py --replay --latency=50        # 每个响应延迟 50 毫秒
+    python scripts/tuhu.py --replay --latency=recorded  # 按录制时的耗时延迟
+
+请求按 “方法 + URL（去掉时间戳等易变参数）+ 请求体” 匹配，请求头不参与匹配；
+同一请求录制了多次时按录制顺序依次返回，用完后重复最后一次。
+录像中没有的请求抛出 requests.ConnectionError，与断网时的表现相同。
+
+Selenium 驱动的页面没有经过 requests，用 page_source(driver) 代替
+driver.page_source 即可把页面源码一并录制、回放。
+"""
+
+import atexit
+import base64
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from util.gazetteer import CACHE_DIR
+
+CASSETTE_DIR = os.path.join(CACHE_DIR, "cassettes")
+CASSETTE_VERSION = 1
+
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+
+# 匹配请求时忽略的查询参数，其值每次请求都不同
+VOLATILE_PARAMS = {"timestamp", "_"}
+# 录像中的内容已解压，不再保留这些描述传输格式的响应头
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+# --latency=recorded 表示按录制时的耗时延迟
+LATENCY_RECORDED = "recorded"
+
+
+def request_key(method: str, url: str, body=None) -> str:
+    """请求在录像中的匹配键"""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if k not in VOLATILE_PARAMS]
+    url = urlunsplit(parts._replace(query=urlencode(query), fragment=""))
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    digest = hashlib.sha256(body or b"").hexdigest()[:16]
+    return f"{method.upper()} {url} {digest}"
+
+
+class Cassette:
+    """一个品牌的录像：HTTP 交互与页面源码，可在多个线程中共用"""
+
+    def __init__(self, path: str, mode: str, latency=None):
+        """
+        参数:
+            path: 录像文件路径
+            mode: MODE_RECORD 或 MODE_REPLAY
+            latency: 回放时每个响应的延迟（秒），LATENCY_RECORDED 表示按录制时的耗时，None 表示不延迟
+        """
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.interactions: dict[str, list[dict]] = {}
+        self.pages: dict[str, list[str]] = {}
+        self.cursors: dict[str, int] = {}
+        self.recorded = 0
+        self.served = 0
+        self.missing = 0
+        self.lock = threading.Lock()
+
+    def load(self) -> None:
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != CASSETTE_VERSION:
+            raise ValueError(f"录像版本不符: {self.path}")
+        for entry in data["interactions"]:
+            self.interactions.setdefault(entry["key"], []).append(entry)
+        for entry in data["pages"]:
+            self.pages.setdefault(entry["key"], []).append(entry["source"])
+
+    def save(self) -> None:
+        interactions = sorted((e for entries in self.interactions.values() for e in entries),
+                              key=lambda e: e["seq"])
+        pages = [{"key": key, "source": source}
+                 for key, sources in self.pages.items() for source in sources]
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump({"version": CASSETTE_VERSION, "interactions": interactions, "pages": pages},
+                      f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        print(f"录像已保存: {len(interactions)} 个请求，{len(pages)} 个页面 -> {self.path}")
+
+    def record(self, request: requests.PreparedRequest, response: requests.Response,
+               elapsed: float) -> None:
+        key = request_key(request.method, request.url, request.body)
+        entry = {
+            "key": key,
+            "method": request.method,
+            "url": response.url,
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": [[k, v] for k, v in response.headers.items() if k.lower() not in DROPPED_HEADERS],
+            "content": base64.b64encode(response.content).decode("ascii"),
+            "elapsed": elapsed,
+        }
+        with self.lock:
+            entry["seq"] = self.recorded
+            self.recorded += 1
+            self.interactions.setdefault(key, []).append(entry)
+
+    def _next(self, store: dict, key: str):
+        with self.lock:
+            entries = store.get(key)
+            if not entries:
+                self.missing += 1
+                return None
+            index = self.cursors.get(key, 0)
+            self.cursors[key] = index + 1
+            self.served += 1
+            return entries[min(index, len(entries) - 1)]
+
+    def play(self, request: requests.PreparedRequest) -> requests.Response:
+        entry = self._next(self.interactions, request_key(request.method, request.url, request.body))
+        if entry is None:
+            raise requests.ConnectionError(f"录像中没有该请求: {request.method} {request.url}",
+                                           request=request)
+        delay = entry["elapsed"] if self.latency == LATENCY_RECORDED else self.latency
+        if delay:
+            time.sleep(delay)
+
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.reason = entry["reason"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = base64.b64decode(entry["content"])
+        response._content_consumed = True
+        response.url = entry["url"]
+        response.request = request
+        return response
+
+    def record_page(self, key: str, source: str) -> None:
+        with self.lock:
+            self.pages.setdefault(key, []).append(source)
+
+    def play_page(self, key: str) -> str:
+        source = self._next(self.pages, key)
+        if source is None:
+            raise KeyError(f"录像中没有该页面: {key}")
+        return source
+
+    def print_stats(self, wall_time: float, cpu_time: float) -> None:
+        print(f"回放: 响应 {self.served} 个，缺失 {self.missing} 个，"
+              f"耗时 {wall_time:.2f} 秒，CPU {cpu_time:.2f} 秒")
+
+
+class RecordingAdapter(HTTPAdapter):
+    """照常发出请求，并把请求和响应记入录像"""
+
+    def __init__(self, cassette: Cassette, **kwargs):
+        self.cassette = cassette
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        start = time.perf_counter()
+        response = super().send(request, **kwargs)
+        if not kwargs.get("stream"):
+            # 读完响应体才算完整的耗时
+            response.content
+            self.cassette.record(request, response, time.perf_counter() - start)
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """不访问网络，从录像中取出响应"""
+
+    def __init__(self, cassette: Cassette):
+        super().__init__()
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        response = self.cassette.play(request)
+        response.connection = self
+        return response
+
+    def close(self):
+        pass
+
+
+_cassette: Cassette | None = None
+
+
+def get_cassette() -> Cassette | None:
+    """当前生效的录像，未开启录制或回放时为 None"""
+    return _cassette
+
+
+def make_adapter(**kwargs) -> BaseAdapter:
+    """
+    按当前模式创建传输适配器，供 http_client 挂载到会话上
+
+    参数:
+        kwargs: 正常或录制模式下传给 HTTPAdapter 的参数，如 pool_maxsize、max_retries
+    """
+    if _cassette is None:
+        return HTTPAdapter(**kwargs)
+    if _cassette.mode == MODE_RECORD:
+        return RecordingAdapter(_cassette, **kwargs)
+    return ReplayAdapter(_cassette)
+
+
+def page_source(driver, key: str | None = None) -> str:
+    """
+    获取 Selenium 当前页面的源码，录制模式下一并记入录像，回放模式下直接从录像中取出
+
+    参数:
+        driver: Selenium WebDriver，回放时可以为 None
+        key: 页面在录像中的匹配键，默认为当前页面的 URL（回放时必须指定）
+    """
+    if _cassette is not None and _cassette.mode == MODE_REPLAY:
+        return _cassette.play_page(key or driver.current_url)
+    source = driver.page_source
+    if _cassette is not None:
+        _cassette.record_page(key or driver.current_url, source)
+    return source
+
+
+def setup_cassette(brand: str, argv: list[str] | None = None) -> Cassette | None:
+    """
+    按命令行参数开启录制或回放，须在创建会话之前调用
+
+    识别的参数（从 sys.argv 中移除，不影响爬虫自己的参数）:
+        --record: 正常爬取并录制
+        --replay: 按录像回放
+        --latency=毫秒 或 --latency=recorded: 回放时模拟的延迟
+        --cassette=路径: 录像文件，默认 cache/cassettes/<品牌>.json.gz
+
+    参数:
+        brand: 品牌名，用于默认的录像文件名
+        argv: 命令行参数，默认为 sys.argv
+
+    返回值:
+        生效的 Cassette；两个开关都没有时返回 None，爬虫照常运行
+    """
+    global _cassette
+    argv = sys.argv if argv is None else argv
+    mode, latency, path = None, None, os.path.join(CASSETTE_DIR, f"{brand}.json.gz")
+    remaining = []
+    for arg in argv:
+        if arg == "--record":
+            mode = MODE_RECORD
+        elif arg == "--replay":
+            mode = MODE_REPLAY
+        elif arg.startswith("--latency="):
+            value = arg.split("=", 1)[1]
+            latency = LATENCY_RECORDED if value == LATENCY_RECORDED else float(value) / 1000
+        elif arg.startswith("--cassette="):
+            path = arg.split("=", 1)[1]
+        else:
+            remaining.append(arg)
+    argv[:] = remaining
+    if mode is None:
+        return None
+
+    # 避免循环导入：http_cache 依赖 http_client，而 http_client 依赖本模块
+    from util.http_cache import set_cache_enabled
+    from util.rate_controller import set_pacing
+
+    _cassette = Cassette(path, mode, latency)
+    # 录制时所有请求都要真正发出，回放时不读写缓存以保证每次结果一致
+    set_cache_enabled(False)
+    if mode == MODE_RECORD:
+        print(f"录制模式，录像将保存到 {path}")
+        atexit.register(_cassette.save)
+    else:
+        _cassette.load()
+        set_pacing(False)
+        print(f"回放模式，录像: {path}")
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        atexit.register(lambda: _cassette.print_stats(time.perf_counter() - start_wall,
+                                                      time.process_time() - start_cpu))
+    return _cassette
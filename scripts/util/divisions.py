@@ -0,0 +1,221 @@
+"""
+统一的行政区划层级索引
+
+把 stand_province.json、stand_city.json、cache/provinces.json 以及
+provinces.json/cities.json 中的英文名合并为一棵以行政区划代码为键的树：
+
+- 省级代码为两位（如 "33"），地级代码为十二位（如 "330100000000"）
+- 每个区划记录父级代码、全部名称别名（全称、简称、“XX州”等）、英文名
+  以及 city_centers.json 中的驻地经纬度
+- 代码→区划、名称→代码、城市→省份的查询都是一次字典查找
+
+直辖市的“市辖区”“县”在索引中以直辖市本身的名称出现，
+“省直辖县级行政区划”这类占位条目不参与名称查询。
+"""
+
+import re
+
+from util.gazetteer import load_gazetteer
+
+LEVEL_PROVINCE = "province"
+LEVEL_CITY = "city"
+
+MUNICIPALITY_CODES = {"11", "12", "31", "50"}
+
+# stand_province.json 未收录的省级行政区（国家标准代码）
+EXTRA_PROVINCES = {
+    "71": "台湾省",
+    "81": "香港特别行政区",
+    "82": "澳门特别行政区",
+}
+
+# 不是真实地名的地级占位条目
+PLACEHOLDER_CITY_NAMES = {"市辖区", "县", "省直辖县级行政区划", "自治区直辖县级行政区划"}
+
+# 出现在自治区、自治州、自治县名称中的民族
+ETHNIC_GROUPS = ("朝鲜", "土家", "苗", "藏", "羌", "彝", "侗", "布依", "哈尼", "壮", "傣", "白",
+                 "景颇", "傈僳", "回", "蒙古", "柯尔克孜", "哈萨克", "维吾尔", "黎")
+AUTONOMOUS_PATTERN = re.compile(
+    r"^(.{2,}?)(?:(?:%s)族?)*自治(区|州|县)$" % "|".join(ETHNIC_GROUPS))
+
+
+def short_names(name: str) -> list[str]:
+    """
+    生成行政区划名称的简称
+
+    参数:
+        name: 全称，如 "大理白族自治州"、"广西壮族自治区"、"锡林郭勒盟"
+
+    返回值:
+        简称列表，如 ["大理", "大理州"]、["广西"]、["锡林郭勒"]
+    """
+    if match := AUTONOMOUS_PATTERN.match(name):
+        base, kind = match.groups()
+        # 自治州常简称为 “XX州”
+        return [base, base + "州"] if kind == "州" else [base]
+    for suffix in ("特别行政区", "地区", "省", "市", "盟"):
+        if name.endswith(suffix) and len(name) > len(suffix) + 1:
+            return [name[:-len(suffix)]]
+    return []
+
+
+def normalize_code(code) -> str:
+    """
+    统一行政区划代码的写法
+
+    "33"、"330000"、"330000000000" 均视为省级代码 "33"；
+    六位地级代码 "330100" 补齐为十二位 "330100000000"
+    """
+    code = str(code).strip()
+    if len(code) in (6, 12) and code[2:].strip("0") == "":
+        return code[:2]
+    if len(code) == 6:
+        return code.ljust(12, "0")
+    return code
+
+
+class Division:
+    """一个行政区划节点"""
+
+    __slots__ = ("code", "name", "level", "parent_code", "aliases", "name_en", "location")
+
+    def __init__(self, code: str, name: str, level: str, parent_code: str | None,
+                 name_en: str = ""):
+        self.code = code
+        self.name = name
+        self.level = level
+        self.parent_code = parent_code
+        self.aliases: list[str] = [name]
+        self.name_en = name_en
+        # 驻地经纬度 (lon, lat)，无数据时为 None
+        self.location: tuple[float, float] | None = None
+
+    def add_alias(self, alias: str) -> None:
+        if alias and alias not in self.aliases:
+            self.aliases.append(alias)
+
+    def __repr__(self):
+        return f"Division({self.code!r}, {self.name!r}, {self.level!r})"
+
+
+class DivisionIndex:
+    def __init__(self, gazetteer=None):
+        gazetteer = gazetteer or load_gazetteer()
+        self.divisions: dict[str, Division] = {}
+        self.children_codes: dict[str, list[str]] = {}
+        # 名称（含别名）到代码，按层级分开，避免“海南”（省）与“海南”（海南藏族自治州）冲突
+        self.name_to_code: dict[str, dict[str, str]] = {LEVEL_PROVINCE: {}, LEVEL_CITY: {}}
+
+        self._load_provinces(gazetteer)
+        self._load_cities(gazetteer)
+        self._register_names()
+        for code, (lon, lat) in gazetteer.city_centers.items():
+            if code in self.divisions:
+                self.divisions[code].location = (lon, lat)
+
+    def _add(self, division: Division) -> None:
+        self.divisions[division.code] = division
+        if division.parent_code:
+            self.children_codes.setdefault(division.parent_code, []).append(division.code)
+
+    def _load_provinces(self, gazetteer) -> None:
+        provinces = {p["code"]: p["name"] for p in gazetteer.stand_provinces}
+        for code, name in EXTRA_PROVINCES.items():
+            provinces.setdefault(code, name)
+        for code, name in provinces.items():
+            province = Division(code, name, LEVEL_PROVINCE, None, gazetteer.provinces.get(name, ""))
+            for alias in short_names(name):
+                province.add_alias(alias)
+            self._add(province)
+        for meta in gazetteer.province_meta:
+            province = self.divisions.get(normalize_code(meta["code"]))
+            if province:
+                province.add_alias(meta.get("shortName", ""))
+
+    def _load_cities(self, gazetteer) -> None:
+        for city in gazetteer.stand_cities:
+            code, name, parent_code = city["code"], city["name"], city["p_code"]
+            if parent_code in MUNICIPALITY_CODES:
+                # 直辖市的“市辖区”“县”在地级层面就是直辖市本身
+                name = self.divisions[parent_code].name
+            division = Division(code, name, LEVEL_CITY, parent_code, gazetteer.cities.get(name, ""))
+            if name not in PLACEHOLDER_CITY_NAMES:
+                for alias in short_names(name):
+                    division.add_alias(alias)
+            self._add(division)
+
+    def _register_names(self) -> None:
+        # 先登记全称，再登记简称，同名时全称优先；同一层级内先出现者优先
+        for use_full_name in (True, False):
+            for division in self.divisions.values():
+                if division.name in PLACEHOLDER_CITY_NAMES:
+                    continue
+                names = self.name_to_code[division.level]
+                for alias in division.aliases if not use_full_name else [division.name]:
+                    names.setdefault(alias, division.code)
+
+    def get(self, code) -> Division | None:
+        """按代码查询区划，代码写法见 normalize_code"""
+        return self.divisions.get(normalize_code(code))
+
+    def parent(self, code) -> Division | None:
+        division = self.get(code)
+        return self.divisions.get(division.parent_code) if division and division.parent_code else None
+
+    def children(self, code) -> list[Division]:
+        return [self.divisions[c] for c in self.children_codes.get(normalize_code(code), [])]
+
+    def names(self, code) -> list[str]:
+        """区划的全部名称，第一个为全称"""
+        division = self.get(code)
+        return list(division.aliases) if division else []
+
+    def find(self, name: str, level: str | None = None) -> Division | None:
+        """
+        按名称（全称或简称）查询区划
+
+        参数:
+            name: 中文名，如 "大理"、"大理州"、"大理白族自治州"
+            level: LEVEL_PROVINCE 或 LEVEL_CITY；为 None 时先查省级再查地级
+
+        返回值:
+            Division 实例，未找到时返回 None
+        """
+        name = name.strip()
+        levels = (level,) if level else (LEVEL_PROVINCE, LEVEL_CITY)
+        for lv in levels:
+            code = self.name_to_code[lv].get(name)
+            # 县级市等未收录的写法，如 “大理市”，再去掉后缀试一次
+            if code is None and name.endswith("市"):
+                code = self.name_to_code[lv].get(name[:-1])
+            if code is not None:
+                return self.divisions[code]
+        return None
+
+    def find_code(self, name: str, level: str | None = None) -> str | None:
+        division = self.find(name, level)
+        return division.code if division else None
+
+    def province_of(self, city_name: str) -> Division | None:
+        """
+        由城市名查询所属省级行政区
+
+        参数:
+            city_name: 城市中文名，全称或简称均可
+
+        返回值:
+            省级 Division 实例，未找到时返回 None
+        """
+        city = self.find(city_name, LEVEL_CITY)
+        return self.divisions.get(city.parent_code) if city else None
+
+
+_division_index = None
+
+
+def load_division_index() -> DivisionIndex:
+    """获取全局共享的行政区划索引，首次调用时才构建"""
+    global _division_index
+    if _division_index is None:
+        _division_index = DivisionIndex()
+    return _division_index
@@ -0,0 +1,337 @@
+"""
+基于 asyncio 的并发抓取引擎
+
+接收一串请求描述（RequestSpec），在每个主机的并发上限（信号量）和
+令牌桶速率（每秒请求数）之内并发执行，按完成顺序或提交顺序产出解析后的结果。
+
+请求本身仍由 http_client 的共享会话在线程池中发出，因此连接池、默认超时、
+自动解压等行为与顺序调用时完全一致；asyncio 只负责调度和限速。
+
+adaptive=True 时每个主机的速率不再固定，而是跟随 rate_controller 中
+该主机的 AIMD 控制器（被限流时减半、响应健康时逐步提高）。
+
+翻页等后续请求取决于上一个响应时，传入 expand 回调：每个请求完成后用它的结果
+生成后续请求（如下一页，或失败时重试本页），后续请求优先于尚未提交的初始请求。
+这样消费者处理第 N 页时，第 N+1 页已经在请求中。
+
+同步代码直接迭代 fetch_iter() 即可，不需要改写成 async 函数：
+
+    for result in fetch_iter(specs, rate=2):
+        if result.ok:
+            handle(result.spec.tag, result.data)
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+
+from util.http_client import get_session
+from util.rate_controller import get_controller, pacing_enabled
+
+# 全局同时进行的请求数上限
+DEFAULT_MAX_CONCURRENCY = 8
+# 同一主机同时进行的请求数上限
+DEFAULT_HOST_CONCURRENCY = 4
+# 同一主机每秒最多发出的请求数
+DEFAULT_RATE = 2.0
+
+PARSE_JSON = "json"
+PARSE_HTML = "html"
+PARSE_TEXT = "text"
+PARSE_NONE = None
+
+
+class RequestSpec:
+    """一个待发出的请求"""
+
+    __slots__ = ("method", "url", "params", "data", "json", "headers", "timeout", "parse", "tag")
+
+    def __init__(self, url: str, method: str = "GET", params=None, data=None, json=None,
+                 headers: dict | None = None, timeout=None, parse: str | None = PARSE_JSON,
+                 tag=None):
+        """
+        参数:
+            url: 请求地址
+            method: HTTP 方法
+            params / data / json / headers / timeout: 与 requests 的同名参数相同
+            parse: 响应的解析方式，PARSE_JSON、PARSE_HTML（BeautifulSoup）、
+                   PARSE_TEXT 或 PARSE_NONE（不解析，只返回 Response）
+            tag: 调用方自定义的标记，原样带回结果中，如对应的城市
+        """
+        self.method = method
+        self.url = url
+        self.params = params
+        self.data = data
+        self.json = json
+        self.headers = headers
+        self.timeout = timeout
+        self.parse = parse
+        self.tag = tag
+
+    @property
+    def host(self) -> str:
+        return urlsplit(self.url).netloc
+
+    def __repr__(self):
+        return f"RequestSpec({self.method!r}, {self.url!r}, tag={self.tag!r})"
+
+
+class FetchResult:
+    """一个请求的结果；请求或解析失败时 error 为对应的异常，data 为 None"""
+
+    __slots__ = ("index", "spec", "response", "data", "error", "elapsed")
+
+    def __init__(self, index: int, spec: RequestSpec):
+        self.index = index  # 提交顺序
+        self.spec = spec
+        self.response: requests.Response | None = None
+        self.data = None
+        self.error: Exception | None = None
+        self.elapsed = 0.0  # 请求耗时（秒），不含排队等待
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        status = "ok" if self.ok else f"error={self.error!r}"
+        return f"FetchResult({self.index}, {self.spec!r}, {status})"
+
+
+class TokenBucket:
+    """令牌桶：平均每秒 rate 个令牌，最多积攒 burst 个"""
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def set_rate(self, rate: float) -> None:
+        self._refill()
+        self.rate = rate
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        # 在事件循环线程内调用，无需加锁
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class HostLimiter:
+    """单个主机的并发上限与速率限制"""
+
+    def __init__(self, concurrency: int, rate: float, burst: float = 1.0):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.bucket = TokenBucket(rate, burst)
+
+
+def parse_response(response: requests.Response, parse: str | None):
+    if parse == PARSE_JSON:
+        return response.json()
+    if parse == PARSE_HTML:
+        # 只有需要解析 HTML 的爬虫才导入 bs4
+        from bs4 import BeautifulSoup
+        return BeautifulSoup(response.text, 'html.parser')
+    if parse == PARSE_TEXT:
+        return response.text
+    return response
+
+
+class FetchEngine:
+    def __init__(self, session: requests.Session | None = None,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 host_concurrency: int = DEFAULT_HOST_CONCURRENCY,
+                 rate: float = DEFAULT_RATE,
+                 host_limits: dict[str, tuple[int, float]] | None = None,
+                 raise_for_status: bool = True,
+                 adaptive: bool = False,
+                 throttle_check=None):
+        """
+        参数:
+            session: 发出请求的会话，默认使用 http_client 的共享会话
+            max_concurrency: 全局同时进行的请求数上限
+            host_concurrency: 同一主机同时进行的请求数上限
+            rate: 同一主机每秒最多发出的请求数
+            host_limits: 主机名到 (并发上限, 每秒请求数) 的字典，覆盖默认值
+            raise_for_status: 为 True 时 4xx/5xx 响应记为失败
+            adaptive: 为 True 时速率跟随该主机的 AIMD 控制器，rate 只作为初始速率
+            throttle_check: 接收成功的 FetchResult，返回品牌限流的原因（字符串）或 None，
+                            如 lambda r: "success=false" if r.data.get("success") is False else None
+        """
+        self.session = session or get_session()
+        self.max_concurrency = max_concurrency
+        self.host_concurrency = host_concurrency
+        self.rate = rate
+        self.host_limits = dict(host_limits or {})
+        self.raise_for_status = raise_for_status
+        self.adaptive = adaptive
+        self.throttle_check = throttle_check
+        # 限速器绑定在事件循环上，每次运行重新创建
+        self.limiters: dict[str, HostLimiter] = {}
+
+    def limiter(self, host: str) -> HostLimiter:
+        if host not in self.limiters:
+            concurrency, rate = self.host_limits.get(host, (self.host_concurrency, self.rate))
+            if self.adaptive:
+                rate = get_controller(host, rate=rate).rate
+            self.limiters[host] = HostLimiter(concurrency, rate)
+        return self.limiters[host]
+
+    def _send(self, spec: RequestSpec) -> requests.Response:
+        response = self.session.request(spec.method, spec.url, params=spec.params, data=spec.data,
+                                        json=spec.json, headers=spec.headers, timeout=spec.timeout)
+        if self.raise_for_status:
+            response.raise_for_status()
+        return response
+
+    async def fetch(self, index: int, spec: RequestSpec, executor: ThreadPoolExecutor) -> FetchResult:
+        result = FetchResult(index, spec)
+        limiter = self.limiter(spec.host)
+        loop = asyncio.get_running_loop()
+        async with limiter.semaphore:
+            if pacing_enabled():
+                await limiter.bucket.acquire()
+            start = time.monotonic()
+            try:
+                result.response = await loop.run_in_executor(executor, self._send, spec)
+                result.data = parse_response(result.response, spec.parse)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                result.error = e
+            result.elapsed = time.monotonic() - start
+        if result.ok and self.throttle_check and (reason := self.throttle_check(result)):
+            get_controller(spec.host).throttle(reason)
+        if self.adaptive:
+            limiter.bucket.set_rate(get_controller(spec.host).rate)
+        return result
+
+    async def iter_results(self, specs, ordered: bool = False, expand=None):
+        """
+        并发执行请求并逐个产出结果
+
+        参数:
+            specs: RequestSpec 的可迭代对象，按需逐个取出，可以是生成器
+            ordered: 为 True 时按提交顺序产出，否则按完成顺序产出
+            expand: 接收每个 FetchResult（含失败的）、返回后续 RequestSpec 列表的函数，
+                    在产出该结果之前调用，运行在事件循环线程中，不应做耗时操作
+
+        返回值:
+            FetchResult 的异步生成器
+        """
+        self.limiters = {}
+        specs = iter(specs)
+        follow_ups: deque[RequestSpec] = deque()
+        pending: set[asyncio.Task] = set()
+        # 按顺序产出时，暂存已完成但前面还有未完成请求的结果
+        finished: dict[int, FetchResult] = {}
+        next_index = 0  # 下一个要提交的请求
+        next_yield = 0  # 按顺序产出时，下一个应产出的请求
+        exhausted = False
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                thread_name_prefix="fetch") as executor:
+            while True:
+                while len(pending) < self.max_concurrency:
+                    if follow_ups:
+                        spec = follow_ups.popleft()
+                    elif not exhausted:
+                        spec = next(specs, None)
+                        if spec is None:
+                            exhausted = True
+                            continue
+                    else:
+                        break
+                    pending.add(asyncio.ensure_future(self.fetch(next_index, spec, executor)))
+                    next_index += 1
+                if not pending:
+                    break
+
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda t: t.result().index):
+                    result = task.result()
+                    if expand:
+                        follow_ups.extend(expand(result) or ())
+                    if not ordered:
+                        yield result
+                        continue
+                    finished[result.index] = result
+                    while next_yield in finished:
+                        yield finished.pop(next_yield)
+                        next_yield += 1
+
+
+def fetch_iter(specs, ordered: bool = False, engine: FetchEngine | None = None, expand=None,
+               **engine_options):
+    """
+    在同步代码中使用抓取引擎
+
+    参数:
+        specs: RequestSpec 的可迭代对象
+        ordered: 为 True 时按提交顺序产出，否则按完成顺序产出
+        expand: 由结果生成后续请求的函数，见 FetchEngine.iter_results
+        engine: 已配置好的 FetchEngine；为 None 时用 engine_options 新建
+        engine_options: 传给 FetchEngine 的参数，如 rate=2, host_concurrency=4
+
+    返回值:
+        FetchResult 的生成器。事件循环运行在后台线程中，提前结束迭代时剩余请求会被取消
+    """
+    engine = engine or FetchEngine(**engine_options)
+    results: queue.Queue = queue.Queue(maxsize=engine.max_concurrency * 2)
+    stop = threading.Event()
+    done = object()
+
+    async def produce():
+        try:
+            async for result in engine.iter_results(specs, ordered, expand):
+                while not stop.is_set():
+                    try:
+                        results.put_nowait(result)
+                        break
+                    except queue.Full:
+                        # 消费者处理较慢时不再提交新请求
+                        await asyncio.sleep(0.01)
+                if stop.is_set():
+                    return
+        except BaseException as e:  # 交给消费者线程抛出
+            results.put(e)
+        finally:
+            results.put(done)
+
+    thread = threading.Thread(target=asyncio.run, args=(produce(),), name="fetch-engine", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = results.get()
+            if item is done:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # 清空队列，避免生产者阻塞在 put 上
+        while thread.is_alive():
+            try:
+                results.get(timeout=0.05)
+            except queue.Empty:
+                pass
+        thread.join()
+
+
+def fetch_all(specs, **options) -> list[FetchResult]:
+    """并发执行全部请求，按提交顺序返回结果列表"""
+    return list(fetch_iter(specs, ordered=True, **options))
@@ -0,0 +1,138 @@
+"""
+行政区划数据（gazetteer）的统一加载入口
+
+`util`目录下的 cities.json、provinces.json、stand_city.json、
+stand_province.json、city_centers.json 以及 cache/provinces.json
+在首次使用时才加载。
+加载结果连同预建的子串索引一起编译成二进制缓存 cache/gazetteer.pickle，
+之后的进程只需读取一次文件。
+任一源文件的修改时间或大小变化时缓存自动失效并重建。
+"""
+
+import json
+import os
+import pickle
+
+UTIL_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(UTIL_DIR))
+CACHE_DIR = os.path.join(PROJECT_ROOT, "cache")
+CACHE_PATH = os.path.join(CACHE_DIR, "gazetteer.pickle")
+
+# 缓存格式变化时递增，使旧缓存失效
+CACHE_VERSION = 3
+
+SOURCE_FILES = {
+    "cities": os.path.join(UTIL_DIR, "cities.json"),
+    "provinces": os.path.join(UTIL_DIR, "provinces.json"),
+    "stand_cities": os.path.join(UTIL_DIR, "stand_city.json"),
+    "stand_provinces": os.path.join(UTIL_DIR, "stand_province.json"),
+    # 行政区划代码到驻地经纬度 [lon, lat]
+    "city_centers": os.path.join(UTIL_DIR, "city_centers.json"),
+    # 含省份简称（shortName）等信息
+    "province_meta": os.path.join(CACHE_DIR, "provinces.json"),
+}
+
+
+def build_substring_index(names: dict) -> dict:
+    """
+    为名称字典建立子串索引
+
+    参数:
+        names: 中文名到英文名的字典（保持JSON文件中的顺序）
+
+    返回值:
+        子串到英文名的字典。每个子串映射到第一个包含它的键对应的值，
+        与按顺序线性扫描 `query in key` 的结果一致，但查询只需一次哈希
+    """
+    index = {}
+    for key, value in names.items():
+        length = len(key)
+        for start in range(length + 1):
+            for end in range(start, length + 1):
+                # setdefault 保证先出现的键优先
+                index.setdefault(key[start:end], value)
+    return index
+
+
+class Gazetteer:
+    """已加载的行政区划数据，各属性均为只读使用的字典或列表"""
+
+    def __init__(self, data: dict):
+        self.cities: dict = data["cities"]
+        self.provinces: dict = data["provinces"]
+        self.stand_cities: list = data["stand_cities"]
+        self.stand_provinces: list = data["stand_provinces"]
+        self.province_meta: list = data["province_meta"]
+        self.city_centers: dict = data["city_centers"]
+        self.cities_index: dict = data["cities_index"]
+        self.provinces_index: dict = data["provinces_index"]
+
+
+def source_signature() -> tuple:
+    """源文件的 (路径, 修改时间, 大小) 元组，用于判断缓存是否过期"""
+    signature = []
+    for path in sorted(SOURCE_FILES.values()):
+        stat = os.stat(path)
+        signature.append((os.path.relpath(path, PROJECT_ROOT), stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def compile_gazetteer() -> dict:
+    """从JSON源文件解析全部数据并建立索引"""
+    data = {}
+    for key, path in SOURCE_FILES.items():
+        with open(path, 'r', encoding='utf-8') as f:
+            data[key] = json.load(f)
+    data["cities_index"] = build_substring_index(data["cities"])
+    data["provinces_index"] = build_substring_index(data["provinces"])
+    return data
+
+
+def read_cache(signature: tuple, path: str = CACHE_PATH, version: int = CACHE_VERSION) -> dict | None:
+    """读取 path 处的二进制缓存，版本或签名不符时返回 None；version 供有独立格式版本的缓存使用"""
+    try:
+        with open(path, 'rb') as f:
+            cached = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return None
+    if cached.get("version") != version or cached.get("signature") != signature:
+        return None
+    return cached["data"]
+
+
+def write_cache(signature: tuple, data, path: str = CACHE_PATH, version: int = CACHE_VERSION) -> None:
+    """把 data 连同签名写入 path 处的二进制缓存"""
+    # 先写临时文件再替换，避免并发启动的爬虫读到半个文件
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({"version": version, "signature": signature, "data": data},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"写入缓存 {path} 失败: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+_gazetteer = None
+
+
+def load_gazetteer() -> Gazetteer:
+    """
+    获取全局共享的行政区划数据，首次调用时才加载
+
+    返回值:
+        Gazetteer 实例。优先读取 cache/ 下的二进制缓存，缓存缺失或过期时
+        从JSON重新编译并写回缓存
+    """
+    global _gazetteer
+    if _gazetteer is None:
+        signature = source_signature()
+        data = read_cache(signature)
+        if data is None:
+            data = compile_gazetteer()
+            write_cache(signature, data)
+        _gazetteer = Gazetteer(data)
+    return _gazetteer
@@ -0,0 +1,181 @@
+"""
+持久化的 HTTP 响应缓存
+
+省市列表、字母索引等基本不变的参考数据，每次运行都重新下载并不必要。
+这里按 “方法 + 完整URL（含查询参数）+ 请求体” 的哈希把成功的响应缓存到 cache/http/ 下：
+
+- 缓存未过期（在调用方给定的 TTL 内）时直接返回，不访问网络
+- 过期后若服务端提供了 ETag / Last-Modified，带上 If-None-Match / If-Modified-Since
+  重新验证，数据未变时只需一次 304 响应
+- 否则重新下载并覆盖缓存
+
+返回的是普通的 requests.Response，调用方照常使用 json()、text 等，
+另有 from_cache 属性表示是否来自缓存（含 304 重新验证）。
+"""
+
+import datetime
+import hashlib
+import os
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from util.gazetteer import CACHE_DIR, read_cache, write_cache
+from util.http_client import get_session
+from util.rate_controller import pace
+
+HTTP_CACHE_DIR = os.path.join(CACHE_DIR, "http")
+# 缓存条目格式的版本，与 gazetteer 的 CACHE_VERSION 相互独立；条目格式变化时加一
+HTTP_CACHE_VERSION = 1
+
+# 常用的 TTL（秒）
+TTL_HOUR = 3600
+TTL_DAY = 24 * TTL_HOUR
+TTL_WEEK = 7 * TTL_DAY
+
+# 缓存内容已解压，不再保留这些描述传输格式的响应头
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+# 本次运行的缓存命中情况；cached_request 可能在多个线程中同时调用，计数时加锁
+stats = {"hit": 0, "revalidated": 0, "miss": 0}
+_stats_lock = threading.Lock()
+
+# 为 False 时 cached_request 直接访问服务端，不读写缓存（录制、回放录像时使用）
+_cache_enabled = True
+
+
+def set_cache_enabled(enabled: bool) -> None:
+    global _cache_enabled
+    _cache_enabled = enabled
+
+
+def _count(outcome: str) -> None:
+    with _stats_lock:
+        stats[outcome] += 1
+
+
+def cache_key(prepared: requests.PreparedRequest) -> str:
+    body = prepared.body or b""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    digest = hashlib.sha256()
+    digest.update(f"{prepared.method}\n{prepared.url}\n".encode("utf-8"))
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def cache_path(key: str) -> str:
+    return os.path.join(HTTP_CACHE_DIR, f"{key}.pickle")
+
+
+def _to_entry(response: requests.Response) -> dict:
+    headers = CaseInsensitiveDict(
+        {k: v for k, v in response.headers.items() if k.lower() not in DROPPED_HEADERS})
+    return {
+        "url": response.url,
+        "status": response.status_code,
+        "reason": response.reason,
+        "headers": headers,
+        "encoding": response.encoding,
+        "content": response.content,
+        "stored_at": time.time(),
+    }
+
+
+def _from_entry(entry: dict, prepared: requests.PreparedRequest) -> requests.Response:
+    response = requests.Response()
+    response.status_code = entry["status"]
+    response.reason = entry["reason"]
+    response.headers = CaseInsensitiveDict(entry["headers"])
+    response.encoding = entry["encoding"]
+    response._content = entry["content"]
+    response._content_consumed = True
+    response.url = entry["url"]
+    response.request = prepared
+    response.elapsed = datetime.timedelta(0)
+    response.from_cache = True
+    return response
+
+
+def cached_request(method: str, url: str, ttl: float, session: requests.Session | None = None,
+                   refresh: bool = False, validate=None, **kwargs) -> requests.Response:
+    """
+    带持久化缓存的请求
+
+    参数:
+        method: HTTP 方法
+        url: 请求地址
+        ttl: 缓存有效期（秒），过期后重新验证或重新下载
+        session: 发出请求的会话，默认使用 http_client 的共享会话
+        refresh: 为 True 时忽略有效期，总是访问服务端（仍会尝试 304 重新验证）
+        validate: 接收 200 响应、返回是否可以缓存的函数，用于排除业务上失败的响应，
+                  如 lambda r: r.json().get("code") == 10000
+        kwargs: 传给 session.request 的其他参数，如 params、data、json、headers、timeout。
+                headers 不参与缓存键
+
+    返回值:
+        requests.Response；只有通过 validate 的 200 响应会被缓存，其他响应原样返回
+    """
+    session = session or get_session()
+    if not _cache_enabled:
+        pace(url)
+        response = session.request(method, url, **kwargs)
+        response.from_cache = False
+        return response
+
+    prepared = requests.Request(method.upper(), url, params=kwargs.get("params"),
+                                data=kwargs.get("data"), json=kwargs.get("json")).prepare()
+    key = cache_key(prepared)
+    path = cache_path(key)
+    entry = read_cache(key, path, HTTP_CACHE_VERSION)
+
+    if entry is not None and not refresh and time.time() - entry["stored_at"] < ttl:
+        _count("hit")
+        return _from_entry(entry, prepared)
+
+    headers = dict(kwargs.pop("headers", None) or {})
+    if entry is not None:
+        if etag := entry["headers"].get("ETag"):
+            headers["If-None-Match"] = etag
+        if last_modified := entry["headers"].get("Last-Modified"):
+            headers["If-Modified-Since"] = last_modified
+
+    pace(url)
+    response = session.request(method, url, headers=headers, **kwargs)
+    if response.status_code == 304 and entry is not None:
+        _count("revalidated")
+        entry["stored_at"] = time.time()
+        for name in ("ETag", "Last-Modified", "Cache-Control", "Expires"):
+            if name in response.headers:
+                entry["headers"][name] = response.headers[name]
+        write_cache(key, entry, path, HTTP_CACHE_VERSION)
+        return _from_entry(entry, prepared)
+
+    _count("miss")
+    response.from_cache = False
+    if response.status_code == 200 and (validate is None or _is_valid(validate, response)):
+        write_cache(key, _to_entry(response), path, HTTP_CACHE_VERSION)
+    return response
+
+
+def _is_valid(validate, response: requests.Response) -> bool:
+    try:
+        return bool(validate(response))
+    except ValueError:  # 响应不是合法的JSON等
+        return False
+
+
+def cached_get(url: str, ttl: float, **kwargs) -> requests.Response:
+    return cached_request("GET", url, ttl, **kwargs)
+
+
+def cached_post(url: str, ttl: float, **kwargs) -> requests.Response:
+    return cached_request("POST", url, ttl, **kwargs)
+
+
+def print_cache_stats() -> None:
+    """打印本次运行的缓存命中情况"""
+    print(f"HTTP缓存: 命中 {stats['hit']} 次，304重新验证 {stats['revalidated']} 次，"
+          f"下载 {stats['miss']} 次")
@@ -0,0 +1,151 @@
+"""
+共享的带连接池的 HTTP 客户端
+
+各爬虫直接调用 requests.get/post 时，每个请求都要重新建立 TCP 连接和 TLS 握手。
+这里统一创建 requests.Session：
+
+- keep-alive 连接池，同一主机的请求复用已建立的连接
+- 可按主机单独设置连接池大小（并发请求多的接口给更大的池）
+- 默认超时，调用方不传 timeout 时也不会无限等待
+- 自动解压 gzip/deflate 响应，调用方直接使用 response.content / text / json()
+- 统计每个主机的请求数和新建连接数，据此得到省下的握手次数
+- 每个响应的状态码和耗时、以及连接失败，都报告给 rate_controller 中对应主机的速率控制器
+- 开启录制或回放（见 cassette）时，挂载的适配器会录制请求或直接从录像返回响应
+
+设置环境变量 SPIDER_BASE_URL 后，经 api_url 包装的接口地址会指向该地址
+（如 benchmark/mock_brand_server.py 启动的本地模拟服务），路径和参数不变。
+"""
+
+import os
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+from util.cassette import make_adapter
+from util.rate_controller import get_controller, record_response
+
+# (连接超时, 读取超时)，单位秒
+DEFAULT_TIMEOUT = (5, 30)
+# 单个连接池保留的最大连接数，即同一主机可同时复用的连接数
+DEFAULT_POOL_MAXSIZE = 10
+# 最多缓存多少个主机的连接池；超出时最久未用的连接池被关闭，其统计随之丢失
+DEFAULT_POOL_CONNECTIONS = 32
+# 仅对建立连接失败等情况重试，不重试已发出的请求
+DEFAULT_MAX_RETRIES = 3
+# 覆盖各品牌接口协议和主机的环境变量
+BASE_URL_ENV = "SPIDER_BASE_URL"
+
+
+class PooledSession(requests.Session):
+    """带默认超时的 Session，其余行为与 requests.Session 相同"""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT):
+        super().__init__()
+        self.timeout = timeout
+        self.headers["Accept-Encoding"] = "gzip, deflate"
+        self.hooks["response"].append(record_response)
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        try:
+            return super().request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            get_controller(url).record(error=True, reason=type(e).__name__)
+            raise
+
+    def connection_stats(self) -> dict[str, dict[str, int]]:
+        """
+        统计各主机的连接复用情况
+
+        返回值:
+            {"scheme://host:port": {"requests": 请求数, "connections": 新建连接数,
+                                    "reused": 复用连接的请求数}}
+        """
+        stats = {}
+        for adapter in {id(a): a for a in self.adapters.values()}.values():
+            if not hasattr(adapter, "poolmanager"):  # 回放录像时没有连接池
+                continue
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                host = f"{key.key_scheme}://{key.key_host}:{key.key_port or pool.port}"
+                entry = stats.setdefault(host, {"requests": 0, "connections": 0, "reused": 0})
+                entry["requests"] += pool.num_requests
+                entry["connections"] += pool.num_connections
+                entry["reused"] = max(entry["requests"] - entry["connections"], 0)
+        return stats
+
+    def print_stats(self) -> None:
+        """打印连接复用统计"""
+        stats = self.connection_stats()
+        total_requests = sum(s["requests"] for s in stats.values())
+        total_connections = sum(s["connections"] for s in stats.values())
+        for host, s in sorted(stats.items()):
+            print(f"{host}: 请求 {s['requests']} 次，新建连接 {s['connections']} 个，"
+                  f"复用 {s['reused']} 次")
+        print(f"共请求 {total_requests} 次，新建连接 {total_connections} 个，"
+              f"省去 {max(total_requests - total_connections, 0)} 次握手")
+
+
+def create_session(headers: dict | None = None,
+                   timeout=DEFAULT_TIMEOUT,
+                   pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+                   host_pool_sizes: dict[str, int] | None = None,
+                   max_retries: int = DEFAULT_MAX_RETRIES) -> PooledSession:
+    """
+    创建带连接池的会话
+
+    参数:
+        headers: 每个请求默认携带的请求头
+        timeout: 默认超时，(连接超时, 读取超时) 或单个秒数
+        pool_maxsize: 每个主机默认的连接池大小
+        host_pool_sizes: 主机名到连接池大小的字典，如 {"api.tuhu.cn": 20}
+        max_retries: 建立连接失败时的重试次数
+
+    返回值:
+        PooledSession 实例
+    """
+    session = PooledSession(timeout)
+    if headers:
+        session.headers.update(headers)
+    adapter = make_adapter(pool_connections=DEFAULT_POOL_CONNECTIONS,
+                          pool_maxsize=pool_maxsize,
+                          max_retries=max_retries)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    for host, size in (host_pool_sizes or {}).items():
+        # 前缀更长的适配器优先匹配
+        host_adapter = make_adapter(pool_connections=1, pool_maxsize=size, max_retries=max_retries)
+        session.mount(f'http://{host}/', host_adapter)
+        session.mount(f'https://{host}/', host_adapter)
+    return session
+
+
+def api_url(url: str) -> str:
+    """
+    品牌接口地址；设置了 SPIDER_BASE_URL 时把协议和主机替换为该地址
+
+    参数:
+        url: 真实的接口地址，如 https://gateway.tuhu.cn/cl/...
+
+    返回值:
+        如 http://127.0.0.1:8765/cl/...
+    """
+    base_url = os.environ.get(BASE_URL_ENV)
+    if not base_url:
+        return url
+    base = urlsplit(base_url)
+    return urlunsplit(urlsplit(url)._replace(scheme=base.scheme, netloc=base.netloc))
+
+
+_session = None
+
+
+def get_session() -> PooledSession:
+    """获取全局共享的会话，首次调用时才创建"""
+    global _session
+    if _session is None:
+        _session = create_session()
+    return _session
@@ -1,20 +1,42 @@
-import json
-import os
+from typing import TYPE_CHECKING, Callable, Iterable
+
+from util.gazetteer import build_substring_index, load_gazetteer  # noqa: F401
+
+if TYPE_CHECKING:
+    import pandas
+
+
+def translate_many(names_zh: Iterable[str], translate: Callable[[str], str]) -> "list[str] | pandas.Series":
+    """
+    批量翻译：每个不同的名称只翻译一次，再按原顺序映射回去
+
+    参数:
+        names_zh: 中文名的可迭代对象（列表、生成器或 pandas.Series）
+        translate: 单个名称的翻译函数
+
+    返回值:
+        与输入等长、顺序一致的英文名列表；输入为 pandas.Series 时返回索引相同的 Series
+    """
+    # pandas.Series 走向量化的 unique + map
+    if hasattr(names_zh, "unique") and hasattr(names_zh, "map"):
+        mapping = {name: translate(name) for name in names_zh.unique()}
+        return names_zh.map(mapping)
+
+    names_zh = list(names_zh)
+    mapping = {name: translate(name) for name in dict.fromkeys(names_zh)}
+    return [mapping[name] for name in names_zh]
+
 
 class LocationTranslator:
     def __init__(self):
-        # 获取当前文件所在目录
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        
-        # 加载城市数据
-        cities_path = os.path.join(current_dir, 'cities.json')
-        with open(cities_path, 'r', encoding='utf-8') as f:
-            self.cities_dict = json.load(f)
-            
-        # 加载省份数据
-        provinces_path = os.path.join(current_dir, 'provinces.json')
-        with open(provinces_path, 'r', encoding='utf-8') as f:
-            self.provinces_dict = json.load(f)
+        # 城市、省份数据及其子串索引由 gazetteer 统一加载（带二进制缓存）
+        gazetteer = load_gazetteer()
+        self.cities_dict = gazetteer.cities
+        self.provinces_dict = gazetteer.provinces
+
+        # 预建子串索引，模糊匹配时无需逐个扫描
+        self.cities_index = gazetteer.cities_index
+        self.provinces_index = gazetteer.provinces_index
     
     def get_en_city(self, city_zh: str) -> str:
         """
@@ -30,13 +52,8 @@ class LocationTranslator:
         if city_zh in self.cities_dict:
             return self.cities_dict[city_zh]
         
-        # 模糊匹配
-        for key, value in self.cities_dict.items():
-            if city_zh in key:
-                return value
-        
-        # 未找到匹配项，返回原始输入
-        return city_zh
+        # 模糊匹配：返回第一个包含该字符串的键对应的英文名
+        return self.cities_index.get(city_zh, city_zh)
     
     def get_en_province(self, province_zh: str) -> str:
         """
@@ -52,16 +69,44 @@ class LocationTranslator:
         if province_zh in self.provinces_dict:
             return self.provinces_dict[province_zh]
         
-        # 模糊匹配
-        for key, value in self.provinces_dict.items():
-            if province_zh in key:
-                return value
-        
-        # 未找到匹配项，返回原始输入
-        return province_zh
+        # 模糊匹配：返回第一个包含该字符串的键对应的英文名
+        return self.provinces_index.get(province_zh, province_zh)
+
+    def get_en_cities(self, cities_zh: Iterable[str]) -> "list[str] | pandas.Series":
+        """
+        批量将中文城市名转换为英文，重复的城市名只翻译一次
+
+        参数:
+            cities_zh: 城市中文名的可迭代对象（列表、生成器或 pandas.Series）
+
+        返回值:
+            与输入顺序一致的英文名列表；输入为 pandas.Series 时返回 Series
+        """
+        return translate_many(cities_zh, self.get_en_city)
+
+    def get_en_provinces(self, provinces_zh: Iterable[str]) -> "list[str] | pandas.Series":
+        """
+        批量将中文省份名转换为英文，重复的省份名只翻译一次
+
+        参数:
+            provinces_zh: 省级行政区中文名的可迭代对象（列表、生成器或 pandas.Series）
+
+        返回值:
+            与输入顺序一致的英文名列表；输入为 pandas.Series 时返回 Series
+        """
+        return translate_many(provinces_zh, self.get_en_province)
+
+# 为了方便直接调用，使用一个全局实例；首次调用时才创建，导入本模块不读取任何数据文件
+_translator = None
+
+
+def get_translator() -> LocationTranslator:
+    """获取全局共享的 LocationTranslator 实例"""
+    global _translator
+    if _translator is None:
+        _translator = LocationTranslator()
+    return _translator
 
-# 为了方便直接调用，创建一个全局实例
-_translator = LocationTranslator()
 
 # 提供直接调用的函数
 def get_en_city(city_zh: str) -> str:
@@ -74,7 +119,7 @@ def get_en_city(city_zh: str) -> str:
     返回值:
         城市的英文名字符串，如果未找到则返回原中文名
     """
-    return _translator.get_en_city(city_zh)
+    return get_translator().get_en_city(city_zh)
 
 def get_en_province(province_zh: str) -> str:
     """
@@ -86,4 +131,28 @@ def get_en_province(province_zh: str) -> str:
     返回值:
         省份的英文名字符串，如果未找到则返回原中文名
     """
-    return _translator.get_en_province(province_zh)
\ No newline at end of file
+    return get_translator().get_en_province(province_zh)
+
+def get_en_cities(cities_zh: Iterable[str]) -> "list[str] | pandas.Series":
+    """
+    批量将中文城市名转换为英文
+
+    参数:
+        cities_zh: 城市中文名的可迭代对象（列表、生成器或 pandas.Series）
+
+    返回值:
+        与输入顺序一致的英文名列表，未找到的保留原中文名；输入为 pandas.Series 时返回 Series
+    """
+    return get_translator().get_en_cities(cities_zh)
+
+def get_en_provinces(provinces_zh: Iterable[str]) -> "list[str] | pandas.Series":
+    """
+    批量将中文省份名转换为英文
+
+    参数:
+        provinces_zh: 省级行政区中文名的可迭代对象（列表、生成器或 pandas.Series）
+
+    返回值:
+        与输入顺序一致的英文名列表，未找到的保留原中文名；输入为 pandas.Series 时返回 Series
+    """
+    return get_translator().get_en_provinces(provinces_zh)
@@ -0,0 +1,182 @@
+"""
+按主机自适应调整请求速率（AIMD：加性增、乘性减）
+
+取代固定的 “基础间隔 + 随机抖动” 等待：
+
+- 响应正常、延迟和错误率都在健康范围内时，每次请求后速率加一个固定值；
+  第一次被限流之前处于“慢启动”阶段，速率按比例增长，以便尽快接近服务端的承受能力
+- 遇到 429/5xx 或品牌接口自己的限流信号（如比亚迪 success: false、
+  途虎 code 不为 10000）时，速率乘以一个小于 1 的系数
+- 速率下降时立即打印，之后每隔若干次请求打印一次当前速率
+
+http_client 创建的会话会自动把每个响应的状态码和耗时报告给对应主机的控制器，
+爬虫只需在请求前调用 pace(url)，并在识别到品牌限流信号时调用 throttle(url, 原因)：
+
+    pace(API)
+    data = get_session().post(API, json=payload).json()
+    if not data["success"]:
+        throttle(API, "success=false")
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+DEFAULT_RATE = 1.0  # 初始速率（次/秒）
+DEFAULT_MIN_RATE = 0.05
+DEFAULT_MAX_RATE = 5.0
+DEFAULT_INCREASE = 0.1  # 每次健康的响应后增加的速率
+DEFAULT_DECREASE = 0.5  # 被限流时速率乘以的系数
+SLOW_START_FACTOR = 1.1  # 慢启动阶段每次健康的响应后速率乘以的系数
+# 单次响应超过该耗时（秒）视为服务端吃紧，不再提速
+DEFAULT_LATENCY_LIMIT = 3.0
+# 最近若干次请求中失败比例超过该值时不再提速
+ERROR_WINDOW = 20
+ERROR_RATE_LIMIT = 0.1
+# 请求间隔的随机抖动比例，避免请求过于规律
+JITTER = 0.2
+# 每隔多少次请求打印一次当前速率
+LOG_EVERY = 50
+
+# 设为 0 时关闭请求前的等待，用于对本地模拟服务压测
+PACING_ENV = "SPIDER_PACING"
+
+# 为 False 时 wait() 不等待，用于回放录像、压测等不访问真实服务端的场合
+_pacing_enabled = os.environ.get(PACING_ENV, "1") != "0"
+
+
+def is_throttle_status(status_code: int) -> bool:
+    return status_code == 429 or status_code >= 500
+
+
+def host_of(url_or_host: str) -> str:
+    return urlsplit(url_or_host).netloc if "://" in url_or_host else url_or_host
+
+
+class AIMDController:
+    """单个主机的速率控制器，可在多个线程中共用"""
+
+    def __init__(self, host: str, rate: float = DEFAULT_RATE,
+                 min_rate: float = DEFAULT_MIN_RATE, max_rate: float = DEFAULT_MAX_RATE,
+                 increase: float = DEFAULT_INCREASE, decrease: float = DEFAULT_DECREASE,
+                 latency_limit: float = DEFAULT_LATENCY_LIMIT):
+        self.host = host
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_limit = latency_limit
+        self.outcomes: deque[bool] = deque(maxlen=ERROR_WINDOW)  # True 表示失败
+        self.requests = 0
+        self.throttles = 0
+        self.slow_start = True
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        """等到按当前速率允许发出下一个请求的时刻"""
+        if not _pacing_enabled:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time)
+            interval = 1 / self.rate
+            self.next_time = start + interval * random.uniform(1 - JITTER, 1 + JITTER)
+        if start > now:
+            time.sleep(start - now)
+
+    def _log(self, message: str) -> None:
+        print(f"[速率] {self.host}: {message}")
+
+    def record(self, latency: float | None = None, error: bool = False,
+               reason: str = "请求失败") -> None:
+        """
+        报告一次请求的结果
+
+        参数:
+            latency: 响应耗时（秒）
+            error: 请求失败（连接错误、超时、429/5xx）时为 True
+            reason: 失败时打印的原因
+        """
+        with self.lock:
+            self.requests += 1
+            self.outcomes.append(error)
+            if error:
+                self._decrease(reason)
+            else:
+                error_rate = sum(self.outcomes) / len(self.outcomes)
+                healthy = (latency is None or latency <= self.latency_limit) and error_rate <= ERROR_RATE_LIMIT
+                if healthy:
+                    grown = self.rate * SLOW_START_FACTOR if self.slow_start else self.rate + self.increase
+                    self.rate = min(self.max_rate, grown)
+            if self.requests % LOG_EVERY == 0:
+                self._log(f"当前速率 {self.rate:.2f} 次/秒（已请求 {self.requests} 次，"
+                          f"被限流 {self.throttles} 次）")
+
+    def record_response(self, response) -> None:
+        """根据 requests.Response 的状态码和耗时报告结果"""
+        self.record(response.elapsed.total_seconds(), is_throttle_status(response.status_code),
+                    f"HTTP {response.status_code}")
+
+    def throttle(self, reason: str = "") -> None:
+        """报告品牌接口的限流信号，如返回成功但业务码表示请求过快"""
+        with self.lock:
+            self.outcomes.append(True)
+            self._decrease(reason or "限流")
+
+    def _decrease(self, reason: str) -> None:
+        old = self.rate
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        self.throttles += 1
+        self.slow_start = False
+        # 已经排好的下一次请求时间也按新速率推后
+        self.next_time = max(self.next_time, time.monotonic() + 1 / self.rate)
+        self._log(f"{reason}，速率 {old:.2f} -> {self.rate:.2f} 次/秒")
+
+
+_controllers: dict[str, AIMDController] = {}
+_controllers_lock = threading.Lock()
+
+
+def get_controller(url_or_host: str, **options) -> AIMDController:
+    """
+    获取主机对应的速率控制器，首次调用时创建
+
+    参数:
+        url_or_host: 请求地址或主机名
+        options: 首次创建时传给 AIMDController 的参数，如 rate=0.5、max_rate=2
+    """
+    host = host_of(url_or_host)
+    with _controllers_lock:
+        if host not in _controllers:
+            _controllers[host] = AIMDController(host, **options)
+        return _controllers[host]
+
+
+def set_pacing(enabled: bool) -> None:
+    """开启或关闭请求前的等待"""
+    global _pacing_enabled
+    _pacing_enabled = enabled
+
+
+def pacing_enabled() -> bool:
+    return _pacing_enabled
+
+
+def pace(url_or_host: str) -> None:
+    """按主机当前的速率等待，在每个请求前调用"""
+    get_controller(url_or_host).wait()
+
+
+def throttle(url_or_host: str, reason: str = "") -> None:
+    """报告主机的品牌限流信号"""
+    get_controller(url_or_host).throttle(reason)
+
+
+def record_response(response, *args, **kwargs) -> None:
+    """requests 的 response 钩子，把响应报告给对应主机的控制器"""
+    get_controller(response.url).record_response(response)
@@ -0,0 +1,222 @@
+"""
+离线经纬度逆地理编码
+
+以 city_centers.json 中各地级区划的驻地为参考点，把经纬度归到最近的驻地，
+从而得到省、市（按驻地划分的近似结果，边界附近可能归错）。不访问任何网络。
+
+两级空间索引：
+
+- 1°×1° 网格桶：精确的最近邻查询，用于任意坐标
+- 中国范围内 0.1° 分辨率的预计算栅格：每个格子直接存最近驻地的下标，
+  批量查询时一个点只需一次数组访问。栅格缓存在 cache/ 下，数据变化时自动重建
+"""
+
+import math
+import os
+from array import array
+
+from util.divisions import (LEVEL_PROVINCE, PLACEHOLDER_CITY_NAMES, Division, DivisionIndex,
+                            load_division_index)
+from util.gazetteer import CACHE_DIR, read_cache, source_signature, write_cache
+
+RASTER_CACHE_PATH = os.path.join(CACHE_DIR, "reverse_geocoder.pickle")
+RASTER_VERSION = 1
+
+# 栅格覆盖范围（经度、纬度）与分辨率（度）
+RASTER_BOUNDS = (73.0, 15.0, 136.0, 54.0)
+RASTER_RESOLUTION = 0.1
+
+# 距离最近驻地超过该值（公里）的点视为境外或无法判断
+MAX_DISTANCE_KM = 600.0
+
+KM_PER_DEGREE = 111.32
+NO_MATCH = 0xFFFF
+
+
+def squared_km(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
+    """两点间距离（公里）的平方，等距圆柱投影近似，适合比较远近"""
+    dx = (lon1 - lon2) * math.cos(math.radians((lat1 + lat2) / 2)) * KM_PER_DEGREE
+    dy = (lat1 - lat2) * KM_PER_DEGREE
+    return dx * dx + dy * dy
+
+
+class ReverseGeocoder:
+    def __init__(self, index: DivisionIndex | None = None,
+                 max_distance_km: float = MAX_DISTANCE_KM):
+        self.index = index or load_division_index()
+        self.max_squared = max_distance_km * max_distance_km
+        self.references: list[Division] = [d for d in self.index.divisions.values() if d.location]
+        # 每个参考点对应的 (省, 市)；省级参考点（港澳台）的市为 None
+        self.results: list[tuple[Division, Division | None]] = []
+        for d in self.references:
+            if d.level == LEVEL_PROVINCE:
+                self.results.append((d, None))
+            else:
+                self.results.append((self.index.divisions[d.parent_code], d))
+
+        self.buckets: dict[tuple[int, int], list[int]] = {}
+        for i, d in enumerate(self.references):
+            lon, lat = d.location
+            self.buckets.setdefault((math.floor(lon), math.floor(lat)), []).append(i)
+
+        self.raster = self._load_raster()
+
+    def nearest(self, lon: float, lat: float) -> int | None:
+        """
+        精确的最近参考点查询
+
+        返回值:
+            参考点下标；超过最大距离时返回 None
+        """
+        cell_lon, cell_lat = math.floor(lon), math.floor(lat)
+        best, best_sq = None, self.max_squared
+        radius = 0
+        while True:
+            for x in range(cell_lon - radius, cell_lon + radius + 1):
+                for y in range(cell_lat - radius, cell_lat + radius + 1):
+                    if max(abs(x - cell_lon), abs(y - cell_lat)) != radius:
+                        continue
+                    for i in self.buckets.get((x, y), ()):
+                        ref_lon, ref_lat = self.references[i].location
+                        sq = squared_km(lon, lat, ref_lon, ref_lat)
+                        if sq < best_sq:
+                            best, best_sq = i, sq
+            # 第 radius 圈之外的点至少相距 radius 个网格宽度，经度方向按圈内最高纬度估计
+            reach = radius * KM_PER_DEGREE * math.cos(math.radians(min(abs(lat) + radius + 1, 89)))
+            if reach * reach >= best_sq:
+                return best
+            radius += 1
+
+    def _build_raster(self) -> array:
+        min_lon, min_lat, max_lon, max_lat = RASTER_BOUNDS
+        width = round((max_lon - min_lon) / RASTER_RESOLUTION)
+        per_degree = round(1 / RASTER_RESOLUTION)
+        raster = array('H', [NO_MATCH]) * (width * round((max_lat - min_lat) / RASTER_RESOLUTION))
+        locations = [d.location for d in self.references]
+        # 1° 网格的半对角线（公里），取纬度方向的长度作上界，并留出投影近似的余量
+        half_diagonal = KM_PER_DEGREE * math.sqrt(2) / 2 * 1.1
+        max_squared_degree = self.max_squared / (KM_PER_DEGREE * KM_PER_DEGREE)
+
+        # 先为每个 1° 网格筛出候选驻地，再只在候选中为其中的细格子找最近点：
+        # 设 d_min 为网格中心到最近驻地的距离，网格内任一点的最近驻地到中心的距离不超过 d_min + 2 * 半对角线
+        for cell_lat in range(int(min_lat), int(max_lat)):
+            for cell_lon in range(int(min_lon), int(max_lon)):
+                distances = [math.sqrt(squared_km(cell_lon + 0.5, cell_lat + 0.5, lon, lat))
+                             for lon, lat in locations]
+                nearest_km = min(distances)
+                if nearest_km - half_diagonal > MAX_DISTANCE_KM:
+                    continue
+                limit = nearest_km + 2 * half_diagonal
+                # 网格内经度方向的缩放系数视为常数，距离用“度”计算即可比较远近
+                scale = math.cos(math.radians(cell_lat + 0.5))
+                candidates = [(i, locations[i][0], locations[i][1])
+                              for i, d in enumerate(distances) if d <= limit]
+                base = (round((cell_lat - min_lat) * per_degree) * width
+                        + round((cell_lon - min_lon) * per_degree))
+                for r in range(per_degree):
+                    lat = cell_lat + (r + 0.5) * RASTER_RESOLUTION
+                    for c in range(per_degree):
+                        lon = cell_lon + (c + 0.5) * RASTER_RESOLUTION
+                        best, best_sq = NO_MATCH, max_squared_degree
+                        for i, ref_lon, ref_lat in candidates:
+                            dx = (lon - ref_lon) * scale
+                            dy = lat - ref_lat
+                            sq = dx * dx + dy * dy
+                            if sq < best_sq:
+                                best, best_sq = i, sq
+                        raster[base + r * width + c] = best
+        return raster
+
+    def _load_raster(self) -> array:
+        signature = (RASTER_VERSION, source_signature(), RASTER_BOUNDS, RASTER_RESOLUTION,
+                     self.max_squared, [d.code for d in self.references])
+        cached = read_cache(signature, RASTER_CACHE_PATH)
+        if cached is not None:
+            return cached
+        raster = self._build_raster()
+        write_cache(signature, raster, RASTER_CACHE_PATH)
+        return raster
+
+    def locate(self, lon: float, lat: float) -> tuple[Division | None, Division | None]:
+        """
+        查询单个坐标所属的省、市
+
+        参数:
+            lon: 经度
+            lat: 纬度
+
+        返回值:
+            (省级 Division, 地级 Division)，无法判断时为 (None, None)
+        """
+        found = self.locate_many([(lon, lat)])[0]
+        return found if found else (None, None)
+
+    def locate_many(self, points) -> list[tuple[Division, Division | None] | None]:
+        """
+        批量查询坐标所属的省、市
+
+        参数:
+            points: (lon, lat) 的可迭代对象
+
+        返回值:
+            与输入顺序一致的列表，每项为 (省, 市) 或 None
+        """
+        min_lon, min_lat, max_lon, max_lat = RASTER_BOUNDS
+        inverse = 1 / RASTER_RESOLUTION
+        width = round((max_lon - min_lon) * inverse)
+        raster, results, nearest = self.raster, self.results, self.nearest
+        located = []
+        append = located.append
+        for lon, lat in points:
+            if min_lon <= lon < max_lon and min_lat <= lat < max_lat:
+                i = raster[int((lat - min_lat) * inverse) * width + int((lon - min_lon) * inverse)]
+                append(None if i == NO_MATCH else results[i])
+            else:
+                i = nearest(lon, lat)
+                append(None if i is None else results[i])
+        return located
+
+
+_geocoder = None
+
+
+def get_reverse_geocoder() -> ReverseGeocoder:
+    """获取全局共享的 ReverseGeocoder 实例，首次调用时才加载栅格"""
+    global _geocoder
+    if _geocoder is None:
+        _geocoder = ReverseGeocoder()
+    return _geocoder
+
+
+def reverse_geocode(lon: float, lat: float) -> tuple[str, str]:
+    """
+    由经纬度查询省、市的中文全称
+
+    参数:
+        lon: 经度
+        lat: 纬度
+
+    返回值:
+        (省, 市)，如 (116.40, 39.90) 返回 ("北京市", "北京市")；无法判断的部分为空字符串
+    """
+    return reverse_geocode_many([(lon, lat)])[0]
+
+
+def reverse_geocode_many(points) -> list[tuple[str, str]]:
+    """
+    批量由经纬度查询省、市的中文全称
+
+    参数:
+        points: (lon, lat) 的可迭代对象
+
+    返回值:
+        与输入顺序一致的 (省, 市) 列表，无法判断的部分为空字符串
+    """
+    names = []
+    for found in get_reverse_geocoder().locate_many(points):
+        if found is None:
+            names.append(("", ""))
+        else:
+            province, city = found
+            names.append((province.name, city.name if city and city.name not in PLACEHOLDER_CITY_NAMES else ""))
+    return names
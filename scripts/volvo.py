@@ -2,10 +2,10 @@ import requests
 import csv
 import os
 import time
-import random
-from time import sleep
 import util.location_translator
 from util.location_translator import get_en_province, get_en_city
+from util.http_client import get_session
+from util.rate_controller import pace
 
 headers = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
@@ -16,16 +16,13 @@ RESULT_FIELDS = ["省", "Province", "市", "City", "区", "店名", "类型", "
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
 OUTPUT_PATH = os.path.join(PROJECT_ROOT, "output/volvo.csv")
-def sleep_with_random(interval: int,
-                      rand_max: int) -> None:
-    rand = random.random() * rand_max
-    sleep(interval + rand)
 
 def main():
     url = "https://campaigns.volvocars.com.cn/campaign/statistic/api/web/index.php/v1/apiservice/dealers/volvo-rdm-new.php"
 
     try:
-        response = requests.get(url,headers=headers)
+        pace(url)
+        response = get_session().get(url,headers=headers)
         response.raise_for_status()
         data = response.json()
 
@@ -71,7 +68,6 @@ def main():
 
                     # 打印记录
                     print(f"| {' | '.join([str(field) for field in row])} |")
-                    sleep_with_random(1,1)
 
                     # 写入CSV
                     writer.writerow(row)
@@ -1,7 +1,7 @@
 from util.location_translator import get_en_province, get_en_city
+from util.http_client import get_session
 
 RESULT_FIELDS = ["品牌","省", "Province", "市区辅助", "City/Area", "区", "店名", "类型", "地址", "电话", "备注"]
-import requests
 import csv
 import time
 import random
@@ -20,7 +20,7 @@ headers = {
     "Referer": "https://www.xiaopeng.com/pengmetta.html?forcePlat=h5"
 }
 count =0
-response = requests.post(url, headers=headers)
+response = get_session().post(url, headers=headers)
 data_list = []
 time.sleep(random.uniform(1, 2))
 for store in response.json().get("data", []):